@@ -54,18 +54,15 @@ document.addEventListener('DOMContentLoaded', () => {
         })
         .then(response => response.json())
         .then(data => {
-            if (data.success) {
-                displayMessage(data.message, data.details || '', false);
-                versionInput.value = ''; // Clear input on success
-                // Reload app list to show new version
-                loadApps();
-            } else {
-                displayMessage(data.message || 'An unknown error occurred.', data.details || '', true);
+            if (!data.success || !data.events_url) {
+                throw new Error(data.message || data.error || 'An unknown error occurred.');
             }
+            // The release runs in the background; follow its output as it streams in
+            return followReleaseJob(data, versionInput);
         })
         .catch(error => {
             console.error('Error creating release:', error);
-            displayMessage('Failed to communicate with the server.', error.toString(), true);
+            displayMessage('Failed to create release.', error.toString(), true);
         })
         .finally(() => {
             button.disabled = false; // Re-enable button
@@ -73,6 +70,44 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    function followReleaseJob(job, versionInput) {
+        displayMessage(job.message, 'Waiting for output...', false);
+        const details = messageArea.querySelector('pre');
+        const lines = [];
+
+        return new Promise(resolve => {
+            const source = new EventSource(job.events_url);
+            source.addEventListener('output', event => {
+                const { stream, line } = JSON.parse(event.data);
+                lines.push(stream === 'stderr' ? `[stderr] ${line}` : line);
+                details.textContent = lines.join('\n');
+                details.scrollTop = details.scrollHeight;
+            });
+            source.addEventListener('end', event => {
+                source.close();
+                const result = JSON.parse(event.data);
+                const succeeded = result.status === 'succeeded';
+                const message = succeeded ?
+                    `Release ${result.version_tag} for ${result.app_name} created successfully.` :
+                    `Failed to create release ${result.version_tag} for ${result.app_name} (exit code ${result.exit_code}).`;
+                displayMessage(message, lines.join('\n'), !succeeded);
+                if (succeeded) {
+                    versionInput.value = ''; // Clear input on success
+                    // Reload app list to show new version
+                    loadApps();
+                }
+                resolve();
+            });
+            source.onerror = () => {
+                // EventSource reconnects on its own (resuming via Last-Event-ID) unless it was closed
+                if (source.readyState === EventSource.CLOSED) {
+                    displayMessage('Lost connection to the release job.', lines.join('\n'), true);
+                    resolve();
+                }
+            };
+        });
+    }
+
     function loadApps() {
         fetch('/api/apps')
             .then(response => {
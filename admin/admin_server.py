@@ -1,11 +1,22 @@
-from flask import Flask, jsonify, request, send_from_directory, abort, Response
+from flask import Flask, jsonify, request, send_from_directory, abort, Response, g
 import subprocess
 import os
 import sys
 import re # For replacing placeholder
-# NOTE: You might need to install this: pip install packaging
-from packaging import version as packaging_version
-
+import mimetypes
+import json
+import hashlib
+import threading
+import argparse
+import atexit
+import signal
+import tempfile
+import time
+import shutil
+from urllib.parse import quote as url_quote
+from werkzeug.security import safe_join
+from werkzeug.exceptions import NotFound
+from werkzeug.serving import make_server
 app = Flask(__name__)
 
 # Determine the absolute path to the project root (one level up from 'admin')
@@ -14,8 +25,69 @@ REPO_ROOT = os.path.dirname(PROJECT_ROOT) # Assuming admin is directly under rep
 GAMES_DIR = os.path.join(REPO_ROOT, 'games')
 ADMIN_DIR = os.path.join(REPO_ROOT, 'admin') # For serving admin.html/js
 
+# How /games/... file bytes are sent:
+#   'none'       - Python streams the file (via wsgi.file_wrapper, i.e. sendfile, when the server offers it)
+#   'x-sendfile' - Flask emits an X-Sendfile header for Apache (mod_xsendfile) or lighttpd to serve
+#   'x-accel'    - an X-Accel-Redirect to FUN_X_ACCEL_PREFIX, an nginx `internal` location aliased to games/
+STATIC_OFFLOAD = os.environ.get('FUN_STATIC_OFFLOAD', 'none')
+X_ACCEL_PREFIX = os.environ.get('FUN_X_ACCEL_PREFIX', '/_games_internal/')
+app.config['USE_X_SENDFILE'] = STATIC_OFFLOAD == 'x-sendfile'
+# FUN_OPTIMIZE_ASSETS=1: releases from the admin panel run the asset optimization stage (release_manager --optimize)
+OPTIMIZE_ASSETS = os.environ.get('FUN_OPTIMIZE_ASSETS') == '1'
+# FUN_LIVE_RELOAD=0: working-dir previews are served as-is, without the live reload script
+LIVE_RELOAD = os.environ.get('FUN_LIVE_RELOAD', '1') != '0'
+
+# Sibling modules in admin/ are imported as top-level modules, however the server is started
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+SCRIPTS_DIR = os.path.join(REPO_ROOT, 'scripts') # Shared helpers such as version_index
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+from catalog_cache import CatalogCache
+from release_jobs import ReleaseJobManager, JobQueueFull, JobOutput, sse_events
+from metrics import Metrics, RequestProfiler
+import working_watcher
+import release_manager
+import version_index
+import page_template
+import game_scan
+
+# Request latencies, timing spans, subprocess counts and cache hit rates, exposed at GET /metrics.
+# Under --serve, FUN_METRICS_DIR is shared by all server processes so /metrics covers them all.
+metrics = Metrics(shared_dir=os.environ.get('FUN_METRICS_DIR') or None)
+metrics.describe('fun_http_requests_total', 'counter', 'HTTP requests by route, method and status.')
+metrics.describe('fun_http_request_duration_seconds', 'histogram',
+                 'Time to produce each response (streamed bodies are not included).')
+metrics.describe('fun_span_seconds', 'histogram', 'Time spent in each instrumented phase.')
+metrics.describe('fun_subprocesses_total', 'counter', 'Subprocesses started by the server.')
+metrics.describe('fun_cache_requests_total', 'counter', 'Cache lookups by cache and result.')
+metrics.collectors.append(lambda: [
+    ('fun_cache_requests_total', {'cache': 'version_index', 'result': result}, count)
+    for result, count in version_index.stats.items()
+])
+
+# FUN_PROFILE=1: any request with ?_profile=1 (or ?_profile=tottime, ...) returns its cProfile report
+if os.environ.get('FUN_PROFILE') == '1':
+    app.wsgi_app = RequestProfiler(app.wsgi_app)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe('fun_http_request_duration_seconds', time.perf_counter() - started,
+                        {'route': route, 'method': request.method})
+        metrics.inc('fun_http_requests_total', {'route': route, 'method': request.method, 'status': str(response.status_code)})
+    metrics.start_flusher() # No-op unless samples are shared between processes (--serve)
+    return response
+
 def run_command(command, cwd=None):
     """Runs a shell command and returns its stdout, stderr, and return code."""
+    metrics.inc('fun_subprocesses_total', {'command': command.split(None, 1)[0] if command.strip() else ''})
     try:
         process = subprocess.run(
             command,
@@ -31,118 +103,287 @@ def run_command(command, cwd=None):
     except Exception as e:
         return "", str(e), 1 # Indicate failure
 
+def get_working_changes(app_names=None):
+    """
+    Runs a single repository-wide `git status` over GAMES_DIR (or only over the working dirs
+    of app_names) and returns the set of app names whose 'working' directory has uncommitted
+    changes. Returns None if the status query itself failed.
+    """
+    games_rel = os.path.relpath(GAMES_DIR, REPO_ROOT).replace(os.sep, '/')
+    games_prefix = games_rel.rstrip('/') + '/'
+    pathspecs = [games_rel] if app_names is None else [f"{games_prefix}{app_name}/working" for app_name in app_names]
+    try:
+        # List args (no shell) and -z so paths with spaces or quotes come back verbatim
+        metrics.inc('fun_subprocesses_total', {'command': 'git status'})
+        process = subprocess.run(
+            ['git', 'status', '--porcelain', '-z', '--'] + pathspecs,
+            capture_output=True,
+            text=True,
+            cwd=REPO_ROOT
+        )
+    except Exception as e:
+        print(f"Warning: git status check failed for {GAMES_DIR}: {e}", file=sys.stderr)
+        return None
+    if process.returncode != 0:
+        print(f"Warning: git status check failed for {GAMES_DIR}: {process.stderr.strip()}", file=sys.stderr)
+        return None
+
+    # Each record is "XY <path>"; renames/copies are followed by a bare record holding the original path
+    paths = []
+    entries = process.stdout.split('\0')
+    i = 0
+    while i < len(entries):
+        entry = entries[i]
+        i += 1
+        if len(entry) < 4:
+            continue
+        status, path = entry[:2], entry[3:]
+        paths.append(path)
+        if ('R' in status or 'C' in status) and i < len(entries):
+            paths.append(entries[i])
+            i += 1
+
+    changed_apps = set()
+    for path in paths:
+        if path == games_prefix:
+            # The whole games directory is untracked
+            changed_apps.update(os.listdir(GAMES_DIR))
+            continue
+        if not path.startswith(games_prefix):
+            continue
+        app_name, _, rest = path[len(games_prefix):].partition('/')
+        # Untracked directories are collapsed to "games/<app>/" unless -uall is used
+        if rest.startswith('working/') or (rest == '' and path.endswith('/')):
+            changed_apps.add(app_name)
+    return changed_apps
+
+# Watches games/*/working for edits; started with the server (see start_watchers)
+working_tree_watcher = working_watcher.WorkingTreeWatcher(GAMES_DIR)
+# Result of the last git status, plus the games edited since then. With the watcher running, a
+# catalog rebuild only rechecks those games instead of running git status over the whole catalog.
+_working_status = {'changed': None, 'git_index': None, 'stale': set()}
+_working_status_lock = threading.Lock()
+
+def git_index_mtime():
+    try:
+        return os.stat(os.path.join(REPO_ROOT, '.git', 'index')).st_mtime_ns
+    except OSError:
+        return None
+
+def working_changes():
+    """
+    Returns the set of app names with uncommitted changes in 'working', like get_working_changes().
+    Without the working dir watcher every call runs a full git status. With it, the previous result
+    is reused: only games with working dir events since then are rechecked, and everything is
+    rechecked after the git index moved (a commit, checkout or git add).
+    """
+    index_mtime = git_index_mtime()
+    with _working_status_lock:
+        changed, stale = _working_status['changed'], _working_status['stale']
+        _working_status['stale'] = set()
+        full = not working_tree_watcher.running or changed is None or index_mtime != _working_status['git_index']
+    if full:
+        result = get_working_changes()
+    elif stale:
+        rechecked = get_working_changes(sorted(stale))
+        result = None if rechecked is None else (changed - stale) | rechecked
+    else:
+        result = changed
+    with _working_status_lock:
+        if result is None:
+            _working_status['changed'] = None # Retry with a full git status next time
+            _working_status['stale'] |= stale
+        else:
+            _working_status['changed'] = result
+            _working_status['git_index'] = index_mtime
+    return result or set()
+
+def working_dir_changed(change):
+    """Working dir watcher listener: marks the game for a git status recheck and invalidates the catalog."""
+    with _working_status_lock:
+        _working_status['stale'].add(change.app_name)
+    catalog.invalidate()
+
+working_tree_watcher.listeners.append(working_dir_changed)
+
+def describe_game(game, changed_apps):
+    """
+    Gathers one game's details from its GameEntry (see scripts/game_scan.py).
+    Returns (details dict, seconds spent reading the version index).
+    """
+    app_name = game.name
+    working_dir = os.path.join(game.path, 'working')
+
+    # --- Check git status in 'working' directory ---
+    has_updates = False
+    if game.has_working:
+        has_updates = app_name in changed_apps
+    else:
+         print(f"Warning: Working directory not found for {app_name}: {working_dir}", file=sys.stderr)
+
+    # --- Get release versions from the per-game version index ---
+    all_versions = []
+    latest_version = None
+    versions_started = time.perf_counter()
+    if game.has_releases:
+        try:
+            # Sorted latest first; only rescanned when releases/ changed since it was written
+            all_versions = [entry['version'] for entry in version_index.read_version_index(game.path)]
+            if all_versions:
+                latest_version = all_versions[0]
+        except Exception as e:
+             print(f"Error reading releases directory for {app_name}: {e}", file=sys.stderr)
+    versions_time = time.perf_counter() - versions_started
+
+    # --- Determine Entry Point (Simple Guess) ---
+    # Assume <app_name>.html or index.html exists in working/release dirs
+    # A more robust solution might check for specific files
+    entry_point = f"{app_name}.html"
+    # Basic check if the assumed entry point exists in working dir, otherwise default to index.html
+    # This check isn't perfect as the entry point might differ between versions
+    if game.has_working and not os.path.exists(os.path.join(working_dir, entry_point)):
+         entry_point = "index.html" # Fallback
+
+    details = {
+        "name": app_name,
+        "has_updates": has_updates,
+        "latest_version": latest_version,
+        "all_versions": all_versions,
+        "entry_point": entry_point # Store assumed entry point
+    }
+    return details, versions_time
+
 def get_game_details():
     """
     Scans the GAMES_DIR, gathers details about each game including versions and git status.
-    Returns a list of dictionaries, one for each game.
+    Returns a list of dictionaries, one for each game, sorted by name (so /api/apps pages are stable).
     """
     apps_data = []
     if not os.path.isdir(GAMES_DIR):
         print(f"Error: Games directory not found: {GAMES_DIR}", file=sys.stderr)
         return [] # Return empty list if games dir doesn't exist
 
+    # At most one git status for the whole catalog instead of one subprocess per game
+    with metrics.span('catalog.git_status'):
+        changed_apps = working_changes()
+
+    scan_started = time.perf_counter()
+    versions_time = 0.0 # Summed over all games, recorded as one span
     try:
-        for app_name in os.listdir(GAMES_DIR):
-            app_path = os.path.join(GAMES_DIR, app_name)
-            if os.path.isdir(app_path):
-                working_dir = os.path.join(app_path, 'working')
-                releases_dir = os.path.join(app_path, 'releases')
-
-                # --- Check git status in 'working' directory ---
-                has_updates = False
-                if os.path.isdir(working_dir):
-                    status_stdout, status_stderr, status_exit_code = run_command(f'git status --porcelain "{working_dir}{os.sep}"', cwd=REPO_ROOT)
-                    if status_exit_code == 0 and status_stdout:
-                        has_updates = True
-                    elif status_exit_code != 0:
-                        print(f"Warning: git status check failed for {working_dir}: {status_stderr}", file=sys.stderr)
-                else:
-                     print(f"Warning: Working directory not found for {app_name}: {working_dir}", file=sys.stderr)
-
-                # --- Get release versions from 'releases' subdirectories ---
-                all_versions = []
-                latest_version = None
-                if os.path.isdir(releases_dir):
-                    try:
-                        version_dirs = [d for d in os.listdir(releases_dir) if os.path.isdir(os.path.join(releases_dir, d))]
-                        parsed_versions = []
-                        for v_str in version_dirs:
-                            try:
-                                parsed_versions.append((packaging_version.parse(v_str), v_str))
-                            except packaging_version.InvalidVersion:
-                                print(f"Warning: Could not parse version from directory name '{v_str}' in {app_name}. Skipping.", file=sys.stderr)
-
-                        parsed_versions.sort(key=lambda x: x[0], reverse=True)
-                        all_versions = [v_str for version, v_str in parsed_versions]
-                        if all_versions:
-                            latest_version = all_versions[0]
-                    except Exception as e:
-                         print(f"Error reading releases directory for {app_name}: {e}", file=sys.stderr)
-
-                # --- Determine Entry Point (Simple Guess) ---
-                # Assume <app_name>.html or index.html exists in working/release dirs
-                # A more robust solution might check for specific files
-                entry_point = f"{app_name}.html"
-                # Basic check if the assumed entry point exists in working dir, otherwise default to index.html
-                # This check isn't perfect as the entry point might differ between versions
-                if os.path.isdir(working_dir) and not os.path.exists(os.path.join(working_dir, entry_point)):
-                     entry_point = "index.html" # Fallback
-
-                apps_data.append({
-                    "name": app_name,
-                    "has_updates": has_updates,
-                    "latest_version": latest_version,
-                    "all_versions": all_versions,
-                    "entry_point": entry_point # Store assumed entry point
-                })
+        # Games are described on a bounded thread pool; results arrive in name order
+        for details, game_versions_time in game_scan.scan_games(GAMES_DIR, lambda game: describe_game(game, changed_apps)):
+            apps_data.append(details)
+            versions_time += game_versions_time
+        metrics.observe_span('catalog.versions', versions_time)
+        metrics.observe_span('catalog.scan', time.perf_counter() - scan_started)
         return apps_data
     except Exception as e:
         print(f"Error scanning games directory: {e}", file=sys.stderr)
         return [] # Return empty list on error
 
-# --- Static File Serving ---
-
-@app.route('/')
-def index_page():
-    """Serves the main index HTML page, dynamically injecting game links."""
-    try:
-        template_path = os.path.join(REPO_ROOT, 'index.html')
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
+# Process-wide catalog cache; rebuilt only when games/ or the git index changes
+# The shared file lets every server worker process reuse one scan and agree on the revision
+catalog = CatalogCache(lambda: get_game_details(), GAMES_DIR, REPO_ROOT,
+                       shared_path=os.path.join(REPO_ROOT, '.catalog_cache.json'))
+metrics.collectors.append(lambda: [
+    ('fun_cache_requests_total', {'cache': 'catalog', 'result': result}, count)
+    for result, count in catalog.stats.items()
+])
+metrics.describe('fun_working_changes_total', 'counter',
+                 'Working dir file events seen by the watcher, and debounced per-game changes published.')
+metrics.collectors.append(lambda: [
+    ('fun_working_changes_total', {'kind': kind}, count)
+    for kind, count in working_tree_watcher.stats.items()
+])
+
+def start_watchers():
+    """Starts the catalog and working dir watchers in this process (the ones serving /api and previews)."""
+    if catalog.start_watcher():
+        print("Watching games/ with inotify for catalog changes.")
+    mode = working_tree_watcher.start()
+    print(f"Watching games/*/working for live reload ({mode}).")
+
+def conditional_response(response, etag, last_modified):
+    """Attaches validators to a response and turns it into a 304 if the client copy is current."""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache' # Always revalidate, but allow 304s
+    return response.make_conditional(request)
 
-        game_details = get_game_details()
-        game_list_html = ""
+# --- Static File Serving ---
 
-        if not game_details:
-            game_list_html = "<li>No games found or error loading games.</li>"
-        else:
-            for game in game_details:
-                app_name = game['name']
-                entry_point = game['entry_point']
-                link_url = f"/games/{app_name}/working/{entry_point}" # Default to working
-                link_text = f"{app_name.replace('-', ' ').title()} (Working)"
-
-                if game['latest_version']:
-                    link_url = f"/games/{app_name}/releases/{game['latest_version']}/{entry_point}"
-                    link_text = f"{app_name.replace('-', ' ').title()} (v{game['latest_version']})"
-                elif not os.path.isdir(os.path.join(GAMES_DIR, app_name, 'working')):
-                     link_text = f"{app_name.replace('-', ' ').title()} (No working or released version found)"
-                     link_url = "#" # No valid link
-
-                # Basic structure, assuming similar style to original index.html
-                # TODO: Add creation date/author if needed (would require storing metadata)
-                game_list_html += f"""
+# index.html is served as-is apart from this placeholder (present only in hand-made templates)
+INDEX_PLACEHOLDER = "<!-- GAME_LIST_PLACEHOLDER -->"
+_rendered_game_list = (None, None) # (catalog etag, list html) of the last page rendered
+
+def render_game_list_items(game_details):
+    """Yields the <li> markup injected into the index page, one game at a time."""
+    if not game_details:
+        yield "<li>No games found or error loading games.</li>"
+        return
+    for game in game_details:
+        app_name = game['name']
+        entry_point = game['entry_point']
+        link_url = f"/games/{app_name}/working/{entry_point}" # Default to working
+        link_text = f"{app_name.replace('-', ' ').title()} (Working)"
+
+        if game['latest_version']:
+            link_url = f"/games/{app_name}/releases/{game['latest_version']}/{entry_point}"
+            link_text = f"{app_name.replace('-', ' ').title()} (v{game['latest_version']})"
+        elif not os.path.isdir(os.path.join(GAMES_DIR, app_name, 'working')):
+             link_text = f"{app_name.replace('-', ' ').title()} (No working or released version found)"
+             link_url = "#" # No valid link
+
+        # Basic structure, assuming similar style to original index.html
+        # TODO: Add creation date/author if needed (would require storing metadata)
+        yield f"""
                 <li>
                     <a href="{link_url}">{link_text}</a>
                 </li>
                 """
 
-        # Replace placeholder in the template
-        # Use a specific, unique placeholder comment
-        placeholder = "<!-- GAME_LIST_PLACEHOLDER -->"
-        final_content = template_content.replace(placeholder, game_list_html)
+def stream_index_page(template, snapshot):
+    """
+    Yields the index page in chunks: the template head straight away, then the game list
+    (reused if this catalog revision was rendered before), then the template tail.
+    """
+    global _rendered_game_list
+    yield template.head
+    if template.tail is None:
+        return # No placeholder: nothing to render
+    cached_etag, cached_html = _rendered_game_list
+    if cached_etag == snapshot.etag:
+        yield cached_html
+    else:
+        started = time.perf_counter()
+        parts = []
+        for item in render_game_list_items(snapshot.data):
+            parts.append(item)
+            yield item
+        _rendered_game_list = (snapshot.etag, "".join(parts))
+        metrics.observe_span('index.render', time.perf_counter() - started)
+    yield template.tail
 
-        return Response(final_content, mimetype='text/html')
+@app.route('/')
+def index_page():
+    """Serves the main index HTML page, dynamically injecting game links."""
+    template_path = os.path.join(REPO_ROOT, 'index.html')
+    try:
+        with metrics.span('index.template'):
+            # Pre-split around the placeholder; only re-read when index.html's mtime changes
+            template = page_template.load_template(template_path, INDEX_PLACEHOLDER)
+
+        with metrics.span('index.catalog'):
+            snapshot = catalog.get()
+
+        # The page depends on both the catalog and the index.html template
+        page_etag = f"{snapshot.etag}-{int(template.mtime * 1000)}"
+        last_modified = max(snapshot.last_modified, template.mtime)
+        if request.if_none_match.contains(page_etag):
+            return conditional_response(Response(), page_etag, last_modified)
+        # Streamed, so the first bytes leave before the game list is rendered
+        response = Response(stream_index_page(template, snapshot), mimetype='text/html')
+        return conditional_response(response, page_etag, last_modified)
 
     except FileNotFoundError:
         print(f"Error: index.html template not found at {template_path}", file=sys.stderr)
@@ -162,6 +403,34 @@ def admin_js():
     """Serves the admin JavaScript file."""
     return send_from_directory(ADMIN_DIR, 'admin.js')
 
+def send_game_file(directory, filename, **kwargs):
+    """
+    Sends a file from under GAMES_DIR, honouring Range and conditional requests in every mode.
+    kwargs are passed to send_from_directory (mimetype, etag, max_age).
+    In 'x-accel' mode Python only builds the headers (and answers 304s); nginx streams the bytes
+    and handles Range itself, so no worker is tied up for the transfer.
+    """
+    if STATIC_OFFLOAD != 'x-accel':
+        return send_from_directory(directory, filename, **kwargs)
+
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    rel_path = os.path.relpath(path, GAMES_DIR).replace(os.sep, '/')
+    response = Response(mimetype=kwargs.get('mimetype') or mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + url_quote(rel_path)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.last_modified = stat.st_mtime
+    # Same fallback ETag shape werkzeug uses when no precomputed one is available
+    response.set_etag(kwargs.get('etag') or f"{stat.st_mtime}-{stat.st_size}")
+    if kwargs.get('max_age') is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = kwargs['max_age']
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 # Serve files from a game's 'working' directory
 @app.route('/games/<app_name>/working/<path:filename>')
 def serve_game_working_file(app_name, filename):
@@ -170,7 +439,94 @@ def serve_game_working_file(app_name, filename):
     if not os.path.exists(os.path.join(working_dir, filename)):
          abort(404)
     if '..' in filename or filename.startswith('/'): abort(400)
-    return send_from_directory(working_dir, filename)
+    with metrics.span('files.working'):
+        if LIVE_RELOAD and working_tree_watcher.running and filename.lower().endswith(('.html', '.htm')):
+            response = live_reload_page(app_name, os.path.join(working_dir, filename))
+        else:
+            response = send_game_file(working_dir, filename)
+    # Working files change constantly: always revalidate (cheap 304s via ETag/Last-Modified)
+    response.cache_control.no_cache = True
+    response.cache_control.max_age = 0
+    return response
+
+def live_reload_page(app_name, path):
+    """Serves a working HTML file with the script that reloads it when the game's working dir changes."""
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+        document = f.read()
+    # Changes after this sequence number are delivered as soon as the page connects, so none are missed
+    events_url = working_watcher.events_url(app_name, working_tree_watcher.sequence)
+    body = working_watcher.inject_live_reload(document, events_url).encode('utf-8', 'surrogateescape')
+    response = Response(body, mimetype=mimetypes.guess_type(path)[0] or 'text/html')
+    response.set_etag(hashlib.sha1(body).hexdigest())
+    return response.make_conditional(request)
+
+@app.route('/api/preview/<app_name>/events', methods=['GET'])
+def stream_preview_events(app_name):
+    """Streams changes to a game's working dir as Server-Sent Events ('change'), for live reload."""
+    if not working_tree_watcher.running or not os.path.isdir(os.path.join(GAMES_DIR, app_name, 'working')):
+        abort(404)
+    # EventSource sends Last-Event-ID on reconnect; otherwise start after the page's own sequence number
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    since = request.args.get('since', '')
+    start = int(last_event_id) if last_event_id.isdigit() else int(since) if since.isdigit() else working_tree_watcher.sequence
+    return Response(working_watcher.sse_events(working_tree_watcher, app_name, start), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Precompressed siblings written by release_manager, in order of preference
+PRECOMPRESSED_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Release directories are write-once, so their files can be cached for a year without revalidation
+RELEASE_MAX_AGE = 31536000
+_release_manifests = {} # release dir -> files dict from .release-manifest.json
+_release_manifests_lock = threading.Lock()
+
+def get_release_manifest(release_dir):
+    """Returns the 'files' dict of a release's manifest (cached forever), or {} if it has none."""
+    files = _release_manifests.get(release_dir)
+    if files is not None:
+        metrics.inc('fun_cache_requests_total', {'cache': 'release_manifest', 'result': 'hits'})
+        return files
+    metrics.inc('fun_cache_requests_total', {'cache': 'release_manifest', 'result': 'misses'})
+    try:
+        with open(os.path.join(release_dir, release_manager.RELEASE_MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            files = json.load(f).get('files', {})
+    except (OSError, ValueError):
+        return {} # Older release without a manifest; don't cache the miss
+    with _release_manifests_lock:
+        _release_manifests[release_dir] = files
+    return files
+
+def send_precompressed(directory, filename, manifest=None, max_age=None):
+    """
+    Serves filename from directory, using a precompressed .br/.gz sibling when the client
+    accepts that encoding. Falls back to the plain file otherwise.
+    If a release manifest is given, its precomputed hash is used as the strong ETag.
+    In 'x-accel' mode the plain file is always redirected to: nginx drops Content-Encoding,
+    ETag and Vary from an X-Accel-Redirect response, so it picks the sibling itself
+    (gzip_static/brotli_static in the internal location) and sends its own validators.
+    """
+    if STATIC_OFFLOAD == 'x-accel':
+        return send_game_file(directory, filename, max_age=max_age)
+    variants = [(encoding, suffix) for encoding, suffix in PRECOMPRESSED_ENCODINGS
+                if os.path.isfile(os.path.join(directory, filename + suffix))]
+    served_name, encoding = filename, None
+    for candidate_encoding, suffix in variants:
+        if request.accept_encodings.quality(candidate_encoding) > 0:
+            served_name, encoding = filename + suffix, candidate_encoding
+            break
+
+    kwargs = {'max_age': max_age}
+    entry = (manifest or {}).get(served_name.replace(os.sep, '/'))
+    if entry:
+        kwargs['etag'] = entry['etag']
+    if encoding:
+        kwargs['mimetype'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_game_file(directory, served_name, **kwargs)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if variants:
+        response.vary.add('Accept-Encoding') # Caches must not reuse one encoding for another client
+    return response
 
 # Serve files from a game's specific release version directory
 @app.route('/games/<app_name>/releases/<version>/<path:filename>')
@@ -180,52 +536,302 @@ def serve_game_release_file(app_name, version, filename):
     if not os.path.exists(os.path.join(release_dir, filename)):
         abort(404)
     if '..' in filename or filename.startswith('/'): abort(400)
-    return send_from_directory(release_dir, filename)
+    with metrics.span('files.release'):
+        response = send_precompressed(release_dir, filename, get_release_manifest(release_dir), max_age=RELEASE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+# Whole-release zip archives written by release_manager (reproducible, so cacheable like releases)
+@app.route('/games/<app_name>/archives/<filename>')
+def serve_game_archive(app_name, filename):
+    """Serves a release archive as a download; Range requests let clients resume large downloads."""
+    archives_dir = os.path.join(GAMES_DIR, app_name, release_manager.ARCHIVES_DIRNAME)
+    if not filename.endswith('.zip') or not os.path.isfile(os.path.join(archives_dir, filename)):
+        abort(404)
+    if '..' in filename or filename.startswith('/'): abort(400)
+    with metrics.span('files.archive'):
+        response = send_game_file(archives_dir, filename, mimetype='application/zip', max_age=RELEASE_MAX_AGE)
+    response.cache_control.immutable = True
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 # --- API Endpoints ---
 
+CATALOG_FIELDS = ('name', 'has_updates', 'latest_version', 'all_versions', 'entry_point')
+MAX_PAGE_SIZE = 500
+
+def parse_fields(value):
+    """Parses a `fields=` projection; the name is always included. Raises ValueError on unknown fields."""
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in CATALOG_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Valid fields: {', '.join(CATALOG_FIELDS)}")
+    return ['name'] + [field for field in fields if field != 'name']
+
+def project(games, fields):
+    if fields is None:
+        return games
+    return [{field: game[field] for field in fields} for game in games]
+
+def catalog_headers(response, snapshot):
+    """Tells clients which catalog revision (and epoch) a response was built from, for /api/apps/changes."""
+    response.headers['X-Catalog-Revision'] = str(snapshot.revision)
+    response.headers['X-Catalog-Epoch'] = snapshot.epoch
+    return response
+
 @app.route('/api/apps', methods=['GET'])
 def get_apps():
-    """API endpoint to get game details."""
-    apps_data = get_game_details()
-    if not apps_data:
+    """
+    API endpoint to get game details, sorted by name. Optional query parameters:
+      prefix=<text>       only games whose name starts with text
+      fields=a,b          only these fields of each game (name is always included)
+      limit=<n>&cursor=<c>  one page of at most n games, starting after cursor;
+                          the next page's cursor is in the X-Next-Cursor and Link headers
+    Without limit, the whole (filtered) list is returned, as before.
+    """
+    snapshot = catalog.get()
+    if not snapshot.data:
         # You might want to return a specific error structure if get_game_details failed internally
         # For now, just return empty list or a generic error if needed
         pass # get_game_details handles printing errors
-    return jsonify(apps_data)
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        limit = request.args.get('limit', type=int)
+        if 'limit' in request.args and (limit is None or not 1 <= limit <= MAX_PAGE_SIZE):
+            raise ValueError(f"'limit' must be an integer between 1 and {MAX_PAGE_SIZE}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # The body only depends on the catalog and the query string, both of which the URL and ETag cover
+    if request.if_none_match.contains(snapshot.etag):
+        return catalog_headers(conditional_response(Response(), snapshot.etag, snapshot.last_modified), snapshot)
+
+    prefix = request.args.get('prefix', '')
+    cursor = request.args.get('cursor', '')
+    games = [game for game in snapshot.data if game['name'].startswith(prefix) and game['name'] > cursor]
+    next_cursor = None
+    if limit is not None and len(games) > limit:
+        games = games[:limit]
+        next_cursor = games[-1]['name']
+
+    response = conditional_response(jsonify(project(games, fields)), snapshot.etag, snapshot.last_modified)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+        next_args = dict(request.args.items(), cursor=next_cursor)
+        query = '&'.join(f"{url_quote(key)}={url_quote(value)}" for key, value in next_args.items())
+        response.headers['Link'] = f'<{request.path}?{query}>; rel="next"'
+    return catalog_headers(response, snapshot)
+
+@app.route('/api/apps/changes', methods=['GET'])
+def get_app_changes():
+    """
+    Delta endpoint: games changed (or removed) since catalog revision `since` of epoch `epoch`,
+    both as reported by a previous response. If the epoch no longer matches (the server
+    restarted) or is missing, every game is returned with "full": true.
+    Accepts the same `fields=` projection as /api/apps.
+    """
+    snapshot = catalog.get()
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        try:
+            since = int(request.args.get('since', '0'))
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ValueError("'since' must be a non-negative integer")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    full = request.args.get('epoch') != snapshot.epoch or since > snapshot.revision
+    if full:
+        changed, removed = snapshot.data, []
+    else:
+        changed, removed = catalog.changes_since(snapshot, since)
+    response = jsonify({
+        "epoch": snapshot.epoch,
+        "revision": snapshot.revision,
+        "full": full,
+        "changed": project(changed, fields),
+        "removed": removed,
+    })
+    response.headers['Cache-Control'] = 'no-cache'
+    return catalog_headers(response, snapshot)
+
+
+def run_release(job):
+    """Runs the release in-process, streaming its output into the job."""
+    out, err = JobOutput(job, 'stdout'), JobOutput(job, 'stderr')
+    metrics.observe_span('release.queue_wait', job.started_at - job.created_at)
+    try:
+        with metrics.span('release.run'):
+            return release_manager.release(job.app_name, job.version_tag, git_root=REPO_ROOT, out=out, err=err,
+                                           optimize={} if OPTIMIZE_ASSETS else None)
+    finally:
+        out.flush()
+        err.flush()
 
+def release_job_finished(job, exit_code):
+    """Logs the job result and makes sure the next catalog read sees the new release."""
+    print(f"Release job {job.id} ({job.app_name} {job.version_tag}) finished with exit code {exit_code}")
+    catalog.invalidate() # Even a failed release may have left files behind
+
+release_jobs = ReleaseJobManager(run_release, max_workers=2, on_finish=release_job_finished)
+
+def job_urls(job):
+    return {"status_url": f"/api/jobs/{job.id}", "events_url": f"/api/jobs/{job.id}/events"}
 
 @app.route('/api/release', methods=['POST'])
 def create_release():
-    """Triggers the release manager script."""
+    """Queues a release job and returns its id immediately (202 Accepted)."""
     data = request.get_json()
     if not data or 'app_name' not in data or 'version_tag' not in data:
         return jsonify({"error": "Missing 'app_name' or 'version_tag' in request body"}), 400
 
     app_name = data['app_name']
     version_tag = data['version_tag']
-    script_path = os.path.join(ADMIN_DIR, 'release_manager.py') # Path inside admin dir
+    if not isinstance(app_name, str) or not isinstance(version_tag, str):
+        return jsonify({"error": "'app_name' and 'version_tag' must be strings"}), 400
+
+    try:
+        with metrics.span('release.submit'):
+            job = release_jobs.submit(app_name, version_tag)
+    except JobQueueFull as e:
+        return jsonify({"success": False, "message": f"Too many releases in progress: {e}. Try again shortly."}), 503
+
+    response = jsonify({"success": True, "job_id": job.id, "status": job.status,
+                        "message": f"Release {version_tag} for {app_name} queued.", **job_urls(job)})
+    response.status_code = 202
+    response.headers['Location'] = job_urls(job)['status_url']
+    return response
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Lists recent release jobs (without their output)."""
+    return jsonify([dict(job.to_dict(include_output=False), **job_urls(job)) for job in release_jobs.list()])
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Returns a release job's status and captured output."""
+    job = release_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(dict(job.to_dict(), **job_urls(job)))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Streams a release job's output as Server-Sent Events, ending with an 'end' event."""
+    job = release_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    # EventSource sends Last-Event-ID on reconnect; resume after that line
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    return Response(sse_events(job, start), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint: request latencies, phase timings, subprocess counts and cache hit rates."""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8',
+                    headers={'Cache-Control': 'no-store'})
+
+# --- Production serving ---
 
-    if not os.path.isfile(script_path):
-         return jsonify({"error": f"Release script not found: {script_path}"}), 500
+# Served only on the admin listener in --serve mode
+ADMIN_PATH_PREFIXES = ('/admin', '/api/', '/metrics')
 
+class PublicOnly:
+    """WSGI middleware for the public listener: the admin UI and API answer 404 there."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(ADMIN_PATH_PREFIXES):
+            return NotFound()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+def run_admin_server(host, port):
+    """Runs the admin UI/API on a small threaded server (release jobs live in this process)."""
+    start_watchers()
+    print(f"Admin panel listening on http://{host}:{port}/admin")
+    make_server(host, port, app, threaded=True).serve_forever()
+
+def serve(host, port, workers, threads, admin_host, admin_port):
+    """
+    Serves the public routes (/ and /games/...) under a production WSGI server: gunicorn
+    (workers x threads) where available, otherwise waitress (threads). The admin routes run
+    in a separate process on admin_host:admin_port unless admin_port is None.
+    """
+    if not metrics.shared_dir:
+        # Workers and the admin listener each publish their samples here; /metrics sums them
+        metrics.shared_dir = tempfile.mkdtemp(prefix='fun-metrics-')
+        os.environ['FUN_METRICS_DIR'] = metrics.shared_dir # Inherited by the admin listener
+        metrics_pid = os.getpid()
+        atexit.register(lambda: os.getpid() == metrics_pid and shutil.rmtree(metrics.shared_dir, ignore_errors=True))
+    if admin_port is not None:
+        # A separate interpreter rather than multiprocessing, so forked gunicorn workers don't inherit it
+        admin_process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--admin-only',
+                                          '--admin-host', admin_host, '--admin-port', str(admin_port)])
+        server_pid = os.getpid()
+        # Forked workers inherit atexit hooks; only the process that started the admin listener stops it
+        atexit.register(lambda: os.getpid() == server_pid and admin_process.terminate())
+
+    public_app = PublicOnly(app)
     try:
-        command = f'"{sys.executable}" "{script_path}" "{app_name}" "{version_tag}"'
-        print(f"Running command: {command}")
-        stdout, stderr, exit_code = run_command(command, cwd=REPO_ROOT)
-        print(f"Script stdout:\n{stdout}")
-        print(f"Script stderr:\n{stderr}")
-        print(f"Script exit code: {exit_code}")
-
-        if exit_code == 0:
-            return jsonify({"success": True, "message": f"Release {version_tag} for {app_name} created successfully.", "details": stdout})
-        else:
-            error_details = f"Exit Code: {exit_code}\nOutput:\n{stdout}\nError Output:\n{stderr}"
-            return jsonify({"success": False, "message": f"Failed to create release {version_tag} for {app_name}.", "details": error_details}), 500
+        if os.name == 'nt':
+            raise ImportError("gunicorn does not run on Windows")
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class PublicApplication(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', [f"{host}:{port}"])
+                self.cfg.set('workers', workers)
+                self.cfg.set('threads', threads)
+                self.cfg.set('worker_class', 'gthread')
+
+            def load(self):
+                return public_app
+
+        print(f"Serving games on http://{host}:{port}/ with gunicorn ({workers} workers x {threads} threads)")
+        PublicApplication().run()
+        return
 
-    except Exception as e:
-        print(f"Error calling release script: {e}", file=sys.stderr)
-        return jsonify({"success": False, "message": "An unexpected error occurred while trying to create the release."}), 500
+    try:
+        import waitress
+    except ImportError:
+        print("Error: --serve needs a production WSGI server.", file=sys.stderr)
+        print("Please install one using: pip install gunicorn (Linux/macOS) or pip install waitress", file=sys.stderr)
+        sys.exit(1)
+    print(f"Serving games on http://{host}:{port}/ with waitress ({workers * threads} threads)")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0)) # Run atexit hooks (stopping the admin listener)
+    waitress.serve(public_app, host=host, port=port, threads=workers * threads)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Admin panel and game server for the fun repository.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run under a production server (gunicorn/waitress) instead of the Flask debug server.")
+    parser.add_argument("--host", default="0.0.0.0", help="Public listener address for --serve (default: 0.0.0.0).")
+    parser.add_argument("--port", type=int, default=8000, help="Public listener port for --serve (default: 8000).")
+    parser.add_argument("--workers", type=int, default=min(2 * (os.cpu_count() or 1) + 1, 9),
+                        help="Worker processes for --serve (default: 2 x CPUs + 1, at most 9).")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per worker for --serve (default: 4).")
+    parser.add_argument("--admin-host", default="127.0.0.1", help="Admin listener address for --serve (default: 127.0.0.1).")
+    parser.add_argument("--admin-port", type=int, default=5001, help="Admin listener port for --serve (default: 5001).")
+    parser.add_argument("--no-admin", action="store_true", help="With --serve, don't start the admin listener at all.")
+    parser.add_argument("--admin-only", action="store_true", help="Run only the admin listener (started by --serve).")
+    args = parser.parse_args()
+
+    if args.admin_only:
+        run_admin_server(args.admin_host, args.admin_port)
+    elif args.serve:
+        serve(args.host, args.port, args.workers, args.threads,
+              args.admin_host, None if args.no_admin else args.admin_port)
+    else:
+        start_watchers()
+        app.run(host='0.0.0.0', port=5001, debug=True, threaded=True) # Threads keep SSE streams from blocking other requests
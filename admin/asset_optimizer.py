@@ -0,0 +1,277 @@
+# Purpose: Optional asset optimization stage for releases. Minifies HTML, CSS and JS
+#          (stripping comments and insignificant whitespace) and re-encodes audio at a
+#          target bitrate, writing the results into a staging tree that release_manager
+#          then snapshots in place of working/. Work runs in worker processes (see
+#          admin/asset_worker.py), and every result is cached under .asset_cache/ by the SHA-256 of its input (plus the
+#          optimizer version and options), so unchanged assets are never reprocessed.
+#          An optimized file is used only if it is smaller than the original.
+# Usage: release_manager.py <app_name> <version_tag> --optimize [--audio-bitrate 96k] [--trim-silence]
+#        Optimizers are pluggable: register_optimizer() adds one for a set of extensions.
+#        FUN_OPTIMIZER_PLUGINS names (comma-separated) modules imported here that register more
+#        (workers are separate interpreters and import them again, so plugins must be registered this way).
+#        JS minification needs 'rjsmin' (pip install rjsmin); audio needs ffmpeg on the PATH.
+
+import hashlib
+import importlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import rjsmin # Optional: pip install rjsmin (enables JavaScript minification)
+except ImportError:
+    rjsmin = None
+
+CACHE_DIRNAME = '.asset_cache' # Under the repo root; derived data, ignored by git
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asset_worker.py')
+DEFAULT_OPTIONS = {'audio_bitrate': '96k', 'trim_silence': False}
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# check() returns None when the optimizer can run here, or a note saying what is missing.
+# options lists the option names that affect its output (and so belong in its cache key).
+Optimizer = namedtuple('Optimizer', ['name', 'version', 'extensions', 'func', 'check', 'options'])
+OPTIMIZERS = {} # extension -> Optimizer
+
+def register_optimizer(name, extensions, version='1', check=None, options=()):
+    """
+    Decorator registering func(src_path, dst_path, options) as the optimizer for extensions.
+    func writes the optimized file to dst_path and raises on failure (the original is kept).
+    Bump version whenever func's output changes, so cached results are not reused.
+    """
+    def decorator(func):
+        optimizer = Optimizer(name, version, tuple(extensions), func, check or (lambda: None), tuple(options))
+        for extension in optimizer.extensions:
+            OPTIMIZERS[extension.lower()] = optimizer
+        return func
+    return decorator
+
+# --- Text minifiers ---
+
+CSS_SPACE = r'(?:\s|/\*(?!!).*?\*/)' # Whitespace or a comment; /*! license */ comments are kept
+CSS_TOKEN = re.compile(
+    r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')'          # 1: strings, copied as-is
+    rf'|((?:{CSS_SPACE}*;)+{CSS_SPACE}*(?=\}}))'           # 2: semicolons before a closing brace, dropped
+    rf'|{CSS_SPACE}*([{{}};,>]){CSS_SPACE}*'               # 3: punctuation, without the space around it
+    rf'|(:){CSS_SPACE}+'                                   # 4: colons, without the space after them
+    rf'|{CSS_SPACE}+', re.S)                               # other whitespace/comments: a single space
+
+def minify_css(css):
+    """Strips comments and insignificant whitespace from a stylesheet."""
+    def replace(match):
+        string, semicolons, punctuation, colon = match.groups()
+        if string:
+            return string
+        if semicolons:
+            return ''
+        return punctuation or colon or ' '
+    return CSS_TOKEN.sub(replace, css).strip()
+
+def minify_js(js):
+    """Minifies a script with rjsmin, keeping /*! license */ comments."""
+    return rjsmin.jsmin(js, keep_bang_comments=True)
+
+JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+HTML_TOKEN = re.compile(
+    r'(<!--\[if.*?-->|<!\[endif\]-->)'                                     # 1: conditional comments, kept
+    r'|<!--.*?-->'                                                         # other comments, dropped
+    r'|(<(script|style|pre|textarea)\b([^>]*)>)(.*?)(</\3\s*>)'            # 2-6: raw blocks
+    r'|(<[A-Za-z/!?][^>]*>)'                                               # 7: tags, copied as-is
+    r'|(\s+)', re.S | re.I)                                                # 8: whitespace in text
+SCRIPT_TYPE = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]*)', re.I)
+
+def minify_html(html):
+    """
+    Drops comments, collapses whitespace between tags and text (to a newline if it
+    contained one, else a space), minifies inline <style> and (with rjsmin) <script>
+    blocks, and leaves <pre> and <textarea> contents untouched.
+    """
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        if match.group(2):
+            open_tag, tag, attributes, body, close_tag = match.group(2, 3, 4, 5, 6)
+            tag = tag.lower()
+            if tag == 'style':
+                body = minify_css(body)
+            elif tag == 'script' and rjsmin is not None and body.strip():
+                script_type = SCRIPT_TYPE.search(attributes)
+                if (script_type.group(1).lower() if script_type else '') in JS_TYPES:
+                    body = minify_js(body).strip()
+            return open_tag + body + close_tag
+        if match.group(7):
+            return match.group(7)
+        if match.group(8):
+            return '\n' if '\n' in match.group(8) else ' '
+        return '' # A comment
+    return HTML_TOKEN.sub(replace, html).strip() + '\n'
+
+def _text_optimizer(minify):
+    def optimize(src_path, dst_path, options):
+        with open(src_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with open(dst_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(minify(text))
+    return optimize
+
+register_optimizer('html', ('.html', '.htm'), version=f"1-js:{getattr(rjsmin, '__version__', 'none')}")(_text_optimizer(minify_html))
+register_optimizer('css', ('.css',))(_text_optimizer(minify_css))
+register_optimizer('js', ('.js', '.mjs'), version=f"1-{getattr(rjsmin, '__version__', 'none')}",
+                   check=lambda: None if rjsmin is not None else "install 'rjsmin' (pip install rjsmin) to minify JavaScript")(
+    _text_optimizer(minify_js))
+
+# --- Audio ---
+
+# extension -> (ffmpeg encoder, container format)
+AUDIO_ENCODERS = {'.mp3': ('libmp3lame', 'mp3'), '.ogg': ('libvorbis', 'ogg'), '.m4a': ('aac', 'ipod'), '.aac': ('aac', 'adts')}
+# Leading and trailing silence removal (trailing via reversing the stream twice)
+TRIM_SILENCE_FILTER = ('silenceremove=start_periods=1:start_threshold=-60dB,areverse,'
+                       'silenceremove=start_periods=1:start_threshold=-60dB,areverse')
+
+@register_optimizer('audio', AUDIO_ENCODERS, check=lambda: None if shutil.which('ffmpeg') else
+                    "ffmpeg was not found on the PATH, so audio was not re-encoded",
+                    options=('audio_bitrate', 'trim_silence'))
+def transcode_audio(src_path, dst_path, options):
+    """Re-encodes the first audio stream at options['audio_bitrate'], dropping metadata and cover art."""
+    encoder, container = AUDIO_ENCODERS[os.path.splitext(src_path)[1].lower()]
+    command = [shutil.which('ffmpeg'), '-nostdin', '-v', 'error', '-y', '-i', src_path,
+               '-map', '0:a:0', '-map_metadata', '-1', '-fflags', '+bitexact', '-flags:a', '+bitexact']
+    if options.get('trim_silence'):
+        command += ['-af', TRIM_SILENCE_FILTER]
+    command += ['-c:a', encoder, '-b:a', str(options['audio_bitrate']), '-f', container, dst_path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip() or result.returncode}")
+
+# --- Plugins ---
+
+for _module_name in filter(None, (name.strip() for name in os.environ.get('FUN_OPTIMIZER_PLUGINS', '').split(','))):
+    # Imported here (rather than by the caller) so process pool workers register them too
+    try:
+        importlib.import_module(_module_name)
+    except ImportError as e:
+        print(f"Warning: Could not import optimizer plugin '{_module_name}': {e}", file=sys.stderr)
+
+# --- Optimizing a tree ---
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(optimizer, digest, options):
+    """The cache file name for optimizer's output on an input with the given SHA-256."""
+    settings = json.dumps({name: options.get(name) for name in optimizer.options}, sort_keys=True)
+    return hashlib.sha256(f"{optimizer.name}\0{optimizer.version}\0{settings}\0{digest}".encode('utf-8')).hexdigest()
+
+def optimize_into_cache(src_path, cache_path, options):
+    """Optimizes src_path and atomically stores the result at cache_path (in a worker process, or inline)."""
+    optimizer = OPTIMIZERS[os.path.splitext(src_path)[1].lower()]
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        optimizer.func(src_path, tmp_path, options)
+        os.replace(tmp_path, cache_path) # Concurrent releases may race; either result is identical
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _run_worker(tasks, options):
+    """Optimizes a batch of (src, cache_path) in a worker process. Returns {src: error message or None}."""
+    payload = json.dumps({'sys_path': sys.path, 'options': options, 'tasks': tasks})
+    result = subprocess.run([sys.executable, WORKER_SCRIPT], input=payload, capture_output=True, text=True)
+    try:
+        results = json.loads(result.stdout)
+    except ValueError:
+        stderr = result.stderr.strip().splitlines()
+        error = f"optimizer worker failed: {stderr[-1] if stderr else f'exit code {result.returncode}'}"
+        return {src: error for src, _ in tasks}
+    return {src: results.get(src, "no result from optimizer worker") for src, _ in tasks}
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def optimize_tree(src_dir, dst_dir, cache_dir, options=None, jobs=None, log=print):
+    """
+    Fills dst_dir with src_dir's files, replacing each optimizable one by its (cached or
+    newly computed) optimized version when that is smaller. Other files are hard-linked
+    (or copied). Cache misses are optimized in parallel on a process pool.
+    A file whose optimizer fails is kept unchanged and reported. Returns a stats dict.
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    stats = {'optimized': 0, 'cached': 0, 'kept': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+    notes = set()
+    planned = [] # (src, dst, cache_path or None)
+    for root, dirs, files in os.walk(src_dir, followlinks=True):
+        target_root = os.path.normpath(os.path.join(dst_dir, os.path.relpath(root, src_dir)))
+        os.makedirs(target_root, exist_ok=True)
+        shutil.copystat(root, target_root) # Also replaces the staging root's private mkdtemp mode
+        for name in files:
+            src, dst = os.path.join(root, name), os.path.join(target_root, name)
+            optimizer = OPTIMIZERS.get(os.path.splitext(name)[1].lower())
+            note = optimizer.check() if optimizer is not None else None
+            if note:
+                notes.add(note)
+            if optimizer is None or note:
+                planned.append((src, dst, None))
+                continue
+            key = cache_key(optimizer, _file_digest(src), options)
+            planned.append((src, dst, os.path.join(cache_dir, key[:2], key)))
+
+    misses = sorted({(src, cache_path) for src, _, cache_path in planned if cache_path and not os.path.exists(cache_path)})
+    failed = {}
+    if misses:
+        for _, cache_path in misses:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        jobs = jobs or min(8, os.cpu_count() or 1)
+        if jobs <= 1 or len(misses) == 1:
+            for src, cache_path in misses:
+                try:
+                    optimize_into_cache(src, cache_path, options)
+                except Exception as e:
+                    failed[src] = e
+        else:
+            # Minifiers are pure Python, so processes (not threads) are what run them in parallel.
+            # Each worker is a fresh interpreter running asset_worker.py on a share of the misses:
+            # unlike a multiprocessing pool, that neither forks the threaded admin server (whose
+            # locks a child would inherit in any state) nor re-imports it in every worker.
+            workers = min(jobs, len(misses))
+            batches = [misses[i::workers] for i in range(workers)]
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asset-worker') as executor:
+                for results in executor.map(lambda batch: _run_worker(batch, options), batches):
+                    failed.update((src, RuntimeError(error)) for src, error in results.items() if error is not None)
+
+    for src, dst, cache_path in planned:
+        size = os.path.getsize(src)
+        stats['bytes_before'] += size
+        if cache_path is None or src in failed:
+            if src in failed:
+                stats['failed'] += 1
+                log(f"Warning: Could not optimize {os.path.relpath(src, src_dir)}: {failed[src]}")
+            _link_or_copy(src, dst)
+            stats['bytes_after'] += size
+            continue
+        optimized_size = os.path.getsize(cache_path)
+        if optimized_size < size:
+            _link_or_copy(cache_path, dst)
+            stats['bytes_after'] += optimized_size
+            stats['optimized'] += 1
+            if (src, cache_path) not in misses:
+                stats['cached'] += 1
+        else:
+            _link_or_copy(src, dst)
+            stats['bytes_after'] += size
+            stats['kept'] += 1
+
+    log(f"Optimized {stats['optimized']} asset(s) ({stats['cached']} from cache, {stats['kept']} already smallest): "
+        f"{stats['bytes_before']} -> {stats['bytes_after']} bytes.")
+    for note in sorted(notes):
+        log(f"Note: {note}.")
+    return stats
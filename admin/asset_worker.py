@@ -0,0 +1,26 @@
+# Purpose: Worker process for admin/asset_optimizer.py. Reads a batch of cache misses as JSON
+#          on stdin, optimizes each one into the asset cache, and writes {source path: error
+#          message or null} as JSON to stdout. It is started as a script of its own, so a worker
+#          imports only the optimizers: multiprocessing would re-run the program that started
+#          the release (e.g. the whole admin server, as __mp_main__) in every worker.
+# Usage: Started by asset_optimizer.optimize_tree(); not meant to be run by hand.
+
+import json
+import sys
+
+def main():
+    batch = json.load(sys.stdin)
+    sys.path[:0] = batch['sys_path'] # Resolve plugins (FUN_OPTIMIZER_PLUGINS) like the parent does
+    results_out, sys.stdout = sys.stdout, sys.stderr # Optimizers' own output mustn't mix with the results
+    import asset_optimizer
+    results = {}
+    for src, cache_path in batch['tasks']:
+        try:
+            asset_optimizer.optimize_into_cache(src, cache_path, batch['options'])
+            results[src] = None
+        except Exception as e:
+            results[src] = str(e) or type(e).__name__
+    json.dump(results, results_out)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# Purpose: Process-wide cache for the admin server's game catalog
+#          (the result of admin_server.get_game_details()).
+#          The catalog is rebuilt only when something under games/ changes:
+#          either an inotify watcher reports an event, or (without inotify)
+#          a cheap mtime signature of games/*/releases, every directory under
+#          games/*/working and the git index differs from the one recorded at the
+#          last build. Edits inside existing working files don't change any of
+#          these; the admin server reports them from its working dir watcher
+#          through invalidate() (has_updates, from git status, depends on them).
+#          With a shared_path, processes (e.g. server workers) publish each build to a
+#          JSON file so the others reuse it instead of rescanning, and all of them
+#          agree on the catalog revision.
+#          Each snapshot also records the revision at which every game last changed
+#          (and when removed games disappeared), so clients can ask for a delta.
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+try:
+    # Optional: pip install inotify_simple (Linux only)
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None # Fall back to mtime polling
+
+# epoch identifies a revision sequence: revisions from different epochs (server runs) are not comparable
+# game_revisions maps each game to the revision it last changed in; removed maps vanished games likewise
+CatalogSnapshot = namedtuple('CatalogSnapshot', ['data', 'etag', 'last_modified', 'revision', 'epoch', 'game_revisions', 'removed'])
+
+def _mtime_ns(path):
+    """Returns the mtime of path in nanoseconds, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _dirs_digest(root):
+    """
+    Returns a digest of the mtimes of every directory under root (None if it does not exist).
+    Catches files being added, removed or renamed at any depth without a stat per file.
+    """
+    if not os.path.isdir(root):
+        return None
+    digest = hashlib.sha1()
+    for path, dirs, _ in os.walk(root):
+        dirs.sort()
+        digest.update(f"{os.path.relpath(path, root)}\0{_mtime_ns(path)}\n".encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+class CatalogCache:
+    """
+    Holds the latest catalog along with a strong ETag and Last-Modified timestamp.
+    `loader` is called (with no arguments) to rebuild the catalog when it is stale; it returns
+    a list of dicts, each identified by its `key` field (the game name).
+    """
+
+    def __init__(self, loader, games_dir, repo_root, check_interval=1.0, shared_path=None, key='name'):
+        self.loader = loader
+        self.key = key
+        self.shared_path = shared_path # JSON file shared between processes, or None
+        self.games_dir = games_dir
+        self.git_index = os.path.join(repo_root, '.git', 'index') # Commits/staging change has_updates
+        self.check_interval = check_interval # Max staleness when polling mtimes
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._dirty = True
+        self._invalidated_at = 0.0 # Shared builds from before this can't have seen the change
+        self._inotify = None
+        self._watches = {} # watch descriptor -> path
+        self._watch_descriptors = {} # path -> watch descriptor
+        self._created_at = time.time() # Shared files older than this come from a previous server run
+        self._epoch = uuid.uuid4().hex[:12]
+        self.stats = {'hits': 0, 'rebuilds': 0, 'shared': 0} # Approximate (unlocked) counters for /metrics
+
+    # --- Change detection ---
+
+    def _signature_for(self):
+        """Builds a tuple of mtimes that changes whenever a game, release or working file is added or removed."""
+        parts = [_mtime_ns(self.games_dir), _mtime_ns(self.git_index)]
+        try:
+            with os.scandir(self.games_dir) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if not entry.is_dir():
+                        continue
+                    parts.append((
+                        entry.name,
+                        entry.stat().st_mtime_ns,
+                        _mtime_ns(os.path.join(entry.path, 'releases')),
+                        _dirs_digest(os.path.join(entry.path, 'working')),
+                    ))
+        except OSError:
+            pass # Missing games dir is reported by the loader
+        return tuple(parts)
+
+    def _is_stale(self):
+        if self._snapshot is None or self._dirty:
+            return True
+        if self._inotify is not None:
+            return False # Watcher flips _dirty; no polling needed
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        return self._signature_for() != self._signature
+
+    def invalidate(self):
+        """Forces the next get() to rebuild the catalog (e.g. after a release or a working file edit)."""
+        self._invalidated_at = time.time()
+        self._dirty = True
+
+    # --- Access ---
+
+    def get(self):
+        """Returns the current CatalogSnapshot, rebuilding it first if it is stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._dirty and (self._inotify is not None or time.monotonic() - self._checked_at < self.check_interval):
+            self.stats['hits'] += 1
+            return snapshot # Fast path: no lock, no syscalls
+
+        with self._lock:
+            if not self._is_stale():
+                self.stats['hits'] += 1
+                return self._snapshot
+            self._dirty = False
+            signature = self._signature_for()
+            signature_key = hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+            shared = self._read_shared()
+            if (shared is not None and shared.get('signature') == signature_key
+                    and shared.get('built_at', 0) >= self._invalidated_at):
+                # Another process already built the catalog for exactly this state of games/
+                self._snapshot = self._from_shared(shared)
+                self.stats['shared'] += 1
+            else:
+                data = self.loader()
+                self.stats['rebuilds'] += 1
+                body = json.dumps(data, sort_keys=True).encode('utf-8')
+                etag = hashlib.sha1(body).hexdigest()
+                latest = self._snapshot
+                if shared is not None and (latest is None or shared['revision'] > latest.revision):
+                    latest = self._from_shared(shared)
+                if latest is not None and latest.etag == etag:
+                    # Nothing visible changed; keep validators so clients still get 304s
+                    self._snapshot = latest._replace(data=data)
+                else:
+                    self._snapshot = self._next_snapshot(latest, data, etag)
+                self._write_shared(signature_key, self._snapshot)
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            if self._inotify is not None:
+                self._sync_watches()
+            return self._snapshot
+
+    def _next_snapshot(self, latest, data, etag):
+        """Builds the snapshot following latest, stamping the current revision on every game that changed."""
+        if latest is None:
+            revision, epoch, game_revisions, removed, previous = 1, self._epoch, {}, {}, {}
+        else:
+            revision, epoch = latest.revision + 1, latest.epoch
+            game_revisions, removed = dict(latest.game_revisions), dict(latest.removed)
+            previous = {item[self.key]: item for item in latest.data}
+        current = {item[self.key]: item for item in data}
+        for name, item in current.items():
+            if previous.get(name) != item:
+                game_revisions[name] = revision
+                removed.pop(name, None)
+        for name in previous.keys() - current.keys():
+            game_revisions.pop(name, None)
+            removed[name] = revision
+        return CatalogSnapshot(data, etag, time.time(), revision, epoch, game_revisions, removed)
+
+    def changes_since(self, snapshot, revision):
+        """
+        Returns (changed items, removed keys) between revision and snapshot.revision,
+        in catalog order. The caller must check the epoch first.
+        """
+        changed = [item for item in snapshot.data if snapshot.game_revisions.get(item[self.key], 0) > revision]
+        removed = sorted(name for name, removed_at in snapshot.removed.items() if removed_at > revision)
+        return changed, removed
+
+    # --- Cross-process sharing ---
+
+    @staticmethod
+    def _from_shared(shared):
+        return CatalogSnapshot(*(shared[field] for field in CatalogSnapshot._fields))
+
+    def _read_shared(self):
+        if not self.shared_path:
+            return None
+        try:
+            with open(self.shared_path, 'r', encoding='utf-8') as f:
+                if os.fstat(f.fileno()).st_mtime < self._created_at:
+                    return None # Possibly built by older code; don't trust its shape
+                shared = json.load(f)
+            if not all(field in shared for field in CatalogSnapshot._fields):
+                return None
+            return shared
+        except (OSError, ValueError):
+            return None
+
+    def _write_shared(self, signature_key, snapshot):
+        if not self.shared_path:
+            return
+        payload = dict(snapshot._asdict(), signature=signature_key, built_at=time.time())
+        tmp_path = f"{self.shared_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.shared_path) # Atomic: readers never see a partial file
+        except OSError as e:
+            print(f"Warning: Could not write shared catalog cache {self.shared_path}: {e}", file=sys.stderr)
+
+    # --- Optional inotify watcher ---
+
+    def start_watcher(self):
+        """Starts a background inotify watcher if inotify_simple is installed. Returns True if started."""
+        if INotify is None or self._inotify is not None:
+            return False
+        try:
+            self._inotify = INotify()
+            with self._lock:
+                self._sync_watches()
+        except OSError as e:
+            print(f"Warning: Could not start inotify watcher, falling back to mtime polling: {e}", file=sys.stderr)
+            self._inotify = None
+            return False
+        thread = threading.Thread(target=self._watch_loop, name='catalog-watcher', daemon=True)
+        thread.start()
+        return True
+
+    def _sync_watches(self):
+        """
+        Adds watches for the games dir, each game dir and its releases dir. Working trees are
+        left to the admin server's working dir watcher, which calls invalidate() on edits.
+        """
+        mask = (inotify_flags.CREATE | inotify_flags.DELETE | inotify_flags.MOVED_FROM |
+                inotify_flags.MOVED_TO | inotify_flags.MODIFY | inotify_flags.CLOSE_WRITE |
+                inotify_flags.DELETE_SELF)
+        paths = [self.games_dir, os.path.dirname(self.git_index)]
+        try:
+            for app_name in os.listdir(self.games_dir):
+                app_dir = os.path.join(self.games_dir, app_name)
+                if os.path.isdir(app_dir):
+                    paths += [app_dir, os.path.join(app_dir, 'releases')]
+        except OSError:
+            pass
+        for path in paths:
+            if path in self._watch_descriptors or not os.path.isdir(path):
+                continue
+            try:
+                wd = self._inotify.add_watch(path, mask)
+                self._watches[wd] = path
+                self._watch_descriptors[path] = wd
+            except OSError:
+                pass # Directory vanished between listdir and add_watch
+
+    def _watch_loop(self):
+        git_dir = os.path.dirname(self.git_index)
+        while True:
+            for event in self._inotify.read():
+                path = self._watches.get(event.wd)
+                if path == git_dir and event.name != 'index':
+                    continue # Ignore lock files and objects
+                if event.mask & inotify_flags.IGNORED:
+                    self._watch_descriptors.pop(self._watches.pop(event.wd, None), None)
+                self._dirty = True
@@ -0,0 +1,252 @@
+# Purpose: Lightweight, dependency-free instrumentation for the admin server:
+#          counters, latency histograms and timing spans, rendered in the Prometheus
+#          text format for GET /metrics, plus an opt-in per-request cProfile toggle.
+#          With a shared_dir (set by --serve), every process (each gunicorn worker and
+#          the admin listener) publishes its samples to <shared_dir>/metrics-<pid>.json
+#          and /metrics adds them all up, so scrapes see the whole server.
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 1.0 # Seconds between writes of this process's samples to shared_dir
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+class Metrics:
+    """
+    A process-wide registry of counters and histograms, keyed by (name, sorted label pairs).
+    `collectors` are called at flush/scrape time and return (name, labels dict, value) counter
+    samples read from elsewhere (e.g. cache statistics kept by other modules).
+    """
+
+    def __init__(self, shared_dir=None, buckets=DEFAULT_BUCKETS):
+        self.shared_dir = shared_dir
+        self.buckets = buckets
+        self.collectors = []
+        self._help = {} # name -> (type, help text)
+        self._lock = threading.Lock()
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            # Forked workers start from zero instead of double-counting the parent's samples
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._counters = {}
+        self._histograms = {} # key -> [count per bucket..., +Inf count, sum]
+        self._dirty = False
+        self._flusher = None # Threads don't survive fork; each process starts its own
+
+    def describe(self, name, metric_type, help_text):
+        self._help[name] = (metric_type, help_text)
+
+    # --- Recording ---
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-1] += seconds
+            self._dirty = True
+
+    def observe_span(self, span, seconds):
+        self.observe('fun_span_seconds', seconds, {'span': span})
+
+    @contextmanager
+    def span(self, name):
+        """Times the enclosed block as fun_span_seconds{span=name}, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_span(name, time.perf_counter() - start)
+
+    # --- Cross-process sharing ---
+
+    def _local_state(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+        for collector in self.collectors:
+            try:
+                for name, labels, value in collector():
+                    counters[(name, tuple(sorted(labels.items())))] = value
+            except Exception as e:
+                print(f"Warning: Metrics collector failed: {e}", file=sys.stderr)
+        return counters, histograms
+
+    def start_flusher(self):
+        """Publishes this process's samples to shared_dir every FLUSH_INTERVAL while they change."""
+        if not self.shared_dir or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        if not self.shared_dir:
+            return
+        self._dirty = False
+        counters, histograms = self._local_state()
+        payload = {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, value] for (name, labels), value in histograms.items()],
+        }
+        path = os.path.join(self.shared_dir, f"metrics-{os.getpid()}.json")
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {path}: {e}", file=sys.stderr)
+
+    def _merged_state(self):
+        """Sums this process's samples with those published by every other process."""
+        counters, histograms = self._local_state()
+        if not self.shared_dir:
+            return counters, histograms
+        self.flush()
+        own_file = f"metrics-{os.getpid()}.json"
+        try:
+            names = [name for name in os.listdir(self.shared_dir) if name.endswith('.json') and name != own_file]
+        except OSError:
+            names = []
+        for file_name in names:
+            try:
+                with open(os.path.join(self.shared_dir, file_name), 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue # Being replaced right now; its samples show up on the next scrape
+            for name, labels, value in payload.get('counters', []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in payload.get('histograms', []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                if key in histograms and len(histograms[key]) == len(value):
+                    histograms[key] = [a + b for a, b in zip(histograms[key], value)]
+                else:
+                    histograms.setdefault(key, value)
+        return counters, histograms
+
+    # --- Exposition ---
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format (version 0.0.4)."""
+        counters, histograms = self._merged_state()
+        lines = []
+        described = set()
+
+        def header(name, default_type):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, help_text = self._help.get(name, (default_type, ''))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), histogram[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram[-1]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+class RequestProfiler:
+    """
+    WSGI middleware that runs a request under cProfile when its query string contains
+    `_profile=1` (or `_profile=<sort key>`, e.g. tottime), and answers with the profile
+    (top functions by cumulative time) as text/plain instead of the normal response.
+    Event streams never end, so they are passed through unprofiled.
+    Only wrap the app with it when profiling is wanted; it adds nothing to other requests.
+    """
+
+    def __init__(self, wsgi_app, limit=40):
+        self.wsgi_app = wsgi_app
+        self.limit = limit
+
+    def __call__(self, environ, start_response):
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        sort_key = query.get('_profile', [None])[0]
+        if not sort_key:
+            return self.wsgi_app(environ, start_response)
+        if sort_key not in pstats.Stats.sort_arg_dict_default:
+            sort_key = 'cumulative'
+
+        captured = {}
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            return lambda data: None
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            body = self.wsgi_app(environ, capture_start_response)
+            content_type = next((value for name, value in captured.get('headers', [])
+                                 if name.lower() == 'content-type'), '')
+            if content_type.split(';')[0].strip().lower() == 'text/event-stream':
+                profiler.disable()
+                start_response(captured['status'], captured['headers'])
+                return body
+            try:
+                size = sum(len(chunk) for chunk in body) # Streamed bodies are produced inside the profile too
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        report = io.StringIO()
+        report.write(f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')} -> {captured.get('status')}, "
+                     f"{size} bytes in {elapsed * 1000:.1f} ms\n\n")
+        pstats.Stats(profiler, stream=report).sort_stats(sort_key).print_stats(self.limit)
+        data = report.getvalue().encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'text/plain; charset=utf-8'),
+                                  ('Content-Length', str(len(data))), ('Cache-Control', 'no-store')])
+        return [data]
@@ -0,0 +1,200 @@
+# Purpose: Release-time offline support for games. Injects <link rel="preload"> hints into
+#          a release's entry point for the assets it only references from scripts (such as
+#          sounds loaded by Tone.js), which the browser would otherwise discover late, plus
+#          a snippet registering a service worker. The service worker and a precache
+#          manifest are generated per release: the worker's cache name is derived from the
+#          release's file hashes, every file is precached on the first visit, and later
+#          plays are answered from the cache without touching the network.
+# Usage: Called by admin/release_manager.py (copy_release) unless --no-offline is given.
+
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+from urllib.parse import quote
+
+SERVICE_WORKER_FILENAME = 'service-worker.js'
+PRECACHE_MANIFEST_FILENAME = 'precache-manifest.json'
+PRECACHE_MANIFEST_FORMAT = 1
+PRELOAD_LIMIT = 16 # Preloads compete with the page for bandwidth; only the first few are hinted
+GENERATED_FILENAMES = {SERVICE_WORKER_FILENAME, PRECACHE_MANIFEST_FILENAME}
+COMPRESSED_SUFFIXES = ('.gz', '.br') # Precompressed siblings; the server negotiates them transparently
+
+# extension -> (preload `as` destination, needs crossorigin). Audio is fetched and decoded by
+# Web Audio loaders (Tone.js, fetch + decodeAudioData), which request it as 'fetch' in CORS mode.
+PRELOAD_DESTINATIONS = {
+    '.mp3': ('fetch', True), '.ogg': ('fetch', True), '.wav': ('fetch', True), '.m4a': ('fetch', True),
+    '.aac': ('fetch', True), '.json': ('fetch', True),
+    '.js': ('script', False), '.css': ('style', False),
+    '.png': ('image', False), '.jpg': ('image', False), '.jpeg': ('image', False), '.gif': ('image', False),
+    '.webp': ('image', False), '.svg': ('image', False),
+    '.woff2': ('font', True), '.woff': ('font', True), '.ttf': ('font', True), '.otf': ('font', True),
+}
+
+# Everything between the markers is regenerated, so injecting twice never duplicates it
+PRELOAD_START, PRELOAD_END = '<!-- fun:preload -->', '<!-- /fun:preload -->'
+REGISTER_START, REGISTER_END = '<!-- fun:service-worker -->', '<!-- /fun:service-worker -->'
+REGISTER_SNIPPET = (f"{REGISTER_START}<script>if ('serviceWorker' in navigator) {{ addEventListener('load', function () {{ "
+                    f"navigator.serviceWorker.register('./{SERVICE_WORKER_FILENAME}').catch(function () {{}}); }}); }}</script>"
+                    f"{REGISTER_END}")
+CHARSET_META = re.compile(r'<meta\s[^>]*charset[^>]*>', re.I)
+HEAD_OPEN = re.compile(r'<head\b[^>]*>', re.I)
+BODY_CLOSE = re.compile(r'</body\s*>', re.I)
+
+SERVICE_WORKER_TEMPLATE = """\
+// Generated by release_manager.py for {app_name} {version}; do not edit.
+// Precaches this release on install and serves it (and any other GET, e.g. CDN
+// scripts and fonts, cached on first use) from the cache afterwards.
+const CACHE_NAME = {cache_name};
+const CACHE_PREFIX = {cache_prefix};
+const PRECACHE_URLS = {urls};
+
+self.addEventListener('install', (event) => {{
+    event.waitUntil(caches.open(CACHE_NAME).then((cache) => cache.addAll(PRECACHE_URLS)).then(() => self.skipWaiting()));
+}});
+
+self.addEventListener('activate', (event) => {{
+    // Only earlier builds of this same release are dropped; other versions keep their caches
+    event.waitUntil(caches.keys().then((keys) => Promise.all(
+        keys.filter((key) => key.startsWith(CACHE_PREFIX) && key !== CACHE_NAME).map((key) => caches.delete(key))
+    )).then(() => self.clients.claim()));
+}});
+
+self.addEventListener('fetch', (event) => {{
+    const request = event.request;
+    if (request.method !== 'GET' || request.headers.has('range')) return; // Media range requests go to the network
+    const sameOrigin = new URL(request.url).origin === self.location.origin;
+    event.respondWith(caches.open(CACHE_NAME).then((cache) =>
+        cache.match(request, {{ ignoreSearch: sameOrigin }}).then((cached) => cached || fetch(request).then((response) => {{
+            if (response.ok || response.type === 'opaque') cache.put(request, response.clone());
+            return response;
+        }}))));
+}});
+"""
+
+def _write_atomic(path, content):
+    """Replaces path with new content. Never writes through in place: release files may be hard links."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+    if os.path.exists(path):
+        shutil.copymode(path, tmp_path)
+    os.replace(tmp_path, path)
+
+def _strip_block(document, start, end):
+    begin = document.find(start)
+    if begin == -1:
+        return document
+    finish = document.find(end, begin)
+    return document[:begin] + document[finish + len(end):] if finish != -1 else document
+
+def release_asset_paths(release_dir):
+    """Returns the relative (posix) paths of a release's own files: no dotfiles, compressed siblings or generated files."""
+    paths = []
+    for root, dirs, files in os.walk(release_dir):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in files:
+            if name.startswith('.') or name.endswith(COMPRESSED_SUFFIXES):
+                continue
+            rel_path = os.path.relpath(os.path.join(root, name), release_dir).replace(os.sep, '/')
+            if rel_path not in GENERATED_FILENAMES:
+                paths.append(rel_path)
+    return sorted(paths)
+
+def find_preloads(document, asset_paths, entry_point):
+    """
+    Returns the assets worth preloading: those the entry point mentions in a quoted string
+    (e.g. "./sounds/puff.mp3" in a script), but not in a src/href attribute, which the
+    browser's preload scanner already finds on its own.
+    """
+    preloads = []
+    for rel_path in asset_paths:
+        extension = os.path.splitext(rel_path)[1].lower()
+        if rel_path == entry_point or extension not in PRELOAD_DESTINATIONS:
+            continue
+        path_pattern = r'(?:\./)?' + re.escape(rel_path)
+        if not re.search(r'["\'`]' + path_pattern + r'["\'`?#]', document):
+            continue
+        if re.search(r'\b(?:src|href)\s*=\s*["\']?' + path_pattern, document, re.I):
+            continue
+        preloads.append(rel_path)
+        if len(preloads) >= PRELOAD_LIMIT:
+            break
+    return preloads
+
+def inject_offline_support(release_dir, entry_point, register_service_worker=True):
+    """
+    Adds preload hints (after the charset <meta>, or at the start of <head>) and, optionally,
+    the service worker registration (before </body>) to the entry point. Returns the
+    preloaded paths.
+    """
+    path = os.path.join(release_dir, entry_point)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        document = f.read()
+    document = _strip_block(_strip_block(document, PRELOAD_START, PRELOAD_END), REGISTER_START, REGISTER_END)
+
+    preloads = find_preloads(document, release_asset_paths(release_dir), entry_point)
+    if preloads:
+        links = []
+        for rel_path in preloads:
+            destination, crossorigin = PRELOAD_DESTINATIONS[os.path.splitext(rel_path)[1].lower()]
+            links.append(f'<link rel="preload" href="./{html.escape(quote(rel_path))}" as="{destination}"'
+                         f'{" crossorigin" if crossorigin else ""}>')
+        block = PRELOAD_START + ''.join(links) + PRELOAD_END
+        anchor = CHARSET_META.search(document) or HEAD_OPEN.search(document)
+        position = anchor.end() if anchor else 0
+        document = document[:position] + block + document[position:]
+
+    if register_service_worker:
+        body_close = None
+        for body_close in BODY_CLOSE.finditer(document):
+            pass # The last </body>
+        position = body_close.start() if body_close else len(document)
+        document = document[:position] + REGISTER_SNIPPET + document[position:]
+
+    _write_atomic(path, document)
+    return preloads
+
+def render_service_worker(release_dir, app_name, version, files):
+    """
+    Returns {relative path: content} of the precache manifest and the service worker for a
+    release. files is the release manifest's {"<path>": {"size", "sha256", ...}} map of the
+    release as it will be served.
+    """
+    assets = [rel_path for rel_path in release_asset_paths(release_dir) if rel_path in files]
+    revision = hashlib.sha256()
+    entries = []
+    for rel_path in assets:
+        revision.update(f"{rel_path}\0{files[rel_path]['sha256']}\n".encode('utf-8'))
+        entries.append({'url': f"./{quote(rel_path)}", 'revision': files[rel_path]['sha256'][:32], 'size': files[rel_path]['size']})
+    cache_prefix = f"fun-{app_name}-{version}-"
+    cache_name = cache_prefix + revision.hexdigest()[:12]
+
+    precache = {'format': PRECACHE_MANIFEST_FORMAT, 'app_name': app_name, 'version': version,
+                'cache': cache_name, 'files': entries}
+    return {
+        PRECACHE_MANIFEST_FILENAME: json.dumps(precache, indent=1) + '\n',
+        SERVICE_WORKER_FILENAME: SERVICE_WORKER_TEMPLATE.format(
+            app_name=app_name, version=version, cache_name=json.dumps(cache_name), cache_prefix=json.dumps(cache_prefix),
+            urls=json.dumps([entry['url'] for entry in entries], indent=4)),
+    }
+
+def write_service_worker(release_dir, app_name, version, files):
+    """Writes the precache manifest and the service worker for a release (see render_service_worker). Returns their paths."""
+    rendered = render_service_worker(release_dir, app_name, version, files)
+    for rel_path, content in rendered.items():
+        _write_atomic(os.path.join(release_dir, rel_path), content)
+    return list(rendered)
+
+def estimate_generated_sizes(source_dir, app_name, version):
+    """
+    Returns {relative path: size in bytes} of the files write_service_worker would add to a
+    release snapshotted from source_dir, without hashing or writing anything (for dry runs).
+    Hashes have a fixed length, so placeholders give the same sizes.
+    """
+    files = {rel_path: {'size': os.path.getsize(os.path.join(source_dir, rel_path)), 'sha256': '0' * 64}
+             for rel_path in release_asset_paths(source_dir)}
+    rendered = render_service_worker(source_dir, app_name, version, files)
+    return {rel_path: len(content.encode('utf-8')) for rel_path, content in rendered.items()}
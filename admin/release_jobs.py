@@ -0,0 +1,188 @@
+# Purpose: Background release jobs for the admin server.
+#          /api/release submits a job and returns immediately; the job runs on a
+#          bounded worker pool, while its stdout/stderr are captured line by line so
+#          the admin UI can stream them over Server-Sent Events. Releases of the same
+#          app are queued per app and only handed to the pool one at a time, so they
+#          never overlap and a waiting release doesn't take a worker from other apps.
+
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+class JobQueueFull(Exception):
+    """Raised when too many release jobs are already queued or running."""
+
+class ReleaseJob:
+    """A single release run: its status, exit code and captured output lines."""
+
+    def __init__(self, app_name, version_tag):
+        self.id = uuid.uuid4().hex
+        self.app_name = app_name
+        self.version_tag = version_tag
+        self.status = 'queued' # queued -> running -> succeeded | failed
+        self.exit_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lines = [] # [(stream, text), ...] in arrival order
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed')
+
+    def append(self, stream, text):
+        with self._changed:
+            self.lines.append((stream, text))
+            self._changed.notify_all()
+
+    def set_status(self, status, exit_code=None):
+        with self._changed:
+            self.status = status
+            if status == 'running':
+                self.started_at = time.time()
+            elif status in ('succeeded', 'failed'):
+                self.exit_code = exit_code
+                self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def wait(self, line_count, timeout):
+        """Blocks until there are more than line_count lines, the job finishes, or timeout elapses."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.lines) > line_count or self.done, timeout)
+
+    def output(self, stream=None):
+        return "\n".join(text for line_stream, text in self.lines if stream is None or line_stream == stream)
+
+    def to_dict(self, include_output=True):
+        data = {
+            "id": self.id,
+            "app_name": self.app_name,
+            "version_tag": self.version_tag,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_output:
+            data["stdout"] = self.output('stdout')
+            data["stderr"] = self.output('stderr')
+        return data
+
+class ReleaseJobManager:
+    """
+    Runs release jobs on a bounded thread pool.
+    `runner(job)` does the actual work and returns an exit code, writing progress into the job
+    through JobOutput streams.
+    `on_finish(job, exit_code)` is called after every job, before its final status is published
+    (e.g. to invalidate the catalog cache, so clients reacting to the status see the new release).
+    """
+
+    def __init__(self, runner, max_workers=2, max_pending=16, history=100, on_finish=None):
+        self.runner = runner
+        self.max_pending = max_pending # Queued + running jobs accepted at once
+        self.history = history # Finished jobs kept for status queries
+        self.on_finish = on_finish
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='release-job')
+        self._jobs = OrderedDict()
+        self._app_queues = {} # app_name -> deque of jobs waiting for the running job of that app
+        self._lock = threading.Lock()
+
+    def submit(self, app_name, version_tag):
+        """Queues a release and returns its ReleaseJob. Raises JobQueueFull if the queue is full."""
+        job = ReleaseJob(app_name, version_tag)
+        with self._lock:
+            active = sum(1 for existing in self._jobs.values() if not existing.done)
+            if active >= self.max_pending:
+                raise JobQueueFull(f"{active} release jobs are already queued or running")
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs beyond the history limit
+            finished = [job_id for job_id, existing in self._jobs.items() if existing.done]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self._jobs[job_id]
+            waiting = self._app_queues.get(app_name)
+            if waiting is None:
+                self._app_queues[app_name] = deque()
+            else:
+                waiting.append(job)
+                job.append('stdout', f"Waiting for another release of {app_name} to finish...")
+        if waiting is None:
+            self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job):
+        try:
+            job.set_status('running')
+            try:
+                exit_code = self.runner(job)
+            except Exception as e:
+                job.append('stderr', f"An unexpected error occurred while running the release: {e}")
+                exit_code = 1
+            if self.on_finish is not None:
+                try:
+                    self.on_finish(job, exit_code)
+                except Exception as e:
+                    print(f"Error in release job callback: {e}", file=sys.stderr)
+        finally:
+            # Hand the app's next queued release to the pool, or mark the app idle
+            with self._lock:
+                waiting = self._app_queues[job.app_name]
+                next_job = waiting.popleft() if waiting else None
+                if next_job is None:
+                    del self._app_queues[job.app_name]
+            if next_job is not None:
+                self._executor.submit(self._run, next_job)
+        # Published last, so clients that react to it find the catalog and the app ready
+        job.set_status('succeeded' if exit_code == 0 else 'failed', exit_code)
+
+class JobOutput:
+    """File-like object that appends each complete line written to it to a job stream."""
+
+    def __init__(self, job, stream):
+        self.job = job
+        self.stream = stream
+        self._buffer = ''
+
+    def write(self, text):
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self.job.append(self.stream, line)
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self.job.append(self.stream, self._buffer)
+            self._buffer = ''
+
+def sse_events(job, start=0, keepalive=15.0):
+    """
+    Yields Server-Sent Event frames for a job: one 'output' event per line (the event id is the
+    line index, so EventSource reconnects resume via Last-Event-ID), then a final 'end' event.
+    """
+    index = start
+    while True:
+        job.wait(index, keepalive)
+        lines = job.lines[index:]
+        for offset, (stream, text) in enumerate(lines):
+            payload = json.dumps({"stream": stream, "line": text})
+            yield f"id: {index + offset}\nevent: output\ndata: {payload}\n\n"
+        index += len(lines)
+        if job.done and index >= len(job.lines):
+            yield f"event: end\ndata: {json.dumps(job.to_dict(include_output=False))}\n\n"
+            return
+        if not lines:
+            yield ": keep-alive\n\n" # Stops proxies from closing an idle stream
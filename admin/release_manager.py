@@ -1,13 +1,41 @@
-import subprocess
+# Startup time matters (CI hooks run this per commit), so only cheap modules are imported here.
+# subprocess, concurrent.futures, tempfile, gzip and the optional stages (asset_optimizer,
+# offline_cache, generate_index) are imported where they are first needed.
 import argparse
 import sys
 import os
 import shutil # Added for file copying
-import re # Add re for version regex matching
-from packaging.version import parse as parse_version # Use packaging for robust version comparison
+import hashlib
+import json
+import re
+import contextlib
+from collections import deque
+import struct
+import zlib
+try:
+    import fcntl # For FICLONE reflinks (Linux only)
+except ImportError:
+    fcntl = None
+try:
+    import brotli # Optional: pip install brotli (enables .br siblings)
+except ImportError:
+    brotli = None
+
+# Shared helpers (generate_index, version_index) live in scripts/
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+import version_index
+from file_lock import FileLock, app_lock_path
+
+def thread_pool(max_workers=None):
+    """A ThreadPoolExecutor (default: min(8, CPU count) workers), imported on first use."""
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1))
 
 def run_command(command, cwd=None):
     """Runs a shell command and returns its stdout, stderr, and return code."""
+    import subprocess
     try:
         process = subprocess.run(
             command,
@@ -25,166 +53,895 @@ def run_command(command, cwd=None):
         print(f"An unexpected error occurred running command '{command}': {e}", file=sys.stderr)
         return "", str(e), 1 # Indicate failure
 
-# --- Helper functions for index generation ) ---
-
-def find_latest_version(versions):
-   """Finds the latest version from a list of version strings."""
-   if not versions:
-       return None
-   # Use packaging.version.parse for robust semantic version comparison
-   return max(versions, key=parse_version)
-
-def format_game_name(app_name):
-   """Formats the app directory name into a display name."""
-   return ' '.join(word.capitalize() for word in app_name.split('-'))
-
-def find_entry_point(directory, app_name):
-   """Finds the entry HTML file (app_name.html or index.html) in a directory."""
-   preferred_entry = f"{app_name}.html"
-   if os.path.exists(os.path.join(directory, preferred_entry)):
-       return preferred_entry
-   elif os.path.exists(os.path.join(directory, "index.html")):
-       return "index.html"
-   else:
-       return None # No entry point found
-
-# --- Function to update the root index.html ---
-
-def update_root_index(project_root):
-   """Generates the root index.html based on latest game releases, including version dropdowns."""
-   print("\n--- Starting Root Index Generation ---")
-   games_root_dir = os.path.join(project_root, 'games')
-   template_path = os.path.join(project_root, 'index.template.html')
-   output_path = os.path.join(project_root, 'index.html')
-
-   print(f"Scanning for games in: {games_root_dir}")
-   game_list_items_html = [] # Changed variable name for clarity
-
-   if not os.path.exists(games_root_dir):
-       print(f"Error: Games directory not found at {games_root_dir}", file=sys.stderr)
-       print("Warning: Skipping root index generation.")
-       return
-
-   if not os.path.exists(template_path):
-       print(f"Error: Template file not found at {template_path}", file=sys.stderr)
-       print("Warning: Skipping root index generation.")
-       return
-
-   # Iterate through potential game directories
-   for app_name in sorted(os.listdir(games_root_dir)): # Sort app names alphabetically
-       app_dir = os.path.join(games_root_dir, app_name)
-       if not os.path.isdir(app_dir):
-           continue
-
-       releases_dir = os.path.join(app_dir, 'releases')
-       if not os.path.isdir(releases_dir):
-           continue
-
-       # Find and sort all valid version directories
-       versions = sorted(
-           [
-               d for d in os.listdir(releases_dir)
-               if os.path.isdir(os.path.join(releases_dir, d)) and re.match(r'^\d+\.\d+\.\d+$', d)
-           ],
-           key=parse_version,
-           reverse=True # Sort descending (latest first)
-       )
-
-       if not versions:
-           continue
-
-       latest_version = versions[0] # Latest is the first after descending sort
-       print(f"  Found game: {app_name}, Versions: {', '.join(versions)}")
-
-       latest_release_dir = os.path.join(releases_dir, latest_version)
-       latest_entry_point = find_entry_point(latest_release_dir, app_name)
-
-       if not latest_entry_point:
-           print(f"Warning: Could not find entry point for latest version '{latest_version}' of '{app_name}'. Skipping game.")
-           continue
-
-       display_name = format_game_name(app_name)
-       latest_link_path = f"games/{app_name}/releases/{latest_version}/{latest_entry_point}"
-
-       # Generate dropdown links
-       dropdown_links_html = []
-       for version in versions:
-           version_dir = os.path.join(releases_dir, version)
-           entry_point = find_entry_point(version_dir, app_name)
-           if entry_point:
-               link_path = f"games/{app_name}/releases/{version}/{entry_point}"
-               # target="_blank" to open in new window
-               dropdown_links_html.append(f'                <a href="{link_path}" target="_blank">{version}</a>')
-           else:
-                # Optionally add a disabled entry or skip
-                dropdown_links_html.append(f'                <span class="disabled-version">{version} (No entry)</span>')
-
-
-       # Generate the full list item HTML with dropdown structure
-       # Using data-target attribute for JS hook
-       list_item_html = f"""\
-           <li class="game-item">
-               <a href="{latest_link_path}" class="game-link">{display_name}</a>
-               <div class="version-dropdown-container">
-                   <button class="versions-button" data-target="dropdown-{app_name}">Versions</button>
-                   <div id="dropdown-{app_name}" class="versions-dropdown-content">
-{chr(10).join(dropdown_links_html)}
-                   </div>
-               </div>
-           </li>"""
-       game_list_items_html.append(list_item_html)
-
-
-   if not game_list_items_html:
-       print("Warning: No games with valid releases found. Output index.html will have an empty list.")
-       generated_list_html = "            <!-- No games found -->"
-   else:
-       # Indent the generated list items correctly
-       generated_list_html = "\n".join(f"    {line}" for item in game_list_items_html for line in item.splitlines())
-
-
-   # Read template and replace placeholder
-   print(f"Reading template file: {template_path}")
-   try:
-       with open(template_path, 'r', encoding='utf-8') as f:
-           template_content = f.read()
-   except Exception as e:
-       print(f"Error reading template file: {e}", file=sys.stderr)
-       print("Warning: Skipping root index generation.")
-       return
-
-   print("Generating final index.html content...")
-   # Ensure placeholder has correct indentation if needed, but usually it's fine
-   final_content = template_content.replace('            <!-- GAME_LIST_PLACEHOLDER -->', generated_list_html)
-
-   # Write the final index.html
-   print(f"Writing output file: {output_path}")
-   try:
-       with open(output_path, 'w', encoding='utf-8') as f:
-           f.write(final_content)
-       print("Successfully generated index.html.")
-   except Exception as e:
-       print(f"Error writing output file: {e}", file=sys.stderr)
-       print("Warning: Failed to update root index.html.") # Don't exit script
-
-   print("--- Finished Root Index Generation ---")
+# App names and version tags become directory names and git ref names
+SAFE_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
 
+def _validate_name(value):
+    """
+    Returns True if value can be used as an app name or version tag: a directory-safe token
+    without '..' that doesn't end in .lock (git refuses such ref names, and app names would
+    collide with the lock files).
+    """
+    return bool(SAFE_NAME.match(value or "")) and '..' not in value and not value.endswith('.lock')
 
-def main():
-    parser = argparse.ArgumentParser(description="Create a release archive and git tag for an application.")
-    parser.add_argument("app_name", help="The name of the application (e.g., 'balloon-puff').")
-    parser.add_argument("version_tag", help="The version tag to create (e.g., '1.0.0').")
-    args = parser.parse_args()
+# --- In-process git access ---
+
+class GitError(Exception):
+    """Raised when a git operation needed for a release fails."""
+
+def find_git_root(start=None):
+    """Finds the repository root by walking up from start (default: cwd) looking for .git."""
+    path = os.path.abspath(start or os.getcwd())
+    while True:
+        if os.path.exists(os.path.join(path, '.git')):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    # Unusual layouts (e.g. GIT_DIR set in the environment): ask git
+    git_root, _, exit_code = run_command("git rev-parse --show-toplevel", cwd=start)
+    return git_root if exit_code == 0 else None
+
+class GitRepo:
+    """
+    The few git operations a release needs, done in-process where possible. A lightweight tag is
+    just refs/tags/<name> containing a commit id, so refs are read (loose or packed) and tags written
+    directly under .git; only the network push starts a git process. Repositories using reftable
+    ref storage fall back to the git CLI for everything.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        git_path = os.path.join(root, '.git')
+        if os.path.isfile(git_path):
+            # Worktrees and submodules have a .git file: "gitdir: <path>"
+            with open(git_path, 'r', encoding='utf-8') as f:
+                self.git_dir = os.path.normpath(os.path.join(root, f.read().split(':', 1)[1].strip()))
+        else:
+            self.git_dir = git_path
+        commondir_path = os.path.join(self.git_dir, 'commondir')
+        if os.path.isfile(commondir_path):
+            with open(commondir_path, 'r', encoding='utf-8') as f:
+                self.common_dir = os.path.normpath(os.path.join(self.git_dir, f.read().strip()))
+        else:
+            self.common_dir = self.git_dir
+        self.native = os.path.isdir(self.git_dir) and not os.path.exists(os.path.join(self.common_dir, 'reftable'))
+
+    def _git(self, *args):
+        """Runs git with list args (no shell) and returns stdout, stderr, exit code."""
+        import subprocess
+        try:
+            process = subprocess.run(['git', *args], capture_output=True, text=True, cwd=self.root)
+        except OSError as e:
+            return "", str(e), 1
+        return process.stdout.strip(), process.stderr.strip(), process.returncode
+
+    def _packed_refs(self):
+        refs = {}
+        try:
+            with open(os.path.join(self.common_dir, 'packed-refs'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith(('#', '^')):
+                        continue # Header / peeled tag target
+                    sha, _, ref = line.strip().partition(' ')
+                    if ref:
+                        refs[ref] = sha
+        except FileNotFoundError:
+            pass
+        return refs
+
+    def read_ref(self, ref):
+        """Returns the commit id a ref points to (following symbolic refs), or None."""
+        base = self.git_dir if ref == 'HEAD' else self.common_dir # HEAD is per-worktree
+        try:
+            with open(os.path.join(base, ref), 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return self._packed_refs().get(ref)
+        if content.startswith('ref:'):
+            return self.read_ref(content[4:].strip())
+        return content or None
+
+    def resolve_head(self):
+        if self.native:
+            sha = self.read_ref('HEAD')
+        else:
+            sha, _, exit_code = self._git('rev-parse', 'HEAD')
+            sha = sha if exit_code == 0 else None
+        if not sha:
+            raise GitError("HEAD does not point to a commit")
+        return sha
+
+    def list_tags(self):
+        if not self.native:
+            stdout, stderr, exit_code = self._git('tag', '-l')
+            if exit_code != 0:
+                raise GitError(stderr)
+            return set(stdout.splitlines())
+        tags = {ref[len('refs/tags/'):] for ref in self._packed_refs() if ref.startswith('refs/tags/')}
+        tags_dir = os.path.join(self.common_dir, 'refs', 'tags')
+        for root, _, files in os.walk(tags_dir):
+            for name in files:
+                if not name.endswith('.lock'):
+                    tags.add(os.path.relpath(os.path.join(root, name), tags_dir).replace(os.sep, '/'))
+        return tags
+
+    def tag_exists(self, tag):
+        if not self.native:
+            stdout, stderr, exit_code = self._git('tag', '-l', tag)
+            if exit_code != 0:
+                raise GitError(stderr)
+            return bool(stdout)
+        return self.read_ref(f'refs/tags/{tag}') is not None
+
+    def create_tag(self, tag, sha):
+        """Creates a lightweight tag; fails (GitError) rather than overwrite an existing one."""
+        if not self.native:
+            _, stderr, exit_code = self._git('tag', tag, sha)
+            if exit_code != 0:
+                raise GitError(stderr)
+            return
+        if f'refs/tags/{tag}' in self._packed_refs():
+            raise GitError(f"tag '{tag}' already exists")
+        path = os.path.join(self.common_dir, 'refs', 'tags', *tag.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            # O_EXCL makes creation atomic: concurrent creators of the same tag can't both win
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            raise GitError(f"tag '{tag}' already exists")
+        except OSError as e:
+            raise GitError(str(e))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(sha + '\n')
+
+    def delete_tag(self, tag):
+        if not self.native:
+            self._git('tag', '-d', tag)
+            return
+        try:
+            os.remove(os.path.join(self.common_dir, 'refs', 'tags', *tag.split('/')))
+        except FileNotFoundError:
+            pass
+
+    def push(self, remote, refs):
+        """Pushes refs to remote; this is the only step that needs the git CLI (and the network)."""
+        _, stderr, exit_code = self._git('push', remote, *refs)
+        if exit_code != 0:
+            raise GitError(stderr)
+
+# --- Deduplicating release snapshots ---
+
+FICLONE = 0x40049409 # _IOW(0x94, 9, int) from linux/fs.h
+HASH_CHUNK_SIZE = 1024 * 1024 # Stream files so large audio assets are never fully loaded
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def reflink_file(src, dst):
+    """Creates dst as a copy-on-write clone of src. Raises OSError if the filesystem can't."""
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+    with open(src, 'rb') as src_f, open(dst, 'wb') as dst_f:
+        try:
+            fcntl.ioctl(dst_f.fileno(), FICLONE, src_f.fileno())
+        except OSError:
+            dst_f.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+def find_previous_release(releases_dir, log=version_index.print_warning):
+    """Returns the directory of the latest existing release, or None if there isn't one."""
+    if not os.path.isdir(releases_dir):
+        return None
+    versions = version_index.read_version_index(os.path.dirname(releases_dir), log)
+    if not versions:
+        return None
+    return os.path.join(releases_dir, versions[0]['version'])
+
+def snapshot_tree(working_dir, release_version_dir, previous_release_dir=None, log=print):
+    """
+    Copies working_dir to release_version_dir, deduplicating against the previous release.
+
+    Files whose content matches a file in previous_release_dir (same SHA-256, any path) are
+    hard-linked to it; other files are reflinked from working_dir when the filesystem supports
+    it, and copied otherwise. Returns a dict of counts and the number of bytes saved.
+    Fallback notices go to log.
+    """
+    stats = {'linked': 0, 'reflinked': 0, 'copied': 0, 'bytes_saved': 0, 'bytes_total': 0}
+
+    # Index the previous release by (size, digest); only hash files whose size matches something
+    previous_by_size = {}
+    if previous_release_dir and os.path.isdir(previous_release_dir):
+        for root, _, files in os.walk(previous_release_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if not os.path.islink(path):
+                    previous_by_size.setdefault(os.path.getsize(path), []).append(path)
+    previous_digests = {} # path -> digest, filled lazily
+
+    can_link = bool(previous_by_size)
+    can_reflink = fcntl is not None
+
+    for root, dirs, files in os.walk(working_dir, followlinks=True):
+        rel_root = os.path.relpath(root, working_dir)
+        target_root = os.path.normpath(os.path.join(release_version_dir, rel_root))
+        os.makedirs(target_root, exist_ok=True)
+        shutil.copystat(root, target_root)
+        for name in files:
+            src = os.path.join(root, name)
+            dst = os.path.join(target_root, name)
+            size = os.path.getsize(src)
+            stats['bytes_total'] += size
+
+            if can_link and size in previous_by_size:
+                digest = file_digest(src)
+                match = None
+                for candidate in previous_by_size[size]:
+                    if candidate not in previous_digests:
+                        previous_digests[candidate] = file_digest(candidate)
+                    if previous_digests[candidate] == digest:
+                        match = candidate
+                        break
+                if match:
+                    try:
+                        os.link(match, dst)
+                        stats['linked'] += 1
+                        stats['bytes_saved'] += size
+                        continue
+                    except OSError as e:
+                        log(f"Hard links unavailable ({e}); falling back to reflink/copy.")
+                        can_link = False
+
+            if can_reflink:
+                try:
+                    reflink_file(src, dst)
+                    stats['reflinked'] += 1
+                    stats['bytes_saved'] += size
+                    continue
+                except OSError:
+                    can_reflink = False # e.g. ext4 or cross-device; stop trying
+
+            shutil.copy2(src, dst)
+            stats['copied'] += 1
+
+    return stats
+
+def copy_release(working_dir, releases_dir, release_version_dir, snapshot_mode="dedup", log=print, compress=True,
+                 archive=True, optimize=None, offline=True):
+    """
+    Snapshots working_dir into release_version_dir using the given snapshot mode, then (unless
+    offline is False) adds preload hints and a service worker for offline play, then (unless
+    compress is False) writes precompressed .gz/.br siblings for compressible assets, then
+    the release manifest of file sizes and hashes, and (unless archive is False) a zip of the release.
+    With optimize (a dict of asset_optimizer options), the snapshot is taken of an optimized
+    staging copy of working_dir instead, so dedup still matches unchanged optimized assets.
+    The release is built in a temporary directory next to releases/ and renamed into place
+    once complete, so no reader ever sees a partial release. On failure the temporary (or, if
+    already published, the release) directory is removed and the exception re-raised.
+    """
+    import tempfile
+    app_dir = os.path.dirname(releases_dir)
+    app_name, version_tag = os.path.basename(app_dir), os.path.basename(release_version_dir)
+    source_dir = working_dir
+    staging_dir = None
+    build_dir = None
+    published = False
+    try:
+        if optimize is not None:
+            import asset_optimizer
+            # Staged next to releases/ (same filesystem) so unchanged files are hard links, not copies
+            staging_dir = tempfile.mkdtemp(prefix='.optimize-', dir=app_dir)
+            cache_dir = os.path.join(os.path.dirname(os.path.dirname(app_dir)), asset_optimizer.CACHE_DIRNAME)
+            log(f"Optimizing assets (cache: {cache_dir})...")
+            asset_optimizer.optimize_tree(working_dir, staging_dir, cache_dir, optimize, log=log)
+            source_dir = staging_dir
+        # Outside releases/ so version scans never list it; same filesystem so the final rename is atomic
+        build_dir = tempfile.mkdtemp(prefix=f'.release-{version_tag}-', dir=app_dir)
+        log(f"Copying files from {source_dir} to {build_dir}...")
+        if snapshot_mode == "copy":
+            # ignore_dangling_symlinks=True might be needed on some systems if symlinks cause issues
+            shutil.copytree(source_dir, build_dir, symlinks=False, ignore=None, dirs_exist_ok=True)
+        else:
+            previous_release_dir = find_previous_release(releases_dir, log)
+            if previous_release_dir:
+                log(f"Deduplicating against previous release: {previous_release_dir}")
+            stats = snapshot_tree(source_dir, build_dir, previous_release_dir, log=log)
+            log(f"Snapshot: {stats['linked']} hard-linked, {stats['reflinked']} reflinked, {stats['copied']} copied; "
+                f"{stats['bytes_saved']} of {stats['bytes_total']} bytes saved.")
+        log("Files copied successfully.")
+        hashed = None
+        if offline:
+            hashed = add_offline_support(build_dir, app_name, version_tag, log=log)
+        if compress:
+            precompress_release(build_dir, log=log)
+        # Sizes and hashes are recorded once here (reusing any taken above); the server uses them as strong ETags
+        write_release_manifest(build_dir, log=log, known=hashed)
+        os.makedirs(releases_dir, exist_ok=True)
+        if os.path.exists(release_version_dir): # os.rename would silently replace an empty directory
+            raise FileExistsError(f"Release directory already exists: {release_version_dir}")
+        os.rename(build_dir, release_version_dir)
+        build_dir = None
+        published = True
+        log(f"Published {release_version_dir}.")
+        # Record the new version (and its entry point) so readers needn't rescan releases/
+        index = version_index.write_version_index(os.path.dirname(releases_dir), log=log)
+        log(f"Updated version index ({len(index['versions'])} release(s)).")
+        if archive:
+            write_release_archive(release_version_dir, archive_path(os.path.dirname(app_dir), app_name, version_tag), log=log)
+    except Exception:
+        # Clean up the release if it was already published (but never one made by someone else)
+        if published and os.path.exists(release_version_dir):
+            try:
+                shutil.rmtree(release_version_dir)
+                log(f"Cleaned up partially created directory: {release_version_dir}")
+            except OSError as cleanup_e:
+                log(f"Error cleaning up directory {release_version_dir}: {cleanup_e}")
+        raise
+    finally:
+        for temporary_dir in (staging_dir, build_dir):
+            if temporary_dir is not None:
+                shutil.rmtree(temporary_dir, ignore_errors=True)
+
+# --- Precompressed assets ---
+
+# Text-like formats worth compressing; audio/images in compressed formats (mp3, png...) are skipped
+COMPRESSIBLE_EXTENSIONS = {'.html', '.htm', '.js', '.mjs', '.css', '.json', '.svg', '.wav', '.txt', '.xml', '.map'}
+MIN_COMPRESS_SIZE = 256 # Below this the headers cost more than compression saves
+MAX_COMPRESSED_RATIO = 0.95 # Keep a variant only if it is at least 5% smaller
+
+def compress_file(path):
+    """Writes .gz (and .br if brotli is installed) siblings for path. Returns bytes saved per encoding."""
+    import gzip
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)} # mtime=0 keeps output reproducible
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    saved = {}
+    for suffix, compressed in variants.items():
+        if len(compressed) > len(data) * MAX_COMPRESSED_RATIO:
+            continue
+        with open(path + suffix, 'wb') as f:
+            f.write(compressed)
+        shutil.copystat(path, path + suffix)
+        saved[suffix] = len(data) - len(compressed)
+    return saved
+
+def precompress_release(release_version_dir, log=print, jobs=None):
+    """Emits precompressed siblings for every compressible asset in a release directory."""
+    paths = []
+    for root, _, files in os.walk(release_version_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and os.path.getsize(path) >= MIN_COMPRESS_SIZE:
+                paths.append(path)
+    if not paths:
+        return
+    # zlib and brotli release the GIL, so threads compress files in parallel
+    with thread_pool(jobs) as executor:
+        results = list(executor.map(compress_file, paths))
+    for suffix in ('.gz', '.br'):
+        count = sum(1 for saved in results if suffix in saved)
+        if count:
+            log(f"Precompressed {count} asset(s) as {suffix}, saving {sum(saved.get(suffix, 0) for saved in results)} bytes per transfer.")
+    if brotli is None:
+        log("Note: install 'brotli' (pip install brotli) to also emit .br variants.")
+
+# --- Offline support (preload hints and service worker) ---
+
+def add_offline_support(release_version_dir, app_name, version_tag, log=print):
+    """
+    Injects preload hints and the service worker registration into the release's entry point,
+    then writes its service worker and precache manifest (see offline_cache.py). Returns the
+    hashes taken for the precache manifest (a release manifest "files" map) for reuse, or None.
+    """
+    import offline_cache
+    entry_point = version_index.find_entry_point(release_version_dir, app_name)
+    if entry_point is None:
+        log("Warning: No entry point found; skipping preload hints and service worker.")
+        return None
+    preloads = offline_cache.inject_offline_support(release_version_dir, entry_point)
+    if preloads:
+        log(f"Added preload hints to {entry_point} for: {', '.join(preloads)}")
+    # Hash the release as served (entry point included, generated files not yet written)
+    hashed = build_release_manifest(release_version_dir)['files']
+    offline_cache.write_service_worker(release_version_dir, app_name, version_tag, hashed)
+    log(f"Wrote {offline_cache.SERVICE_WORKER_FILENAME} and {offline_cache.PRECACHE_MANIFEST_FILENAME} "
+        f"({len(offline_cache.release_asset_paths(release_version_dir))} file(s) precached).")
+    return hashed
+
+# --- Release manifests ---
+
+RELEASE_MANIFEST_FILENAME = '.release-manifest.json'
+RELEASE_MANIFEST_FORMAT = 1
+
+def build_release_manifest(release_version_dir, jobs=None, known=None):
+    """
+    Hashes every file in a release (in parallel, chunked) and returns the manifest dict:
+    {"format": 1, "files": {"<relative/posix/path>": {"size": ..., "sha256": ..., "etag": ...}}}.
+    The etag is a prefix of the SHA-256, used as the strong HTTP ETag when serving the file.
+    known is an earlier "files" map of this directory; entries for files that were not
+    rewritten since (same path and size) are reused instead of hashing the file again.
+    """
+    known = known or {}
+    paths = []
+    files = {}
+    for root, _, names in os.walk(release_version_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, release_version_dir).replace(os.sep, '/')
+            if rel_path == RELEASE_MANIFEST_FILENAME:
+                continue
+            if rel_path in known and known[rel_path]['size'] == os.path.getsize(path):
+                files[rel_path] = known[rel_path]
+            else:
+                paths.append(path)
+    with thread_pool(jobs) as executor:
+        digests = list(executor.map(file_digest, paths))
+    for path, digest in zip(paths, digests):
+        rel_path = os.path.relpath(path, release_version_dir).replace(os.sep, '/')
+        files[rel_path] = {"size": os.path.getsize(path), "sha256": digest, "etag": digest[:32]}
+    return {"format": RELEASE_MANIFEST_FORMAT, "files": dict(sorted(files.items()))}
+
+def write_release_manifest(release_version_dir, log=print, known=None):
+    """Writes .release-manifest.json into a release directory (atomically)."""
+    manifest = build_release_manifest(release_version_dir, known=known)
+    path = os.path.join(release_version_dir, RELEASE_MANIFEST_FILENAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    log(f"Wrote release manifest for {len(manifest['files'])} file(s).")
+    return manifest
+
+# --- Verifying and comparing releases (from their manifests) ---
+
+def load_release_manifest(release_version_dir):
+    """Returns a release's manifest dict. Raises OSError or ValueError if it is missing or unreadable."""
+    with open(os.path.join(release_version_dir, RELEASE_MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != RELEASE_MANIFEST_FORMAT or not isinstance(manifest.get('files'), dict):
+        raise ValueError(f"unsupported manifest format {manifest.get('format')!r}")
+    return manifest
+
+def list_release_files(release_version_dir):
+    """Returns {relative posix path: size} for every file in a release, except its manifest."""
+    sizes = {}
+    pending = [('', release_version_dir)]
+    while pending:
+        prefix, directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                rel_path = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((rel_path + '/', entry.path))
+                elif rel_path != RELEASE_MANIFEST_FILENAME:
+                    sizes[rel_path] = entry.stat().st_size
+    return sizes
+
+def verify_release(release_version_dir, full=False):
+    """
+    Checks a release directory against its manifest and returns a list of problems (empty if intact).
+    By default only the file list and sizes are compared, which costs one stat per file; with
+    full=True every file is also re-hashed (in chunks) and compared with its recorded SHA-256.
+    Raises OSError or ValueError if the release has no usable manifest.
+    """
+    expected = load_release_manifest(release_version_dir)['files']
+    actual = list_release_files(release_version_dir)
+    problems = [f"missing: {path}" for path in sorted(expected.keys() - actual.keys())]
+    problems += [f"not in manifest: {path}" for path in sorted(actual.keys() - expected.keys())]
+    for path in sorted(expected.keys() & actual.keys()):
+        if actual[path] != expected[path]['size']:
+            problems.append(f"size changed: {path} ({expected[path]['size']} -> {actual[path]} bytes)")
+        elif full and file_digest(os.path.join(release_version_dir, *path.split('/'))) != expected[path]['sha256']:
+            problems.append(f"content changed: {path}")
+    return problems
+
+def find_releases(games_dir, app_names=None, versions=None):
+    """Returns (app_name, version, release dir) for the selected releases, sorted by app and name."""
+    releases = []
+    for app_name in sorted(app_names or os.listdir(games_dir)):
+        releases_dir = os.path.join(games_dir, app_name, 'releases')
+        if not os.path.isdir(releases_dir):
+            continue
+        for version in sorted(versions or os.listdir(releases_dir)):
+            if os.path.isdir(os.path.join(releases_dir, version)):
+                releases.append((app_name, version, os.path.join(releases_dir, version)))
+    return releases
+
+def verify_releases(games_dir, app_names=None, versions=None, full=False, add_missing=False, jobs=None):
+    """
+    Verifies many releases in parallel and prints a line per release. Releases without a manifest
+    (made before manifests existed) are reported as MISSING rather than failed, or with add_missing
+    hashed once and given one. Returns 0 if all were verified intact, else 1.
+    """
+    releases = find_releases(games_dir, app_names, versions)
+    if not releases:
+        print("Error: No releases found to verify.", file=sys.stderr)
+        return 1
+
+    def check(release):
+        """Returns (problems, 'OK' | 'ADDED' | 'MISSING' | 'FAIL') for one release."""
+        app_name, version, release_dir = release
+        if not os.path.exists(os.path.join(release_dir, RELEASE_MANIFEST_FILENAME)):
+            if not add_missing:
+                return [], 'MISSING'
+            write_release_manifest(release_dir, log=lambda message: None)
+            return [], 'ADDED'
+        try:
+            problems = verify_release(release_dir, full)
+        except (OSError, ValueError) as e:
+            problems = [f"unreadable manifest ({e})"]
+        return problems, 'FAIL' if problems else 'OK'
+
+    counts = {'OK': 0, 'ADDED': 0, 'MISSING': 0, 'FAIL': 0}
+    with thread_pool(jobs) as executor:
+        for (app_name, version, _), (problems, result) in zip(releases, executor.map(check, releases)):
+            counts[result] += 1
+            print(f"{result:4} {app_name} {version}{' (no manifest yet)' if result == 'MISSING' else ''}")
+            for problem in problems:
+                print(f"     {problem}")
+    checked = 'hashes' if full else 'sizes'
+    print(f"Verified {len(releases)} release(s) ({checked}): {counts['OK'] + counts['ADDED']} intact, "
+          f"{counts['FAIL']} with problems, {counts['MISSING']} missing a manifest.")
+    if counts['MISSING']:
+        print("Releases made before manifests existed can't be checked; "
+              "run 'verify --add-missing' to create their manifests.")
+    return 1 if counts['FAIL'] or counts['MISSING'] else 0
+
+def diff_manifests(old_files, new_files, include_precompressed=False):
+    """
+    Compares two manifests' file listings. Returns (added, removed, changed) lists of paths.
+    Precompressed .gz/.br siblings are left out unless include_precompressed is True, since
+    they change exactly when the file they were made from changes.
+    """
+    def keep(path, files):
+        base, extension = os.path.splitext(path)
+        return include_precompressed or extension not in ('.gz', '.br') or base not in files
+
+    added = sorted(path for path in new_files.keys() - old_files.keys() if keep(path, new_files))
+    removed = sorted(path for path in old_files.keys() - new_files.keys() if keep(path, old_files))
+    changed = sorted(path for path in old_files.keys() & new_files.keys()
+                     if old_files[path]['sha256'] != new_files[path]['sha256'] and keep(path, new_files))
+    return added, removed, changed
+
+def diff_releases(games_dir, app_name, old_version, new_version, include_precompressed=False):
+    """Prints the files added, removed and changed between two releases. Returns 0 if identical, 1 if not, 2 on error."""
+    manifests = []
+    for version in (old_version, new_version):
+        try:
+            manifests.append(load_release_manifest(os.path.join(games_dir, app_name, 'releases', version))['files'])
+        except (OSError, ValueError) as e:
+            print(f"Error: No usable manifest for {app_name} {version}: {e}", file=sys.stderr)
+            print("Run 'verify --add-missing' to create manifests for older releases.", file=sys.stderr)
+            return 2
+    old_files, new_files = manifests
+    added, removed, changed = diff_manifests(old_files, new_files, include_precompressed)
+    for path in added:
+        print(f"+ {path} ({new_files[path]['size']} bytes)")
+    for path in removed:
+        print(f"- {path} ({old_files[path]['size']} bytes)")
+    for path in changed:
+        print(f"M {path} ({old_files[path]['size']} -> {new_files[path]['size']} bytes)")
+    size_change = sum(f['size'] for f in new_files.values()) - sum(f['size'] for f in old_files.values())
+    print(f"{app_name} {old_version} -> {new_version}: {len(added)} added, {len(removed)} removed, "
+          f"{len(changed)} changed; total size {size_change:+d} bytes.")
+    return 1 if added or removed or changed else 0
+
+# --- Release archives ---
+
+ARCHIVES_DIRNAME = 'archives' # games/<app>/archives/<app>-<version>.zip; derived, ignored by git
+ARCHIVE_SPOOL_SIZE = 1024 * 1024 # Compressed member data kept in memory before spilling to a temp file
+ARCHIVE_DOS_DATE = (0 << 9) | (1 << 5) | 1 # 1980-01-01, the earliest zip timestamp; fixed for reproducibility
+ARCHIVE_DOS_TIME = 0
+ZIP_UTF8_FLAG = 0x0800
+ZIP_MAX_SIZE = 0xFFFFFFFF # No zip64 support; game releases are far smaller
+
+def archive_path(games_dir, app_name, version_tag):
+    return os.path.join(games_dir, app_name, ARCHIVES_DIRNAME, f"{app_name}-{version_tag}.zip")
+
+def _compress_member(path):
+    """
+    Deflates one file into a spooled temp file, streaming in chunks. Returns
+    (method, crc32, compressed size, uncompressed size, spool); the data is stored
+    uncompressed instead when deflate doesn't make it smaller (mp3, png, ...).
+    """
+    import tempfile
+    spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_SIZE)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS) # Raw deflate, as zip expects
+    crc = 0
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            spool.write(compressor.compress(chunk))
+    spool.write(compressor.flush())
+    compressed_size = spool.tell()
+    if compressed_size >= size:
+        spool.close()
+        return 0, crc, size, size, None # Stored: copied straight from the source file
+    spool.seek(0)
+    return 8, crc, compressed_size, size, spool
+
+def write_release_archive(release_version_dir, target_path, jobs=None, log=print):
+    """
+    Writes a reproducible zip of a release: members sorted by path, fixed timestamps and
+    permissions, no extra fields, so the same release always gives byte-identical archives.
+    Precompressed .gz/.br siblings are left out (the zip compresses the originals itself).
+    Files are compressed in parallel on a thread pool while the archive is written in order;
+    at most a bounded number of compressed members are waiting, each spooled to disk past
+    ARCHIVE_SPOOL_SIZE, so memory use doesn't grow with the release size.
+    """
+    files = list_release_files(release_version_dir)
+    if os.path.exists(os.path.join(release_version_dir, RELEASE_MANIFEST_FILENAME)):
+        files[RELEASE_MANIFEST_FILENAME] = None # Ship the manifest so mirrors can verify their copy
+    names = sorted(path for path in files
+                   if not (os.path.splitext(path)[1] in ('.gz', '.br') and os.path.splitext(path)[0] in files))
+    sources = [os.path.join(release_version_dir, *name.split('/')) for name in names]
+    workers = jobs or min(8, os.cpu_count() or 1)
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    central = []
+    try:
+        with open(tmp_path, 'wb') as out, thread_pool(workers) as executor:
+            pending = deque()
+            queued = iter(zip(names, sources))
+            def submit_next():
+                item = next(queued, None)
+                if item is not None:
+                    pending.append((item[0], item[1], executor.submit(_compress_member, item[1])))
+            for _ in range(2 * workers):
+                submit_next()
+            while pending:
+                name, source, future = pending.popleft()
+                method, crc, compressed_size, size, spool = future.result()
+                submit_next()
+                if size > ZIP_MAX_SIZE or out.tell() > ZIP_MAX_SIZE:
+                    raise ValueError(f"{name} does not fit in a zip without zip64 support")
+                encoded_name = name.encode('utf-8')
+                offset = out.tell()
+                out.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, ZIP_UTF8_FLAG, method, ARCHIVE_DOS_TIME,
+                                      ARCHIVE_DOS_DATE, crc, compressed_size, size, len(encoded_name), 0))
+                out.write(encoded_name)
+                if spool is not None:
+                    with spool:
+                        shutil.copyfileobj(spool, out, HASH_CHUNK_SIZE)
+                else:
+                    with open(source, 'rb') as f:
+                        shutil.copyfileobj(f, out, HASH_CHUNK_SIZE)
+                central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | 20, 20, ZIP_UTF8_FLAG, method,
+                                           ARCHIVE_DOS_TIME, ARCHIVE_DOS_DATE, crc, compressed_size, size,
+                                           len(encoded_name), 0, 0, 0, 0, 0o100644 << 16, offset) + encoded_name)
+            central_offset = out.tell()
+            for record in central:
+                out.write(record)
+            out.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central), len(central),
+                                  out.tell() - central_offset, central_offset, 0))
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    log(f"Wrote release archive {target_path} ({len(names)} file(s), {os.path.getsize(target_path)} bytes).")
+    return target_path
+
+def archive_releases(games_dir, app_names=None, versions=None, jobs=None):
+    """Builds (or rebuilds) archives for existing releases. Returns 0 on success, 1 if any failed."""
+    releases = find_releases(games_dir, app_names, versions)
+    if not releases:
+        print("Error: No releases found to archive.", file=sys.stderr)
+        return 1
+    failed = 0
+    for app_name, version, release_dir in releases:
+        try:
+            write_release_archive(release_dir, archive_path(games_dir, app_name, version), jobs=jobs)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not archive {app_name} {version}: {e}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+# --- Root index generation lives in scripts/generate_index.py (shared with the CLI) ---
 
-    app_name = args.app_name
-    version_tag = args.version_tag # This is just the version number like '1.0.0'
+def regenerate_root_index(git_root, app_names, out=None, err=None):
+    """Updates the root index.html for the given (just released) apps, reporting to out/err (default stdout/stderr)."""
+    # Imported lazily; `packaging` is only needed for versions that aren't plain X.Y.Z
+    from generate_index import update_root_index
+    # Only these apps' releases changed; every other game comes from the index cache
+    update_root_index(git_root, changed_apps=app_names, out=out, err=err) # Pass the determined git_root
+
+# --- Batch releases ---
+
+def load_manifest(manifest_path):
+    """
+    Reads a list of (app_name, version_tag) pairs from a manifest file. Accepts either a JSON
+    list of {"app_name": ..., "version_tag": ...} objects, or plain text with one
+    "<app_name> <version_tag>" pair per line (blank lines and '#' comments are ignored).
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        return [(item['app_name'], item['version_tag']) for item in json.loads(content)]
+    pairs = []
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        parts = line.split()
+        if len(parts) != 2:
+            raise ValueError(f"{manifest_path}:{line_number}: expected '<app_name> <version_tag>', got '{line}'")
+        pairs.append((parts[0], parts[1]))
+    return pairs
+
+def run_batch(manifest_path, snapshot_mode="dedup", jobs=None, compress=True, archive=True, optimize=None, offline=True):
+    """
+    Releases every app/version pair in a manifest: all pairs are validated up front, trees are
+    copied in parallel, all tags are created in one all-or-nothing pass, pushed with
+    a single `git push`, and the root index is regenerated once. Returns a process exit code.
+    """
+    try:
+        pairs = load_manifest(manifest_path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error reading manifest {manifest_path}: {e}", file=sys.stderr)
+        return 1
+    if not pairs:
+        print(f"Error: Manifest {manifest_path} lists no releases.", file=sys.stderr)
+        return 1
+
+    git_root = find_git_root()
+    if not git_root:
+        print(f"Error: Could not determine Git repository root.", file=sys.stderr)
+        return 1
+    repo = GitRepo(git_root)
+    try:
+        existing_tags = repo.list_tags()
+    except (GitError, OSError) as e:
+        print(f"Error checking for existing tags: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Starting batch release of {len(pairs)} app version(s) from {manifest_path}")
+    print(f"Repository Root: {git_root}")
+
+    # Hold each app's release lock until its tags are pushed, taken in name order so that
+    # concurrent batches can't deadlock; invalid names are rejected below, before any work
+    with contextlib.ExitStack() as locks:
+        for app_name in sorted({app_name for app_name, _ in pairs if _validate_name(app_name)}):
+            locks.enter_context(FileLock(app_lock_path(git_root, app_name),
+                                         waiting_message=f"Waiting for another release of {app_name} to finish..."))
+
+        # --- Pre-checks (nothing is touched unless every entry is valid) ---
+        releases = []
+        errors = []
+        seen = set()
+        for app_name, version_tag in pairs:
+            full_tag_name = f"{app_name}-v{version_tag}"
+            app_dir = os.path.join(git_root, 'games', app_name)
+            release = {
+                'app_name': app_name,
+                'version_tag': version_tag,
+                'tag': full_tag_name,
+                'working_dir': os.path.join(app_dir, 'working'),
+                'releases_dir': os.path.join(app_dir, 'releases'),
+                'release_version_dir': os.path.join(app_dir, 'releases', version_tag),
+            }
+            if not (_validate_name(app_name) and _validate_name(version_tag)):
+                errors.append(f"Invalid manifest entry: {app_name} {version_tag}")
+            elif full_tag_name in seen:
+                errors.append(f"Duplicate manifest entry: {app_name} {version_tag}")
+            elif not os.path.isdir(release['working_dir']):
+                errors.append(f"Working directory not found: {release['working_dir']}")
+            elif os.path.exists(release['release_version_dir']):
+                errors.append(f"Release directory already exists: {release['release_version_dir']}")
+            elif full_tag_name in existing_tags:
+                errors.append(f"Tag '{full_tag_name}' already exists.")
+            seen.add(full_tag_name)
+            releases.append(release)
+        if errors:
+            for error in errors:
+                print(f"Error: {error}", file=sys.stderr)
+            print("No releases were created.", file=sys.stderr)
+            return 1
+
+        # --- 1. Copy Files (in parallel) ---
+        def copy_one(release):
+            lines = []
+            try:
+                copy_release(release['working_dir'], release['releases_dir'], release['release_version_dir'],
+                             snapshot_mode, log=lines.append, compress=compress, archive=archive, optimize=optimize,
+                             offline=offline)
+                return release, None, lines
+            except Exception as e:
+                return release, e, lines
+
+        jobs = jobs or min(8, os.cpu_count() or 1)
+        copied = []
+        failed = False
+        print(f"\nCopying {len(releases)} release tree(s) with {jobs} worker(s)...")
+        with thread_pool(jobs) as executor:
+            for release, error, lines in executor.map(copy_one, releases):
+                print(f"[{release['tag']}]")
+                for line in lines:
+                    print(f"  {line}")
+                if error is not None:
+                    print(f"Error copying files for {release['tag']}: {error}", file=sys.stderr)
+                    failed = True
+                else:
+                    copied.append(release)
+        if not copied:
+            print("Error: No release trees were copied.", file=sys.stderr)
+            return 1
+
+        # --- 2. Git Tagging (one pass) ---
+        tags = [release['tag'] for release in copied]
+        try:
+            head = repo.resolve_head()
+        except (GitError, OSError) as e:
+            print(f"Error resolving HEAD: {e}", file=sys.stderr)
+            return 1
+        print(f"\nCreating {len(tags)} tag(s) at {head}...")
+        created = []
+        try:
+            for tag in tags:
+                repo.create_tag(tag, head)
+                created.append(tag)
+        except (GitError, OSError) as e:
+            # All or nothing: remove the tags this run already created
+            for tag in created:
+                repo.delete_tag(tag)
+            print(f"Error creating tags: {e}", file=sys.stderr)
+            print("Files were copied, but no tags were created.", file=sys.stderr)
+            return 1
+        print("Tags created locally.")
+
+        # Push all tags to remote 'fun' in a single push
+        print(f"Pushing {len(tags)} tag(s) to remote 'fun'...")
+        try:
+            repo.push('fun', tags)
+        except GitError as e:
+            print(f"Error pushing tags to fun: {e}", file=sys.stderr)
+            print("Warning: Failed to push tags to remote. Local tags still exist.", file=sys.stderr)
+            return 1
+
+        print(f"\nSuccessfully copied files, created and pushed {len(tags)} tag(s).")
+
+    # --- 3. Generate Root Index (once) ---
+    regenerate_root_index(git_root, sorted({release['app_name'] for release in copied}))
+
+    return 1 if failed else 0
+
+
+def release(app_name, version_tag, snapshot_mode="dedup", git_root=None, out=None, err=None, compress=True,
+            archive=True, optimize=None, offline=True):
+    """
+    Creates release <version_tag> of <app_name>: snapshots games/<app_name>/working, creates and
+    pushes the <app_name>-v<version_tag> tag, and regenerates the root index.
+    Progress goes to `out` and errors to `err` (file-like, default stdout/stderr) so callers such as
+    the admin server can capture it. Returns 0 on success and 1 on failure, like the CLI.
+    """
+    out = out or sys.stdout
+    err = err or sys.stderr
     full_tag_name = f"{app_name}-v{version_tag}" # Git tag includes app name and 'v' prefix
 
+    # Both names end up in paths and ref names, so keep them to plain directory-safe tokens
+    for label, value in (("app name", app_name), ("version tag", version_tag)):
+        if not _validate_name(value):
+            print(f"Error: Invalid {label}: '{value}'", file=err)
+            return 1
+
     # --- Determine Paths ---
-    git_root, _, exit_code = run_command("git rev-parse --show-toplevel")
-    if exit_code != 0:
-        print(f"Error: Could not determine Git repository root.", file=sys.stderr)
-        sys.exit(1)
+    git_root = git_root or find_git_root()
+    if not git_root:
+        print(f"Error: Could not determine Git repository root.", file=err)
+        return 1
+    repo = GitRepo(git_root)
 
     games_dir = os.path.join(git_root, 'games')
     app_dir = os.path.join(games_dir, app_name)
@@ -192,93 +949,266 @@ def main():
     releases_dir = os.path.join(app_dir, 'releases')
     release_version_dir = os.path.join(releases_dir, version_tag) # Directory named just '1.0.0'
 
-    print(f"Starting release process for {app_name} version {version_tag}")
-    print(f"Repository Root: {git_root}")
-    print(f"Working Directory: {working_dir}")
-    print(f"Target Release Directory: {release_version_dir}")
+    print(f"Starting release process for {app_name} version {version_tag}", file=out)
+    print(f"Repository Root: {git_root}", file=out)
+    print(f"Working Directory: {working_dir}", file=out)
+    print(f"Target Release Directory: {release_version_dir}", file=out)
 
-    # --- Pre-checks ---
-    if not os.path.isdir(working_dir):
-        print(f"Error: Working directory not found: {working_dir}", file=sys.stderr)
-        print("Ensure the game follows the structure defined in .roo/rules/rules.md", file=sys.stderr)
-        sys.exit(1)
+    # The per-app lock makes the checks below and the copy/tag steps one unit, so a concurrent
+    # release of the same app (another admin request, or the CLI) waits instead of racing
+    with FileLock(app_lock_path(git_root, app_name), waiting_message=f"Waiting for another release of {app_name} to finish...",
+                  log=lambda message: print(message, file=out)):
+        # --- Pre-checks ---
+        if not os.path.isdir(working_dir):
+            print(f"Error: Working directory not found: {working_dir}", file=err)
+            print("Ensure the game follows the structure defined in .roo/rules/rules.md", file=err)
+            return 1
 
-    if os.path.exists(release_version_dir):
-        print(f"Error: Release directory already exists: {release_version_dir}", file=sys.stderr)
-        print("Delete the existing directory or choose a different version tag.", file=sys.stderr)
-        sys.exit(1)
-
-    # --- 1. Copy Files ---
-    try:
-        print(f"Copying files from {working_dir} to {release_version_dir}...")
-        # ignore_dangling_symlinks=True might be needed on some systems if symlinks cause issues
-        shutil.copytree(working_dir, release_version_dir, symlinks=False, ignore=None)
-        print("Files copied successfully.")
-    except OSError as e:
-        print(f"Error copying files: {e}", file=sys.stderr)
-        # Clean up potentially partially created directory
         if os.path.exists(release_version_dir):
-            try:
-                shutil.rmtree(release_version_dir)
-                print(f"Cleaned up partially created directory: {release_version_dir}")
-            except OSError as cleanup_e:
-                print(f"Error cleaning up directory {release_version_dir}: {cleanup_e}", file=sys.stderr)
-        sys.exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred during file copy: {e}", file=sys.stderr)
-        sys.exit(1)
-
-    # --- 2. Git Tagging ---
-    print(f"\nAttempting to create and push Git tag: {full_tag_name}")
-
-    # Check if tag already exists
-    print(f"Checking if tag '{full_tag_name}' already exists...")
-    stdout, stderr, exit_code = run_command(f"git tag -l {full_tag_name}", cwd=git_root)
-    if exit_code != 0:
-        print(f"Error checking for existing tag: {stderr}", file=sys.stderr)
-        # Consider rolling back file copy? For now, exit.
-        sys.exit(1)
-    if stdout:
-        print(f"Error: Tag '{full_tag_name}' already exists. Files were copied, but tag was not created.", file=sys.stderr)
-        # Files are copied, but tag exists. This is an inconsistent state.
-        # Maybe offer to delete the copied files? For now, exit.
-        sys.exit(1)
-    print("Tag does not exist. Proceeding...")
-
-    # Create the tag
-    print(f"Creating tag '{full_tag_name}'...")
-    stdout, stderr, exit_code = run_command(f"git tag {full_tag_name}", cwd=git_root)
-    if exit_code != 0:
-        print(f"Error creating tag: {stderr}", file=sys.stderr)
-        # Attempt to clean up if tag creation failed partially
-        run_command(f"git tag -d {full_tag_name}", cwd=git_root)
-        # Consider rolling back file copy? For now, exit.
-        sys.exit(1)
-    print(f"Tag '{full_tag_name}' created locally.")
-
-    # Push the tag to remote 'fun'
-    print(f"Pushing tag '{full_tag_name}' to remote 'fun'...")
-    stdout, stderr, exit_code = run_command(f"git push fun {full_tag_name}", cwd=git_root)
-    if exit_code != 0:
-        print(f"Error pushing tag to fun: {stderr}", file=sys.stderr)
-        print(f"Warning: Failed to push tag '{full_tag_name}' to remote. Local tag still exists.", file=sys.stderr)
-        # Files copied, local tag created, but push failed. Exit with error.
-        sys.exit(1) # Indicate failure
-
-    print(f"\nSuccessfully copied files, created and pushed tag '{full_tag_name}'.")
+            print(f"Error: Release directory already exists: {release_version_dir}", file=err)
+            print("Delete the existing directory or choose a different version tag.", file=err)
+            return 1
+
+        # --- 1. Copy Files ---
+        try:
+            copy_release(working_dir, releases_dir, release_version_dir, snapshot_mode,
+                         log=lambda message: print(message, file=out), compress=compress, archive=archive,
+                         optimize=optimize, offline=offline)
+        except OSError as e:
+            print(f"Error copying files: {e}", file=err)
+            return 1
+        except Exception as e:
+            print(f"An unexpected error occurred during file copy: {e}", file=err)
+            return 1
+
+        # --- 2. Git Tagging ---
+        print(f"\nAttempting to create and push Git tag: {full_tag_name}", file=out)
+
+        # Check if tag already exists
+        print(f"Checking if tag '{full_tag_name}' already exists...", file=out)
+        try:
+            tag_exists = repo.tag_exists(full_tag_name)
+        except (GitError, OSError) as e:
+            print(f"Error checking for existing tag: {e}", file=err)
+            # Consider rolling back file copy? For now, exit.
+            return 1
+        if tag_exists:
+            print(f"Error: Tag '{full_tag_name}' already exists. Files were copied, but tag was not created.", file=err)
+            # Files are copied, but tag exists. This is an inconsistent state.
+            # Maybe offer to delete the copied files? For now, exit.
+            return 1
+        print("Tag does not exist. Proceeding...", file=out)
+
+        # Create the tag
+        print(f"Creating tag '{full_tag_name}'...", file=out)
+        try:
+            repo.create_tag(full_tag_name, repo.resolve_head())
+        except (GitError, OSError) as e:
+            print(f"Error creating tag: {e}", file=err)
+            # Consider rolling back file copy? For now, exit.
+            return 1
+        print(f"Tag '{full_tag_name}' created locally.", file=out)
+
+        # Push the tag to remote 'fun'
+        print(f"Pushing tag '{full_tag_name}' to remote 'fun'...", file=out)
+        try:
+            repo.push('fun', [full_tag_name])
+        except GitError as e:
+            print(f"Error pushing tag to fun: {e}", file=err)
+            print(f"Warning: Failed to push tag '{full_tag_name}' to remote. Local tag still exists.", file=err)
+            # Files copied, local tag created, but push failed. Exit with error.
+            return 1 # Indicate failure
+
+        print(f"\nSuccessfully copied files, created and pushed tag '{full_tag_name}'.", file=out)
 
     # --- 3. Generate Root Index ---
-    # Check for packaging library before calling update_root_index
-    try:
-        import packaging.version
-    except ImportError:
-        print("\nError: The 'packaging' library is required for index generation.", file=sys.stderr)
-        print("Please install it using: pip install packaging", file=sys.stderr)
-        print("Warning: Skipping root index.html generation.", file=sys.stderr)
+    # Releases of different apps may run in parallel; update_root_index holds the per-repo lock
+    regenerate_root_index(git_root, [app_name], out, err)
+
+    return 0 # Indicate success
+
+
+# --- Plans (dry runs) ---
+
+def plan_release(app_name, version_tag, snapshot_mode="dedup", git_root=None, out=None, err=None, compress=True,
+                 archive=True, optimize=None, offline=True):
+    """
+    Prints the steps release() would take with the same arguments, and runs its pre-checks,
+    without copying files or starting git: the tag check reads .git directly (repositories that
+    need the git CLI skip it). Returns 0 if the release could go ahead and 1 otherwise.
+    """
+    out = out or sys.stdout
+    err = err or sys.stderr
+    for label, value in (("app name", app_name), ("version tag", version_tag)):
+        if not _validate_name(value):
+            print(f"Error: Invalid {label}: '{value}'", file=err)
+            return 1
+    git_root = git_root or find_git_root()
+    if not git_root:
+        print(f"Error: Could not determine Git repository root.", file=err)
+        return 1
+
+    full_tag_name = f"{app_name}-v{version_tag}"
+    games_dir = os.path.join(git_root, 'games')
+    app_dir = os.path.join(games_dir, app_name)
+    working_dir = os.path.join(app_dir, 'working')
+    releases_dir = os.path.join(app_dir, 'releases')
+    release_version_dir = os.path.join(releases_dir, version_tag)
+    problems = []
+    steps = []
+
+    sizes = {} # Relative path -> size of every file the release will hold
+    if not os.path.isdir(working_dir):
+        problems.append(f"Working directory not found: {working_dir}")
     else:
-       update_root_index(git_root) # Pass the determined git_root
+        for root, _, files in os.walk(working_dir, followlinks=True):
+            for name in files:
+                path = os.path.join(root, name)
+                sizes[os.path.relpath(path, working_dir).replace(os.sep, '/')] = os.path.getsize(path)
+    file_count, total_size = len(sizes), sum(sizes.values())
+    if os.path.exists(release_version_dir):
+        problems.append(f"Release directory already exists: {release_version_dir}")
+
+    if optimize is not None:
+        steps.append("Optimize assets into a staging copy of working/ (results cached in .asset_cache/)")
+    previous_release_dir = (find_previous_release(releases_dir, lambda message: print(message, file=err))
+                            if snapshot_mode == "dedup" else None)
+    snapshot = (f"deduplicating against {os.path.basename(previous_release_dir)}" if previous_release_dir
+                else "copying every file")
+    steps.append(f"Snapshot working/ ({file_count} file(s), {total_size} bytes) into a temporary directory, {snapshot}")
+    if offline:
+        entry_point = version_index.find_entry_point(working_dir, app_name) if os.path.isdir(working_dir) else None
+        steps.append(f"Add preload hints and a service worker to {entry_point}" if entry_point
+                     else "Skip preload hints and service worker (no entry point found)")
+        if entry_point:
+            # The offline stage grows the entry point and adds files that are precompressed too
+            import offline_cache
+            sizes[entry_point] += len(offline_cache.REGISTER_SNIPPET.encode('utf-8'))
+            sizes.update(offline_cache.estimate_generated_sizes(working_dir, app_name, version_tag))
+    if compress:
+        compressible = sum(1 for rel_path, size in sizes.items()
+                           if os.path.splitext(rel_path)[1].lower() in COMPRESSIBLE_EXTENSIONS and size >= MIN_COMPRESS_SIZE)
+        steps.append(f"Precompress {compressible} asset(s) as .gz{' and .br' if brotli is not None else ''}")
+    steps.append(f"Write the release manifest, rename the directory to {release_version_dir} and update the version index")
+    if archive:
+        steps.append(f"Write {archive_path(games_dir, app_name, version_tag)}")
+
+    repo = GitRepo(git_root)
+    if repo.native:
+        if repo.tag_exists(full_tag_name):
+            problems.append(f"Tag '{full_tag_name}' already exists.")
+        head = repo.read_ref('HEAD')
+        steps.append(f"Create tag {full_tag_name} at {head[:12] if head else '(no commit)'} and push it to 'fun'")
+    else:
+        steps.append(f"Create tag {full_tag_name} at HEAD and push it to 'fun' (tag not checked: needs the git CLI)")
+    steps.append(f"Regenerate index.html for {app_name}")
+
+    print(f"Plan for {app_name} {version_tag} (dry run, nothing is changed):", file=out)
+    for number, step in enumerate(steps, start=1):
+        print(f"  {number}. {step}", file=out)
+    for problem in problems:
+        print(f"Error: {problem}", file=err)
+    return 1 if problems else 0
+
+def plan_batch(manifest_path, snapshot_mode="dedup", compress=True, archive=True, optimize=None, offline=True):
+    """Prints the plan of every release in a manifest (see run_batch). Returns a process exit code."""
+    try:
+        pairs = load_manifest(manifest_path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error reading manifest {manifest_path}: {e}", file=sys.stderr)
+        return 1
+    git_root = find_git_root()
+    if not git_root:
+        print(f"Error: Could not determine Git repository root.", file=sys.stderr)
+        return 1
+    exit_code = 0 if pairs else 1
+    seen = set()
+    for app_name, version_tag in pairs:
+        if (app_name, version_tag) in seen:
+            print(f"Error: Duplicate manifest entry: {app_name} {version_tag}", file=sys.stderr)
+            exit_code = 1
+        seen.add((app_name, version_tag))
+        exit_code |= plan_release(app_name, version_tag, snapshot_mode, git_root=git_root, compress=compress,
+                                  archive=archive, optimize=optimize, offline=offline)
+    print(f"\nAll tags would be created in one pass and pushed together; index.html is regenerated once.")
+    return exit_code
+
+
+def inspect_main(argv):
+    """The 'verify', 'archive' and 'diff' commands, which work on existing releases."""
+    parser = argparse.ArgumentParser(prog="release_manager.py", description="Verify, archive or compare existing releases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    verify_parser = commands.add_parser("verify", help="Check releases against their manifests.")
+    verify_parser.add_argument("app_name", nargs="?", help="Only this application (default: all).")
+    verify_parser.add_argument("versions", nargs="*", help="Only these versions (default: all).")
+    verify_parser.add_argument("--full", action="store_true", help="Re-hash every file instead of only comparing names and sizes.")
+    verify_parser.add_argument("--add-missing", action="store_true", help="Write manifests for releases that don't have one yet.")
+    verify_parser.add_argument("--jobs", type=int, default=None, help="Releases checked in parallel (default: min(8, CPU count)).")
+    archive_parser = commands.add_parser("archive", help="Build (or rebuild) zip archives of existing releases.")
+    archive_parser.add_argument("app_name", nargs="?", help="Only this application (default: all).")
+    archive_parser.add_argument("versions", nargs="*", help="Only these versions (default: all).")
+    archive_parser.add_argument("--jobs", type=int, default=None, help="Files compressed in parallel (default: min(8, CPU count)).")
+    diff_parser = commands.add_parser("diff", help="List files added, removed and changed between two releases.")
+    diff_parser.add_argument("app_name")
+    diff_parser.add_argument("old_version")
+    diff_parser.add_argument("new_version")
+    diff_parser.add_argument("--all", action="store_true", help="Include precompressed .gz/.br siblings.")
+    args = parser.parse_args(argv)
+
+    git_root = find_git_root()
+    if not git_root:
+        print("Error: Could not determine Git repository root.", file=sys.stderr)
+        return 2
+    games_dir = os.path.join(git_root, 'games')
+    if args.command == "verify":
+        return verify_releases(games_dir, [args.app_name] if args.app_name else None, args.versions or None,
+                               full=args.full, add_missing=args.add_missing, jobs=args.jobs)
+    if args.command == "archive":
+        return archive_releases(games_dir, [args.app_name] if args.app_name else None, args.versions or None, jobs=args.jobs)
+    return diff_releases(games_dir, args.app_name, args.old_version, args.new_version, include_precompressed=args.all)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("verify", "archive", "diff"):
+        sys.exit(inspect_main(sys.argv[1:]))
+
+    parser = argparse.ArgumentParser(description="Create a release archive and git tag for an application.",
+                                     epilog="Also: 'verify [app_name [version ...]]', 'archive [app_name [version ...]]' and "
+                                            "'diff <app_name> <v1> <v2>' (see '<command> --help').")
+    parser.add_argument("app_name", nargs="?", help="The name of the application (e.g., 'balloon-puff').")
+    parser.add_argument("version_tag", nargs="?", help="The version tag to create (e.g., '1.0.0').")
+    parser.add_argument("--snapshot", choices=["dedup", "copy"], default="dedup",
+                        help="'dedup' hard-links/reflinks files unchanged since the previous release (default); 'copy' always copies.")
+    parser.add_argument("--manifest", help="Release many apps at once from a manifest (JSON list or '<app_name> <version_tag>' lines).")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel copy workers for --manifest (default: min(8, CPU count)).")
+    parser.add_argument("--no-compress", action="store_true", help="Don't write precompressed .gz/.br siblings for compressible assets.")
+    parser.add_argument("--no-archive", action="store_true", help="Don't write the release's zip archive (games/<app>/archives/).")
+    parser.add_argument("--no-offline", action="store_true",
+                        help="Don't add preload hints, a service worker or a precache manifest to the release.")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Minify HTML/CSS/JS and re-encode audio before snapshotting (results cached in .asset_cache/).")
+    parser.add_argument("--audio-bitrate", help="Target audio bitrate for --optimize (default: 96k).")
+    parser.add_argument("--trim-silence", action="store_true", help="With --optimize, also trim leading/trailing silence from audio.")
+    parser.add_argument("--plan", "--dry-run", dest="plan", action="store_true",
+                        help="Only print what the release would do and run its pre-checks; nothing is copied and git isn't run.")
+    args = parser.parse_args()
+    optimize = None
+    if args.optimize: # Unset options fall back to asset_optimizer.DEFAULT_OPTIONS
+        optimize = {'trim_silence': args.trim_silence, **({'audio_bitrate': args.audio_bitrate} if args.audio_bitrate else {})}
+
+    if args.manifest:
+        if args.app_name or args.version_tag:
+            parser.error("app_name/version_tag cannot be combined with --manifest")
+        if args.plan:
+            sys.exit(plan_batch(args.manifest, args.snapshot, compress=not args.no_compress, archive=not args.no_archive,
+                                optimize=optimize, offline=not args.no_offline))
+        sys.exit(run_batch(args.manifest, args.snapshot, args.jobs, compress=not args.no_compress, archive=not args.no_archive,
+                           optimize=optimize, offline=not args.no_offline))
+    if not args.app_name or not args.version_tag:
+        parser.error("app_name and version_tag are required (or use --manifest)")
 
-    sys.exit(0) # Indicate success
+    run = plan_release if args.plan else release
+    sys.exit(run(args.app_name, args.version_tag, snapshot_mode=args.snapshot, compress=not args.no_compress,
+                 archive=not args.no_archive, optimize=optimize, offline=not args.no_offline))
 
 
 if __name__ == "__main__":
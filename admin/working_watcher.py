@@ -0,0 +1,313 @@
+# Purpose: Watches every games/*/working tree so the admin server reacts to edits as they
+#          happen: open preview tabs of a working copy reload themselves (over Server-Sent
+#          Events, or just swap their stylesheets when only CSS changed), and the catalog
+#          rechecks the uncommitted state of the games that changed instead of running a
+#          full git status on every rebuild. Uses inotify (one watch per directory, added as
+#          directories appear); without it, the trees are polled for mtime/size changes.
+#          Bursts of events (an editor writing a temp file and renaming it, a git checkout
+#          touching hundreds of files) are debounced into a single change per game.
+# Usage: Started by admin/admin_server.py next to the catalog watcher.
+#        FUN_LIVE_RELOAD=0 stops the reload snippet from being injected into previews.
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from urllib.parse import quote
+
+try:
+    # Optional: pip install inotify_simple (Linux only)
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None # Fall back to mtime polling
+
+# id increases by one per change across all games; paths are relative to the working dir
+WorkingChange = namedtuple('WorkingChange', ['id', 'app_name', 'paths', 'more', 'time'])
+
+WORKING_DIRNAME = 'working'
+PATHS_LIMIT = 50 # Paths listed per change; the rest are only counted in `more`
+EDITOR_TEMP_FILE = re.compile(r'^(\..*|.*~|.*\.sw[a-p]|.*\.tmp|4913)$') # Dotfiles, backups, vim swap/probe files
+
+BODY_CLOSE = re.compile(r'</body\s*>', re.I)
+LIVE_RELOAD_START, LIVE_RELOAD_END = '<!-- fun:live-reload -->', '<!-- /fun:live-reload -->'
+LIVE_RELOAD_SCRIPT = """<script>(function () {
+    var source = new EventSource(%s);
+    source.addEventListener('change', function (event) {
+        var change = JSON.parse(event.data);
+        var cssOnly = change.more === 0 && change.paths.length > 0 &&
+            change.paths.every(function (path) { return /\\.css$/i.test(path); });
+        if (!cssOnly) {
+            source.close();
+            location.reload();
+            return;
+        }
+        document.querySelectorAll('link[rel~="stylesheet"]').forEach(function (link) {
+            var url = new URL(link.href);
+            url.searchParams.set('fun-reload', change.id);
+            link.href = url.href;
+        });
+    });
+})();</script>"""
+
+def inject_live_reload(document, events_url):
+    """Returns document with a script that follows events_url (before the last </body>, or at the end)."""
+    script = LIVE_RELOAD_SCRIPT % json.dumps(events_url).replace('</', '<\\/')
+    body_close = None
+    for body_close in BODY_CLOSE.finditer(document):
+        pass # The last </body>
+    position = body_close.start() if body_close else len(document)
+    return document[:position] + LIVE_RELOAD_START + script + LIVE_RELOAD_END + document[position:]
+
+def events_url(app_name, since):
+    return f"/api/preview/{quote(app_name)}/events?since={since}"
+
+class WorkingTreeWatcher:
+    """
+    Watches games_dir/*/working and publishes a WorkingChange per game once its files have
+    been quiet for `debounce` seconds (or, during a long burst, at least every `max_delay`).
+    Each function in `listeners` is called with every change from the watcher thread;
+    changes_since() and wait() serve the SSE streams.
+    """
+
+    def __init__(self, games_dir, debounce=0.2, max_delay=1.0, poll_interval=1.0, history=256):
+        self.games_dir = games_dir
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval # Only used without inotify
+        self.listeners = []
+        self.mode = None # 'inotify' or 'polling' once started
+        self.stats = {'events': 0, 'changes': 0} # Approximate (unlocked) counters for /metrics
+        self._changes = deque(maxlen=history)
+        self._sequence = 0
+        self._changed = threading.Condition()
+        self._pending = {} # app_name -> set of changed paths, not yet published
+        self._first_pending_at = None
+        self._last_pending_at = None
+        self._inotify = None
+        self._watches = {} # watch descriptor -> directory
+
+    @property
+    def running(self):
+        return self.mode is not None
+
+    @property
+    def sequence(self):
+        """The id of the latest change (0 before the first one)."""
+        return self._sequence
+
+    def start(self):
+        """Starts the background watcher thread (once). Returns the mode it runs in."""
+        if self.mode is not None:
+            return self.mode
+        target = self._poll_loop
+        if INotify is not None:
+            try:
+                self._inotify = INotify()
+                self._sync_watches(self.games_dir)
+                target = self._inotify_loop
+            except OSError as e:
+                print(f"Warning: Could not start inotify for working dirs, falling back to polling: {e}", file=sys.stderr)
+                self._inotify = None
+        self.mode = 'inotify' if self._inotify is not None else 'polling'
+        threading.Thread(target=target, name='working-watcher', daemon=True).start()
+        return self.mode
+
+    # --- Publishing ---
+
+    def _record(self, app_name, rel_path):
+        """Adds a changed path to the pending (not yet debounced) changes."""
+        if not rel_path or any(EDITOR_TEMP_FILE.match(part) for part in rel_path.split('/')):
+            return # The working dir itself (its files are recorded separately) or an editor's scratch file
+        now = time.monotonic()
+        if not self._pending:
+            self._first_pending_at = now
+        self._last_pending_at = now
+        self._pending.setdefault(app_name, set()).add(rel_path)
+        self.stats['events'] += 1
+
+    def _flush_timeout(self):
+        """Seconds until the pending changes are due, or None if there are none."""
+        if not self._pending:
+            return None
+        due = min(self._last_pending_at + self.debounce, self._first_pending_at + self.max_delay)
+        return max(0.0, due - time.monotonic())
+
+    def _flush(self):
+        """Publishes the pending changes, one per game, if they are due."""
+        timeout = self._flush_timeout()
+        if timeout is None or timeout > 0:
+            return
+        pending, self._pending = self._pending, {}
+        published = []
+        with self._changed:
+            for app_name in sorted(pending):
+                paths = sorted(pending[app_name])
+                self._sequence += 1
+                change = WorkingChange(self._sequence, app_name, paths[:PATHS_LIMIT],
+                                       max(0, len(paths) - PATHS_LIMIT), time.time())
+                self._changes.append(change)
+                published.append(change)
+            self._changed.notify_all()
+        self.stats['changes'] += len(published)
+        for change in published:
+            for listener in self.listeners:
+                try:
+                    listener(change)
+                except Exception as e:
+                    print(f"Error in working dir change listener: {e}", file=sys.stderr)
+
+    def changes_since(self, change_id, app_name=None):
+        """Returns the retained changes after change_id (optionally for one game), oldest first."""
+        with self._changed:
+            return [change for change in self._changes
+                    if change.id > change_id and (app_name is None or change.app_name == app_name)]
+
+    def wait(self, change_id, timeout):
+        """Blocks until a change after change_id is published or timeout elapses. Returns the latest id."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._sequence > change_id, timeout)
+            return self._sequence
+
+    # --- inotify ---
+
+    def _split(self, path):
+        """Returns (app_name, path relative to its working dir) for a path under games_dir, or None."""
+        parts = os.path.relpath(path, self.games_dir).split(os.sep)
+        if len(parts) < 2 or parts[1] != WORKING_DIRNAME:
+            return None
+        return parts[0], '/'.join(parts[2:])
+
+    def _add_watch(self, path):
+        mask = (inotify_flags.CREATE | inotify_flags.DELETE | inotify_flags.MOVED_FROM | inotify_flags.MOVED_TO |
+                inotify_flags.MODIFY | inotify_flags.CLOSE_WRITE | inotify_flags.ATTRIB | inotify_flags.DELETE_SELF)
+        if path in self._watches.values():
+            return
+        try:
+            self._watches[self._inotify.add_watch(path, mask)] = path
+        except OSError:
+            pass # Directory vanished before it could be watched
+
+    def _remove_watches(self, path):
+        """Stops watching path and every directory below it."""
+        for wd, directory in list(self._watches.items()):
+            if directory == path or directory.startswith(path + os.sep):
+                del self._watches[wd]
+                try:
+                    self._inotify.rm_watch(wd)
+                except OSError:
+                    pass # Already gone with its directory
+
+    def _sync_watches(self, path):
+        """
+        Watches path and every directory below it that can hold working files: games_dir,
+        each game dir (to notice working/ appearing) and each working tree recursively.
+        Returns the files found in working trees, so a directory moved in counts as changed.
+        """
+        found = []
+        if not os.path.isdir(path):
+            return found
+        split = self._split(path) if path != self.games_dir else None
+        if split is None:
+            # games_dir or a game dir: only descend towards working/
+            self._add_watch(path)
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if not entry.is_dir():
+                            continue
+                        if path == self.games_dir or entry.name == WORKING_DIRNAME:
+                            found += self._sync_watches(entry.path)
+            except OSError:
+                pass
+            return found
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [name for name in dirs if not EDITOR_TEMP_FILE.match(name)]
+            self._add_watch(root)
+            found += [os.path.join(root, name) for name in files]
+        return found
+
+    def _inotify_loop(self):
+        while True:
+            timeout = self._flush_timeout()
+            events = self._inotify.read(timeout=None if timeout is None else int(timeout * 1000) + 1)
+            for event in events:
+                directory = self._watches.get(event.wd)
+                if event.mask & inotify_flags.IGNORED:
+                    self._watches.pop(event.wd, None)
+                    continue
+                if directory is None:
+                    continue
+                path = os.path.join(directory, event.name) if event.name else directory
+                if event.mask & inotify_flags.ISDIR and event.mask & inotify_flags.MOVED_FROM:
+                    self._remove_watches(path) # Its watches would keep reporting it under the old path
+                if event.mask & inotify_flags.ISDIR and event.mask & (inotify_flags.CREATE | inotify_flags.MOVED_TO):
+                    for found in self._sync_watches(path):
+                        split = self._split(found)
+                        if split is not None:
+                            self._record(*split)
+                split = self._split(path)
+                if split is not None:
+                    self._record(*split)
+            self._flush()
+
+    # --- Polling fallback ---
+
+    def _scan(self):
+        """Returns {(app_name, rel_path): (mtime_ns, size)} for every file in the working trees."""
+        state = {}
+        try:
+            app_names = os.listdir(self.games_dir)
+        except OSError:
+            return state
+        for app_name in app_names:
+            working_dir = os.path.join(self.games_dir, app_name, WORKING_DIRNAME)
+            for root, dirs, files in os.walk(working_dir):
+                dirs[:] = [name for name in dirs if not EDITOR_TEMP_FILE.match(name)]
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    rel_path = os.path.relpath(path, working_dir).replace(os.sep, '/')
+                    state[(app_name, rel_path)] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def _poll_loop(self):
+        previous = self._scan()
+        while True:
+            timeout = self._flush_timeout()
+            time.sleep(self.poll_interval if timeout is None else min(self.poll_interval, timeout))
+            current = self._scan()
+            for key in previous.keys() | current.keys():
+                if previous.get(key) != current.get(key):
+                    self._record(*key)
+            previous = current
+            self._flush()
+
+def sse_events(watcher, app_name, since, keepalive=15.0):
+    """
+    Yields Server-Sent Event frames for one game's working dir: a 'change' event per published
+    change after `since` (the event id is the change id, so EventSource reconnects resume via
+    Last-Event-ID). Runs until the client disconnects.
+    """
+    last_id = since
+    while True:
+        latest = watcher.wait(last_id, keepalive)
+        # The cursor comes from the changes actually read (of every game), so one published
+        # after wait() returned is neither skipped nor sent twice
+        changes = watcher.changes_since(last_id)
+        sent = False
+        for change in changes:
+            if change.app_name != app_name:
+                continue
+            payload = json.dumps({"id": change.id, "app_name": change.app_name, "paths": change.paths,
+                                  "more": change.more, "time": change.time})
+            yield f"id: {change.id}\nevent: change\ndata: {payload}\n\n"
+            sent = True
+        if not sent:
+            yield ": keep-alive\n\n" # Stops proxies from closing an idle stream
+        last_id = changes[-1].id if changes else max(last_id, latest)
@@ -0,0 +1,89 @@
+# Purpose: Compares the legacy per-game `git status` scan against the batched,
+#          single-pass scan used by admin_server.get_game_details().
+# Usage: python benchmarks/bench_git_status.py [--games 500] [--repeat 3]
+#        Builds a throwaway git repository with a synthetic games/ tree, so it
+#        never touches the real catalog.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+
+import admin_server # noqa: E402 (needs the sys.path entry above)
+
+def build_synthetic_repo(root, game_count):
+    """Creates a git repo with game_count games, one release each, and dirties every 10th game."""
+    games_dir = os.path.join(root, 'games')
+    for i in range(game_count):
+        app_name = f"game-{i:04d}"
+        for sub in ('working', os.path.join('releases', '1.0.0')):
+            target = os.path.join(games_dir, app_name, sub)
+            os.makedirs(target)
+            with open(os.path.join(target, f"{app_name}.html"), 'w', encoding='utf-8') as f:
+                f.write(f"<html><body>{app_name}</body></html>\n")
+
+    git = ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@example.com']
+    subprocess.run(git + ['init', '-q'], cwd=root, check=True)
+    subprocess.run(git + ['add', '-A'], cwd=root, check=True)
+    subprocess.run(git + ['commit', '-q', '-m', 'synthetic catalog'], cwd=root, check=True)
+
+    dirty = set()
+    for i in range(0, game_count, 10):
+        app_name = f"game-{i:04d}"
+        with open(os.path.join(games_dir, app_name, 'working', f"{app_name}.html"), 'a', encoding='utf-8') as f:
+            f.write("<!-- edit -->\n")
+        dirty.add(app_name)
+    return games_dir, dirty
+
+def legacy_working_changes():
+    """The original approach: one shell `git status` per game working directory."""
+    changed_apps = set()
+    for app_name in os.listdir(admin_server.GAMES_DIR):
+        working_dir = os.path.join(admin_server.GAMES_DIR, app_name, 'working')
+        if os.path.isdir(working_dir):
+            stdout, _, exit_code = admin_server.run_command(f'git status --porcelain "{working_dir}{os.sep}"', cwd=admin_server.REPO_ROOT)
+            if exit_code == 0 and stdout:
+                changed_apps.add(app_name)
+    return changed_apps
+
+def time_call(func, repeat):
+    """Returns (best wall time in seconds, last result) over repeat runs."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs batched git status catalog scans.")
+    parser.add_argument("--games", type=int, default=500, help="Number of synthetic games to create.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant (best time is reported).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='fun-bench-') as root:
+        print(f"Building synthetic repository with {args.games} games in {root}...")
+        games_dir, expected = build_synthetic_repo(root, args.games)
+        admin_server.REPO_ROOT = root
+        admin_server.GAMES_DIR = games_dir
+
+        legacy_time, legacy_result = time_call(legacy_working_changes, args.repeat)
+        batched_time, batched_result = time_call(admin_server.get_working_changes, args.repeat)
+
+        if legacy_result != expected or batched_result != expected:
+            print("Error: scans disagree on which games have updates.", file=sys.stderr)
+            sys.exit(1)
+
+        print(f"Legacy (one git status per game): {legacy_time * 1000:9.1f} ms")
+        print(f"Batched (one git status total):   {batched_time * 1000:9.1f} ms")
+        print(f"Speedup: {legacy_time / batched_time:.1f}x ({len(expected)} of {args.games} games dirty)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+# Purpose: End-to-end performance benchmarks on a synthetic games/ tree:
+#          catalog scans (admin_server.get_game_details), root index generation
+#          (generate_index.update_root_index), /api/apps and / through the Flask test
+#          client, release snapshots (release_manager.copy_release), the asset optimization
+#          stage (cold and cached), offline support (preloads + service worker), release archives,
+#          and CLI startup (release_manager.py --help / --plan, importing generate_index) in fresh
+#          interpreters. Results are written as JSON and can be compared against a stored baseline,
+#          exiting non-zero when any benchmark got slower than the allowed threshold.
+#          --enforce-budgets also fails when startup exceeds STARTUP_BUDGETS_MS, whatever the baseline.
+# Usage: python benchmarks/bench_suite.py [--games 200 --versions 5 --assets 5 --asset-size 4096]
+#                                         [--repeat 5] [--output results.json]
+#                                         [--baseline baseline.json --threshold 0.25] [--enforce-budgets]
+#        Builds a throwaway git repository, so it never touches the real catalog.
+#        Record a baseline with --output, then pass that file as --baseline on later runs
+#        (with the same tree size; results from different machines are not comparable).
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import admin_server # noqa: E402 (needs the sys.path entries above)
+import generate_index # noqa: E402
+import release_manager # noqa: E402
+import version_index # noqa: E402
+import asset_optimizer # noqa: E402
+from catalog_cache import CatalogCache # noqa: E402
+
+RESULTS_FORMAT = 1
+
+# Allowed startup time (median ms) on top of a bare interpreter (startup_python). The CLIs
+# keep subprocess, concurrent.futures and the optional stages out of their import path.
+STARTUP_BUDGETS_MS = {
+    'startup_release_help': 100,
+    'startup_release_plan': 150,
+    'startup_generate_index': 60,
+}
+
+# --- Synthetic tree ---
+
+def write_game_files(directory, app_name, assets, asset_size, seed):
+    """Writes an entry point plus `assets` files of asset_size bytes (half text, half binary)."""
+    os.makedirs(os.path.join(directory, 'assets'))
+    names = [f"assets/sound-{i}.mp3" if i % 2 else f"assets/script-{i}.js" for i in range(assets)]
+    with open(os.path.join(directory, f"{app_name}.html"), 'w', encoding='utf-8') as f:
+        f.write(f"<html><head><meta charset=\"utf-8\"></head><body><h1>{app_name}</h1>{'<p>filler</p>' * 64}"
+                f"<script>const assets = {json.dumps(['./' + name for name in names])};</script></body></html>\n")
+    for i in range(assets):
+        if i % 2:
+            path, data = os.path.join(directory, 'assets', f"sound-{i}.mp3"), os.urandom(asset_size)
+        else:
+            line = f"/* {app_name} asset {i} build {seed} */\n".encode('utf-8')
+            path, data = os.path.join(directory, 'assets', f"script-{i}.js"), (line * (asset_size // len(line) + 1))[:asset_size]
+        with open(path, 'wb') as f:
+            f.write(data)
+
+def build_synthetic_repo(root, games, versions, assets, asset_size):
+    """Creates a git repo with games x versions releases of assets files each; every 10th game is dirty."""
+    games_dir = os.path.join(root, 'games')
+    for g in range(games):
+        app_name = f"game-{g:04d}"
+        app_dir = os.path.join(games_dir, app_name)
+        write_game_files(os.path.join(app_dir, 'working'), app_name, assets, asset_size, seed=versions)
+        for v in range(versions):
+            release_dir = os.path.join(app_dir, 'releases', f"1.{v}.0")
+            write_game_files(release_dir, app_name, assets, asset_size, seed=v)
+    shutil.copy2(os.path.join(REPO_ROOT, 'index.template.html'), root)
+    with open(os.path.join(root, '.gitignore'), 'w', encoding='utf-8') as f:
+        f.write(f"/{generate_index.INDEX_CACHE_FILENAME}\n/games/*/{version_index.VERSION_INDEX_FILENAME}\n")
+
+    git = ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@example.com']
+    subprocess.run(git + ['init', '-q'], cwd=root, check=True)
+    subprocess.run(git + ['add', '-A'], cwd=root, check=True)
+    subprocess.run(git + ['commit', '-q', '-m', 'synthetic catalog'], cwd=root, check=True)
+    for g in range(0, games, 10):
+        app_name = f"game-{g:04d}"
+        with open(os.path.join(games_dir, app_name, 'working', f"{app_name}.html"), 'a', encoding='utf-8') as f:
+            f.write("<!-- edit -->\n")
+    return games_dir
+
+def remove_version_indexes(games_dir):
+    version_index.rebuilt_indexes.clear()
+    for app_name in os.listdir(games_dir):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(games_dir, app_name, version_index.VERSION_INDEX_FILENAME))
+
+# --- Timing ---
+
+def time_call(func, repeat, number=1, setup=None):
+    """Returns the per-call wall times (seconds) of repeat runs of number calls each."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return times
+
+def run_benchmarks(root, games_dir, repeat):
+    """Runs every benchmark against the synthetic repo at root. Returns {name: [seconds, ...]}."""
+    admin_server.REPO_ROOT = root
+    admin_server.GAMES_DIR = games_dir
+    admin_server.catalog = CatalogCache(lambda: admin_server.get_game_details(), games_dir, root)
+    client = admin_server.app.test_client()
+    cache_path = os.path.join(root, generate_index.INDEX_CACHE_FILENAME)
+    quiet = lambda *args, **kwargs: None
+
+    def update_index():
+        with contextlib.redirect_stdout(io.StringIO()): # update_root_index reports every game
+            generate_index.update_root_index(root)
+
+    def remove_index_cache():
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(cache_path)
+
+    def get_ok(path, headers=None):
+        response = client.get(path, headers=headers)
+        if response.status_code not in (200, 304):
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+        return response
+
+    results = {}
+    results['scan_cold'] = time_call(admin_server.get_game_details, repeat, setup=lambda: remove_version_indexes(games_dir))
+    results['scan_warm'] = time_call(admin_server.get_game_details, repeat)
+    results['index_cold'] = time_call(update_index, repeat, setup=remove_index_cache)
+    results['index_warm'] = time_call(update_index, repeat)
+
+    results['api_apps_rebuild'] = time_call(lambda: get_ok('/api/apps'), repeat, setup=admin_server.catalog.invalidate)
+    results['api_apps_cached'] = time_call(lambda: get_ok('/api/apps'), repeat, number=20)
+    etag = get_ok('/api/apps').headers['ETag']
+    results['api_apps_304'] = time_call(lambda: get_ok('/api/apps', {'If-None-Match': etag}), repeat, number=20)
+    results['api_apps_page'] = time_call(lambda: get_ok('/api/apps?limit=50&fields=latest_version'), repeat, number=20)
+    results['index_page_cached'] = time_call(lambda: get_ok('/'), repeat, number=20)
+
+    # Snapshot the first game's working dir as a new release, with and without dedup/compression
+    app_dir = os.path.join(games_dir, 'game-0000')
+    working_dir, releases_dir = os.path.join(app_dir, 'working'), os.path.join(app_dir, 'releases')
+    target_dir = os.path.join(releases_dir, '9.9.9')
+    remove_target = lambda: shutil.rmtree(target_dir, ignore_errors=True)
+    for name, mode, compress in (('release_copy', 'copy', False), ('release_dedup', 'dedup', False),
+                                 ('release_dedup_compressed', 'dedup', True)):
+        results[name] = time_call(
+            lambda: release_manager.copy_release(working_dir, releases_dir, target_dir, mode, log=quiet,
+                                                 compress=compress, archive=False, offline=False),
+            repeat, setup=remove_target)
+    results['release_dedup_offline'] = time_call(
+        lambda: release_manager.copy_release(working_dir, releases_dir, target_dir, 'dedup', log=quiet,
+                                             compress=False, archive=False, offline=True),
+        repeat, setup=remove_target)
+    cache_dir = os.path.join(root, asset_optimizer.CACHE_DIRNAME)
+    optimized_release = lambda: release_manager.copy_release(working_dir, releases_dir, target_dir, 'dedup', log=quiet,
+                                                             compress=False, archive=False, optimize={}, offline=False)
+    results['release_optimize_cold'] = time_call(
+        optimized_release, repeat, setup=lambda: (remove_target(), shutil.rmtree(cache_dir, ignore_errors=True)))
+    results['release_optimize_cached'] = time_call(optimized_release, repeat, setup=remove_target)
+    remove_target()
+    archive_target = os.path.join(root, 'bench-archive.zip')
+    results['release_archive'] = time_call(
+        lambda: release_manager.write_release_archive(os.path.join(releases_dir, '1.0.0'), archive_target, log=quiet), repeat)
+    return results
+
+def run_startup_benchmarks(root, repeat):
+    """Times the CLIs in fresh interpreters, as a shell or CI hook would run them. Returns {name: [seconds, ...]}."""
+    release_script = os.path.join(REPO_ROOT, 'admin', 'release_manager.py')
+    env = dict(os.environ, PYTHONPATH=os.path.join(REPO_ROOT, 'scripts'))
+    commands = {
+        'startup_python': [sys.executable, '-c', 'pass'],
+        'startup_release_help': [sys.executable, release_script, '--help'],
+        'startup_release_plan': [sys.executable, release_script, 'game-0001', '9.9.9', '--plan'],
+        'startup_generate_index': [sys.executable, '-c', 'import generate_index'],
+    }
+    results = {}
+    for name, command in commands.items():
+        run = lambda: subprocess.run(command, cwd=root, env=env, check=True,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run() # Warm the OS file cache and compile the bytecode once
+        results[name] = time_call(run, repeat)
+    return results
+
+def check_budgets(summaries):
+    """Returns the startup benchmarks whose median overhead over startup_python exceeds its budget."""
+    floor = summaries['startup_python']['median_ms']
+    over = []
+    for name, budget in STARTUP_BUDGETS_MS.items():
+        overhead = summaries[name]['median_ms'] - floor
+        print(f"{name:28} {overhead:8.1f} ms over the interpreter (budget {budget} ms)"
+              f"{'  OVER BUDGET' if overhead > budget else ''}")
+        if overhead > budget:
+            over.append(name)
+    return over
+
+# --- Results and baselines ---
+
+def summarize(times):
+    return {'best_ms': round(min(times) * 1000, 3), 'median_ms': round(statistics.median(times) * 1000, 3), 'runs': len(times)}
+
+def compare(results, baseline, threshold):
+    """Prints current vs baseline medians. Returns the names of benchmarks slower than threshold allows."""
+    if baseline.get('config') != results['config']:
+        print(f"Warning: Baseline was recorded with a different tree ({baseline.get('config')}); ratios may be meaningless.")
+    regressions = []
+    print(f"\n{'benchmark':28} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            print(f"{name:28} {'-':>12} {current['median_ms']:12.3f} {'new':>7}")
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:28} {previous['median_ms']:12.3f} {current['median_ms']:12.3f} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog scans, index generation, the admin API and releases.")
+    parser.add_argument("--games", type=int, default=200, help="Number of synthetic games.")
+    parser.add_argument("--versions", type=int, default=5, help="Releases per game.")
+    parser.add_argument("--assets", type=int, default=5, help="Asset files per release (besides the entry point).")
+    parser.add_argument("--asset-size", type=int, default=4096, help="Size of each asset file in bytes.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark (best and median are reported).")
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against results previously written with --output.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown of the median vs the baseline before failing (default: 0.25 = 25%%).")
+    parser.add_argument("--enforce-budgets", action="store_true",
+                        help="Exit non-zero when CLI startup exceeds STARTUP_BUDGETS_MS.")
+    args = parser.parse_args()
+
+    config = {'games': args.games, 'versions': args.versions, 'assets': args.assets, 'asset_size': args.asset_size}
+    with tempfile.TemporaryDirectory(prefix='fun-bench-') as root:
+        print(f"Building synthetic repository ({config}) in {root}...")
+        games_dir = build_synthetic_repo(root, **config)
+        timings = run_benchmarks(root, games_dir, args.repeat)
+        timings.update(run_startup_benchmarks(root, args.repeat))
+
+    results = {
+        'format': RESULTS_FORMAT,
+        'created_at': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config,
+        'results': {name: summarize(times) for name, times in timings.items()},
+    }
+    for name, summary in results['results'].items():
+        print(f"{name:28} best {summary['best_ms']:10.3f} ms   median {summary['median_ms']:10.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"Wrote results to {args.output}")
+
+    if args.baseline:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read baseline {args.baseline}: {e}", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Error: {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: "
+                  f"{', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+    if args.enforce_budgets:
+        over = check_budgets(results['results'])
+        if over:
+            print(f"Error: {len(over)} startup benchmark(s) over budget: {', '.join(over)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# Purpose: Exports a fully static, deployable tree (no Python in the request path):
+#            <out>/index.html (+ .gz/.br)          - the game list, linking to hashed release dirs
+#            <out>/games/<app>/<version>.<hash>/   - every release, with precompressed siblings
+#            <out>/manifest.json                    - every game, version, path and file hash
+#          Release directories are named after a hash of their contents, so a CDN or nginx can
+#          cache them forever. Games are exported in parallel, and releases already exported by
+#          a previous run (same source, same hash) are reused rather than copied again.
+# Usage: python scripts/build_static.py [--out dist] [--jobs 8]
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'admin'))
+
+import game_scan # noqa: E402 (same directory)
+import generate_index # noqa: E402
+import page_template # noqa: E402
+import release_manager # noqa: E402 (needs the sys.path entry above)
+
+BUILD_MANIFEST_FILENAME = 'manifest.json'
+BUILD_MANIFEST_FORMAT = 1
+HASH_LENGTH = 10 # Hex chars of the release hash used in directory names
+
+def load_previous_manifest(out_dir):
+    """Returns the manifest written by the previous build into out_dir, or an empty one."""
+    try:
+        with open(os.path.join(out_dir, BUILD_MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') == BUILD_MANIFEST_FORMAT:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'format': BUILD_MANIFEST_FORMAT, 'games': {}}
+
+def release_files(release_dir, previous):
+    """
+    Returns the {path: {size, sha256, ...}} listing of a release. Uses the release's own
+    manifest when it has one, else the previous build's listing if the directory is unchanged,
+    and only hashes the files as a last resort (older releases).
+    """
+    try:
+        with open(os.path.join(release_dir, release_manager.RELEASE_MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        pass
+    if previous and previous.get('source_mtime_ns') == os.stat(release_dir).st_mtime_ns:
+        return previous['files']
+    return release_manager.build_release_manifest(release_dir)['files']
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst) # Same filesystem: free and instant
+    except OSError:
+        shutil.copy2(src, dst)
+
+def export_release(release_dir, target_dir, files):
+    """Copies a release into target_dir (via a temp dir and rename) and fills in missing .gz/.br siblings."""
+    tmp_dir = f"{target_dir}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    try:
+        for rel_path in files:
+            src = os.path.join(release_dir, *rel_path.split('/'))
+            dst = os.path.join(tmp_dir, *rel_path.split('/'))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            link_or_copy(src, dst)
+        for rel_path in files:
+            extension = os.path.splitext(rel_path)[1].lower()
+            if (extension in release_manager.COMPRESSIBLE_EXTENSIONS and rel_path + '.gz' not in files
+                    and files[rel_path]['size'] >= release_manager.MIN_COMPRESS_SIZE):
+                release_manager.compress_file(os.path.join(tmp_dir, *rel_path.split('/')))
+        os.replace(tmp_dir, target_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def build_game(games_dir, out_dir, app_name, previous_game):
+    """Exports every release of one game. Returns (app_name, game manifest entry, item html, exported count)."""
+    releases_dir = os.path.join(games_dir, app_name, 'releases')
+    entries = generate_index.list_release_entries(releases_dir)
+    previous_versions = (previous_game or {}).get('versions', {})
+    game = {'latest': entries[0]['version'] if entries else None, 'versions': {}}
+    exported = 0
+    for entry in entries:
+        version = entry['version']
+        release_dir = os.path.join(releases_dir, version)
+        files = release_files(release_dir, previous_versions.get(version))
+        listing = json.dumps(files, sort_keys=True).encode('utf-8')
+        release_hash = hashlib.sha256(listing).hexdigest()
+        path = f"games/{app_name}/{version}.{release_hash[:HASH_LENGTH]}"
+        target_dir = os.path.join(out_dir, *path.split('/'))
+        if not os.path.isdir(target_dir):
+            export_release(release_dir, target_dir, files)
+            exported += 1
+        game['versions'][version] = {
+            'path': path + '/',
+            'hash': release_hash,
+            'entry_point': entry['entry_point'],
+            'source_mtime_ns': os.stat(release_dir).st_mtime_ns,
+            'files': files,
+        }
+    item_html = generate_index.render_game_item(
+        releases_dir, app_name, release_path=lambda version: game['versions'][version]['path'].rstrip('/'))
+    return app_name, game, item_html, exported
+
+def prune_stale(out_dir, games):
+    """Removes exported release directories that are no longer part of the build."""
+    wanted = {version['path'].rstrip('/') for game in games.values() for version in game['versions'].values()}
+    games_out = os.path.join(out_dir, 'games')
+    if not os.path.isdir(games_out):
+        return 0
+    removed = 0
+    for app_name in os.listdir(games_out):
+        app_out = os.path.join(games_out, app_name)
+        for name in os.listdir(app_out):
+            if f"games/{app_name}/{name}" not in wanted:
+                shutil.rmtree(os.path.join(app_out, name), ignore_errors=True)
+                removed += 1
+        if not os.listdir(app_out):
+            os.rmdir(app_out)
+    return removed
+
+def write_if_changed(path, content):
+    """Writes text content to path unless it already holds exactly that. Returns True if written."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+def build(project_root, out_dir, jobs=None):
+    """Builds (or incrementally updates) the static export in out_dir."""
+    start = time.perf_counter()
+    games_dir = os.path.join(project_root, 'games')
+    template_path = os.path.join(project_root, 'index.template.html')
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_previous_manifest(out_dir)
+
+    app_names = [game.name for game in game_scan.list_games(games_dir) if game.has_releases]
+    print(f"Exporting {len(app_names)} game(s) from {games_dir} to {out_dir}...")
+    with ThreadPoolExecutor(max_workers=jobs or min(8, os.cpu_count() or 1)) as executor:
+        results = list(executor.map(
+            lambda name: build_game(games_dir, out_dir, name, previous['games'].get(name)), app_names))
+
+    games = {}
+    items = []
+    exported = 0
+    for app_name, game, item_html, count in results:
+        games[app_name] = game
+        exported += count
+        if item_html is not None:
+            items.append(item_html)
+    removed = prune_stale(out_dir, games)
+
+    template = page_template.load_template(template_path, generate_index.PLACEHOLDER)
+    generated_list_html = "\n".join(items) if items else "            <!-- No games found -->"
+    index_path = os.path.join(out_dir, 'index.html')
+    if write_if_changed(index_path, page_template.fill(template, generated_list_html)):
+        release_manager.compress_file(index_path)
+
+    manifest = {'format': BUILD_MANIFEST_FORMAT, 'games': games}
+    write_if_changed(os.path.join(out_dir, BUILD_MANIFEST_FILENAME), json.dumps(manifest, indent=1, sort_keys=True))
+
+    releases = sum(len(game['versions']) for game in games.values())
+    print(f"Exported {exported} of {releases} release(s) ({releases - exported} unchanged), pruned {removed} stale "
+          f"director{'y' if removed == 1 else 'ies'} in {time.perf_counter() - start:.2f}s.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a static, CDN-ready copy of all released games.")
+    parser.add_argument("--out", default=os.path.join(PROJECT_ROOT, 'dist'), help="Output directory (default: dist/).")
+    parser.add_argument("--jobs", type=int, default=None, help="Games exported in parallel (default: min(8, CPU count)).")
+    args = parser.parse_args()
+    build(PROJECT_ROOT, os.path.abspath(args.out), args.jobs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Purpose: Advisory file locks shared by every process that changes the repository:
+#          release_manager.py (CLI and admin server) holds a per-app lock for the whole
+#          release of that app, and generate_index.py holds the per-repo lock while it
+#          reads and rewrites index.html and its cache. Releases of different apps can
+#          then run at the same time without corrupting each other. The locks use
+#          flock() (msvcrt.locking on Windows), so the OS drops them when a process
+#          dies and a crashed release never leaves a stale lock behind.
+# Usage: with FileLock(app_lock_path(repo_root, 'balloon-puff')): ...
+
+import os
+import time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOCKS_DIRNAME = '.locks' # Under the repo root; the lock files stay (empty) and are ignored by git
+POLL_INTERVAL = 0.1 # Seconds between attempts while waiting with a timeout (or on Windows)
+
+def app_lock_path(repo_root, app_name):
+    return os.path.join(repo_root, LOCKS_DIRNAME, f"app-{app_name}.lock")
+
+def repo_lock_path(repo_root):
+    return os.path.join(repo_root, LOCKS_DIRNAME, 'repo.lock')
+
+class FileLock:
+    """
+    An exclusive advisory lock on path, usable as a context manager. Each instance opens
+    the file itself, so it also excludes other threads of the same process.
+    If the lock is busy, waiting_message is passed to log once before blocking; with a
+    timeout (seconds), TimeoutError is raised if the lock isn't acquired in time.
+    """
+
+    def __init__(self, path, timeout=None, waiting_message=None, log=print):
+        self.path = path
+        self.timeout = timeout
+        self.waiting_message = waiting_message
+        self.log = log
+        self._file = None
+
+    def _try_lock(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a+b')
+        if self._try_lock():
+            return self
+        if self.waiting_message:
+            self.log(self.waiting_message)
+        if fcntl is not None and self.timeout is None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX) # Block in the kernel instead of polling
+            return self
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock():
+            if deadline is not None and time.monotonic() >= deadline:
+                self._file.close()
+                self._file = None
+                raise TimeoutError(f"Timed out after {self.timeout}s waiting for lock {self.path}")
+            time.sleep(POLL_INTERVAL)
+        return self
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close() # Closing alone would also release it
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,75 @@
+# Purpose: Shared scanner for games/, used by the admin server's catalog and by the
+#          index generator. Lists games with os.scandir (one directory read per game,
+#          using the cached DirEntry types instead of separate isdir/exists stats), then
+#          fans the per-game work out over a bounded thread pool and yields the results
+#          in name order as they complete, so callers can start rendering early.
+#          Helps most when games/ lives on a network volume where each stat is a round trip.
+# Usage: Imported by admin/admin_server.py and scripts/generate_index.py.
+#        FUN_SCAN_WORKERS sets the default number of threads (1 scans serially).
+
+import os
+import sys
+from collections import deque, namedtuple
+
+GameEntry = namedtuple('GameEntry', ['name', 'path', 'has_working', 'has_releases'])
+
+def _workers_from_env(default=8):
+    """Reads FUN_SCAN_WORKERS, falling back to default (with a warning) when it isn't an integer."""
+    value = os.environ.get('FUN_SCAN_WORKERS', '')
+    try:
+        return max(1, int(value)) if value.strip() else default
+    except ValueError:
+        print(f"Warning: Ignoring FUN_SCAN_WORKERS={value!r} (not an integer); using {default} threads.", file=sys.stderr)
+        return default
+
+DEFAULT_WORKERS = _workers_from_env()
+
+def list_games(games_dir):
+    """Returns a GameEntry for every directory in games_dir, sorted by name."""
+    games = []
+    with os.scandir(games_dir) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            subdirs = set()
+            try:
+                with os.scandir(entry.path) as children:
+                    subdirs = {child.name for child in children if child.is_dir()}
+            except OSError:
+                pass # Unreadable game dir: reported as having neither working nor releases
+            games.append(GameEntry(entry.name, entry.path, 'working' in subdirs, 'releases' in subdirs))
+    games.sort(key=lambda game: game.name)
+    return games
+
+def scan_games(games_dir, func, max_workers=None, games=None):
+    """
+    Yields func(game) for every GameEntry in games_dir (or the given games), in name order.
+    Up to max_workers calls run at once, and at most twice that many results are held
+    waiting for the consumer, so memory stays bounded however large the catalog is.
+    Exceptions raised by func propagate to the consumer.
+    """
+    games = list_games(games_dir) if games is None else games
+    max_workers = max_workers or DEFAULT_WORKERS
+    if max_workers <= 1 or len(games) <= 1:
+        for game in games:
+            yield func(game)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor # Imported here: it pulls in logging, and serial scans don't need it
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(games)), thread_name_prefix='game-scan') as executor:
+        pending = deque()
+        remaining = iter(games)
+        try:
+            for game in remaining:
+                pending.append(executor.submit(func, game))
+                if len(pending) >= 2 * max_workers:
+                    break
+            while pending:
+                result = pending.popleft().result()
+                next_game = next(remaining, None)
+                if next_game is not None:
+                    pending.append(executor.submit(func, next_game))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel() # Consumer stopped early or func raised; drop queued work
@@ -3,114 +3,94 @@
 #          and providing a dropdown for all versions.
 # Usage: Run this script from the repository root to update index.html
 #        for static hosting (like GitHub Pages).
+#        Also imported by admin/release_manager.py after each release.
 
+import contextlib
+import json
 import os
+import stat
 import sys
-import re
-try:
-    from packaging.version import parse as parse_version
-except ImportError:
-    print("Error: The 'packaging' library is required.", file=sys.stderr)
-    print("Please install it using: pip install packaging", file=sys.stderr)
-    sys.exit(1)
+# Sorted versions and entry points come from the per-game index (games/<app>/.versions.json);
+# `packaging` is only imported there, and only for versions that aren't plain X.Y.Z
+from version_index import print_warning, read_version_index, sort_versions
+from page_template import fill, load_template
+from file_lock import FileLock, repo_lock_path
+import game_scan
 
 # --- Helper functions ---
 
 def find_latest_version(versions):
-   """Finds the latest version from a list of version strings."""
-   if not versions:
-       return None
-   return max(versions, key=parse_version)
+   """
+   Finds the latest version from a list of version strings or, given a game's releases
+   directory, from its version index (rescanned only when missing or stale).
+   """
+   if isinstance(versions, str):
+       entries = read_version_index(os.path.dirname(versions))
+       return entries[0]['version'] if entries else None
+   versions = sort_versions(versions)
+   return versions[0] if versions else None
 
 def format_game_name(app_name):
    """Formats the app directory name into a display name."""
    return ' '.join(word.capitalize() for word in app_name.split('-'))
 
-def find_entry_point(directory, app_name):
-   """Finds the entry HTML file (app_name.html or index.html) in a directory."""
-   preferred_entry = f"{app_name}.html"
-   if os.path.exists(os.path.join(directory, preferred_entry)):
-       return preferred_entry
-   elif os.path.exists(os.path.join(directory, "index.html")):
-       return "index.html"
-   else:
-       return None # No entry point found
+# --- Per-game rendering ---
 
-# --- Main index generation function ---
+# Bump when the rendered list item markup changes so stale cache entries are discarded
+INDEX_CACHE_FORMAT = 1
+INDEX_CACHE_FILENAME = '.index_cache.json'
+PLACEHOLDER = '            <!-- GAME_LIST_PLACEHOLDER -->'
 
-def update_root_index(project_root):
-   """Generates the root index.html based on latest game releases, including version dropdowns."""
-   print("\n--- Starting Root Index Generation ---")
-   games_root_dir = os.path.join(project_root, 'games')
-   template_path = os.path.join(project_root, 'index.template.html')
-   output_path = os.path.join(project_root, 'index.html')
+def list_release_entries(releases_dir, log=print_warning):
+   """Returns the version index entries of the X.Y.Z releases in releases_dir, latest first."""
+   entries = read_version_index(os.path.dirname(releases_dir), log)
+   return [entry for entry in entries if entry['release'] is not None] # Only plain X.Y.Z directories
 
-   print(f"Scanning for games in: {games_root_dir}")
-   game_list_items_html = [] # Changed variable name for clarity
+def list_release_versions(releases_dir):
+   """Returns the X.Y.Z release directory names in releases_dir, latest first."""
+   return [entry['version'] for entry in list_release_entries(releases_dir)]
 
-   if not os.path.exists(games_root_dir):
-       print(f"Error: Games directory not found at {games_root_dir}", file=sys.stderr)
-       print("Warning: Skipping root index generation.")
-       return
+def render_game_item(releases_dir, app_name, release_path=None, out=None, err=None):
+   """
+   Renders the indented <li> block for one game, or None if it has no usable release.
+   release_path(version) gives the URL directory of a release (default games/<app>/releases/<version>).
+   Progress goes to out and version index warnings to err (default stdout/stderr).
+   """
+   release_path = release_path or (lambda version: f"games/{app_name}/releases/{version}")
+   entries = list_release_entries(releases_dir, lambda message: print(message, file=err or sys.stderr))
 
-   if not os.path.exists(template_path):
-       print(f"Error: Template file not found at {template_path}", file=sys.stderr)
-       print("Warning: Skipping root index generation.")
-       return
+   if not entries:
+       return None
+
+   versions = [entry['version'] for entry in entries]
+   latest_version = versions[0] # Latest is the first after descending sort
+   print(f"  Found game: {app_name}, Versions: {', '.join(versions)}", file=out)
 
-   # Iterate through potential game directories
-   for app_name in sorted(os.listdir(games_root_dir)): # Sort app names alphabetically
-       app_dir = os.path.join(games_root_dir, app_name)
-       if not os.path.isdir(app_dir):
-           continue
-
-       releases_dir = os.path.join(app_dir, 'releases')
-       if not os.path.isdir(releases_dir):
-           continue
-
-       # Find and sort all valid version directories
-       versions = sorted(
-           [
-               d for d in os.listdir(releases_dir)
-               if os.path.isdir(os.path.join(releases_dir, d)) and re.match(r'^\d+\.\d+\.\d+$', d)
-           ],
-           key=parse_version,
-           reverse=True # Sort descending (latest first)
-       )
-
-       if not versions:
-           continue
-
-       latest_version = versions[0] # Latest is the first after descending sort
-       print(f"  Found game: {app_name}, Versions: {', '.join(versions)}")
-
-       latest_release_dir = os.path.join(releases_dir, latest_version)
-       latest_entry_point = find_entry_point(latest_release_dir, app_name)
-
-       if not latest_entry_point:
-           print(f"Warning: Could not find entry point for latest version '{latest_version}' of '{app_name}'. Skipping game.")
-           continue
-
-       display_name = format_game_name(app_name)
-       latest_link_path = f"games/{app_name}/releases/{latest_version}/{latest_entry_point}"
-
-       # Generate dropdown links
-       dropdown_links_html = []
-       for version in versions: # Iterate through sorted versions (latest first)
-           version_dir = os.path.join(releases_dir, version)
-           entry_point = find_entry_point(version_dir, app_name)
-           if entry_point:
-               link_path = f"games/{app_name}/releases/{version}/{entry_point}"
-               # target="_blank" to open in new window
-               dropdown_links_html.append(f'                <a href="{link_path}" target="_blank">{version}</a>')
-           else:
-                # Optionally add a disabled entry or skip
-                dropdown_links_html.append(f'                <span class="disabled-version">{version} (No entry)</span>')
-
-
-       # Generate the full list item HTML with dropdown structure
-       # Using data-target attribute for JS hook
-       list_item_html = f"""\
+   latest_entry_point = entries[0]['entry_point']
+
+   if not latest_entry_point:
+       print(f"Warning: Could not find entry point for latest version '{latest_version}' of '{app_name}'. Skipping game.", file=out)
+       return None
+
+   display_name = format_game_name(app_name)
+   latest_link_path = f"{release_path(latest_version)}/{latest_entry_point}"
+
+   # Generate dropdown links
+   dropdown_links_html = []
+   for entry in entries: # Iterate through sorted versions (latest first)
+       version, entry_point = entry['version'], entry['entry_point']
+       if entry_point:
+           link_path = f"{release_path(version)}/{entry_point}"
+           # target="_blank" to open in new window
+           dropdown_links_html.append(f'                <a href="{link_path}" target="_blank">{version}</a>')
+       else:
+            # Optionally add a disabled entry or skip
+            dropdown_links_html.append(f'                <span class="disabled-version">{version} (No entry)</span>')
+
+
+   # Generate the full list item HTML with dropdown structure
+   # Using data-target attribute for JS hook
+   list_item_html = f"""\
            <li class="game-item">
                <a href="{latest_link_path}" class="game-link">{display_name}</a>
                <div class="version-dropdown-container">
@@ -120,47 +100,190 @@ def update_root_index(project_root):
                    </div>
                </div>
            </li>"""
-       game_list_items_html.append(list_item_html)
+   # Indent the list item so it lines up inside the template's <ul>
+   return "\n".join(f"    {line}" for line in list_item_html.splitlines())
 
+# --- Manifest cache ---
 
-   if not game_list_items_html:
-       print("Warning: No games with valid releases found. Output index.html will have an empty list.")
-       generated_list_html = "            <!-- No games found -->"
-   else:
-       # Indent the generated list items correctly
-       generated_list_html = "\n".join(f"    {line}" for item in game_list_items_html for line in item.splitlines())
+def load_index_cache(cache_path):
+   """Loads the per-game manifest cache, returning an empty one if missing, unreadable or outdated."""
+   try:
+       with open(cache_path, 'r', encoding='utf-8') as f:
+           cache = json.load(f)
+       if cache.get('format') == INDEX_CACHE_FORMAT and isinstance(cache.get('games'), dict):
+           return cache
+   except (OSError, ValueError):
+       pass
+   return {'format': INDEX_CACHE_FORMAT, 'games': {}}
 
+def write_file_atomic(path, content):
+   """Writes text to path through a temporary file and os.replace, so readers never see a partial file."""
+   tmp_path = f"{path}.{os.getpid()}.tmp"
+   try:
+       with open(tmp_path, 'w', encoding='utf-8') as f:
+           f.write(content)
+       os.replace(tmp_path, path)
+   except OSError:
+       if os.path.exists(tmp_path):
+           os.remove(tmp_path)
+       raise
 
-   # Read template and replace placeholder
-   print(f"Reading template file: {template_path}")
+def save_index_cache(cache_path, cache, err=None):
+   """Writes the manifest cache; failures only cost a full rescan next time."""
    try:
-       with open(template_path, 'r', encoding='utf-8') as f:
-           template_content = f.read()
-   except Exception as e:
-       print(f"Error reading template file: {e}", file=sys.stderr)
-       print("Warning: Skipping root index generation.")
+       write_file_atomic(cache_path, json.dumps(cache, indent=1, sort_keys=True))
+   except OSError as e:
+       print(f"Warning: Could not write index cache {cache_path}: {e}", file=err or sys.stderr)
+
+# --- Main index generation function ---
+
+def update_root_index(project_root, changed_apps=None, dry_run=False, out=None, err=None):
+   """
+   Generates the root index.html based on latest game releases, including version dropdowns.
+
+   Each game's list item is cached in <project_root>/.index_cache.json, keyed by the mtime of
+   its releases directory, so only games whose releases changed are re-rendered. Pass
+   changed_apps (e.g. the app just released) to skip checking every other game's mtime;
+   every game is still checked if games with releases were added or removed since the last run.
+   index.html is only rewritten when the generated content actually differs, and then atomically.
+   The per-repo lock is held from reading the cache to writing index.html, so concurrent
+   releases (from other threads or processes) can't lose each other's updates.
+   With dry_run, everything is computed and reported, but nothing is written (not even the lock file).
+   Progress goes to out and errors to err (file-like, default stdout/stderr), like release_manager.release().
+   """
+   out = out or sys.stdout
+   err = err or sys.stderr
+   print("\n--- Starting Root Index Generation ---", file=out)
+   games_root_dir = os.path.join(project_root, 'games')
+   template_path = os.path.join(project_root, 'index.template.html')
+   output_path = os.path.join(project_root, 'index.html')
+   cache_path = os.path.join(project_root, INDEX_CACHE_FILENAME)
+
+   print(f"Scanning for games in: {games_root_dir}", file=out)
+
+   if not os.path.exists(games_root_dir):
+       print(f"Error: Games directory not found at {games_root_dir}", file=err)
+       print("Warning: Skipping root index generation.", file=out)
        return
 
-   print("Generating final index.html content...")
-   # Ensure placeholder has correct indentation if needed, but usually it's fine
-   final_content = template_content.replace('            <!-- GAME_LIST_PLACEHOLDER -->', generated_list_html)
+   if not os.path.exists(template_path):
+       print(f"Error: Template file not found at {template_path}", file=err)
+       print("Warning: Skipping root index generation.", file=out)
+       return
 
-   # Write the final index.html
-   print(f"Writing output file: {output_path}")
-   try:
-       with open(output_path, 'w', encoding='utf-8') as f:
-           f.write(final_content)
-       print("Successfully generated index.html.")
-   except Exception as e:
-       print(f"Error writing output file: {e}", file=sys.stderr)
-       print("Warning: Failed to update root index.html.") # Don't exit script
+   lock = contextlib.nullcontext() if dry_run else FileLock(
+       repo_lock_path(project_root), waiting_message="Waiting for another index update to finish...",
+       log=lambda message: print(message, file=out))
+   with lock:
+       cache = load_index_cache(cache_path)
+       cached_games = cache['games']
+
+       def load_entry(app_name):
+           """Returns (app_name, cache entry, re-rendered?) for one game, or None if it has no releases."""
+           releases_dir = os.path.join(games_root_dir, app_name, 'releases')
+           try:
+               releases_stat = os.stat(releases_dir)
+           except OSError:
+               return None # Not a game (or no releases yet)
+           if not stat.S_ISDIR(releases_stat.st_mode):
+               return None
+           entry = cached_games.get(app_name)
+           if entry is None or entry.get('releases_mtime_ns') != releases_stat.st_mtime_ns:
+               return app_name, {'releases_mtime_ns': releases_stat.st_mtime_ns, 'html': render_game_item(releases_dir, app_name, out=out, err=err)}, True
+           return app_name, entry, False
+
+       games = None
+       if changed_apps is not None and cached_games:
+           # Game dirs added or deleted by hand aren't in changed_apps: one listing of games/ tells
+           games = game_scan.list_games(games_root_dir)
+           listed = {game.name for game in games if game.has_releases}
+           if listed - set(changed_apps) != set(cached_games) - set(changed_apps):
+               print("Games were added or removed since the last update; checking every game.", file=out)
+               changed_apps = None
+       if changed_apps is not None and cached_games:
+           # Trust the cache for everything except the named apps
+           app_names = sorted(set(cached_games) | set(changed_apps))
+           trusted = set(cached_games) - set(changed_apps)
+           results = ((app_name, cached_games[app_name], False) if app_name in trusted else load_entry(app_name)
+                      for app_name in app_names)
+       else:
+           # Check (and re-render) every game on a bounded thread pool; results stream back in name order
+           results = game_scan.scan_games(games_root_dir, lambda game: load_entry(game.name) if game.has_releases else None,
+                                          games=games)
+
+       game_list_items_html = []
+       new_games = {}
+       rendered_count = 0
+       for result in results:
+           if result is None:
+               continue
+           app_name, entry, rendered = result
+           rendered_count += rendered
+           new_games[app_name] = entry
+           if entry['html'] is not None:
+               game_list_items_html.append(entry['html'])
+
+       print(f"Rendered {rendered_count} game(s); reused {len(new_games) - rendered_count} from cache.", file=out)
+
+       if not game_list_items_html:
+           print("Warning: No games with valid releases found. Output index.html will have an empty list.", file=out)
+           generated_list_html = "            <!-- No games found -->"
+       else:
+           generated_list_html = "\n".join(game_list_items_html)
+
+
+       # Read template (pre-split around the placeholder; cached until its mtime changes)
+       print(f"Reading template file: {template_path}", file=out)
+       try:
+           template = load_template(template_path, PLACEHOLDER)
+       except Exception as e:
+           print(f"Error reading template file: {e}", file=err)
+           print("Warning: Skipping root index generation.", file=out)
+           return
+
+       print("Generating final index.html content...", file=out)
+       # Ensure placeholder has correct indentation if needed, but usually it's fine
+       final_content = fill(template, generated_list_html)
+
+       cache['games'] = new_games
+       if new_games != cached_games and not dry_run:
+           save_index_cache(cache_path, cache, err)
+
+       # Skip the write entirely if nothing changed (keeps mtimes and git status quiet)
+       try:
+           with open(output_path, 'r', encoding='utf-8') as f:
+               if f.read() == final_content:
+                   print("index.html is already up to date.", file=out)
+                   print("--- Finished Root Index Generation ---", file=out)
+                   return
+       except OSError:
+           pass # No previous output
+
+       if dry_run:
+           print(f"Dry run: {output_path} would be rewritten ({len(new_games)} game(s), {len(final_content)} characters).", file=out)
+           print("--- Finished Root Index Generation ---", file=out)
+           return
+
+       # Write the final index.html
+       print(f"Writing output file: {output_path}", file=out)
+       try:
+           write_file_atomic(output_path, final_content)
+           print("Successfully generated index.html.", file=out)
+       except Exception as e:
+           print(f"Error writing output file: {e}", file=err)
+           print("Warning: Failed to update root index.html.", file=out) # Don't exit script
 
-   print("--- Finished Root Index Generation ---")
+       print("--- Finished Root Index Generation ---", file=out)
 
 
 if __name__ == "__main__":
+    import argparse # Only the CLI needs it; release_manager imports this module per release
+    parser = argparse.ArgumentParser(description="Regenerate the root index.html from every game's releases.")
+    parser.add_argument("--plan", "--dry-run", dest="plan", action="store_true",
+                        help="Report which games would be re-rendered and whether index.html would change, without writing.")
+    args = parser.parse_args()
     # Determine project root (assuming script is in 'scripts' subdir)
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(script_dir)
     # Call the main generation function
-    update_root_index(project_root)
\ No newline at end of file
+    update_root_index(project_root, dry_run=args.plan)
\ No newline at end of file
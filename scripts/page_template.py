@@ -0,0 +1,37 @@
+# Purpose: Page templates (index.template.html, and index.html as served by the admin
+#          server) pre-split once around their placeholder into a head and a tail, so
+#          filling one in is a concatenation instead of a search-and-replace over the
+#          whole document. Each template is cached per process and re-read only when
+#          its mtime changes.
+# Usage: Imported by scripts/generate_index.py, scripts/build_static.py and admin/admin_server.py.
+
+import os
+import threading
+from collections import namedtuple
+
+# tail is None when the file has no placeholder; head is then the whole document
+CompiledTemplate = namedtuple('CompiledTemplate', ['head', 'tail', 'mtime', 'mtime_ns'])
+
+_templates = {} # (path, placeholder) -> CompiledTemplate
+_templates_lock = threading.Lock()
+
+def load_template(path, placeholder):
+    """Returns the CompiledTemplate for path, re-reading the file only if its mtime changed."""
+    stat = os.stat(path) # Raises FileNotFoundError like open() would
+    key = (path, placeholder)
+    compiled = _templates.get(key)
+    if compiled is not None and compiled.mtime_ns == stat.st_mtime_ns:
+        return compiled
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    head, found, tail = content.partition(placeholder)
+    compiled = CompiledTemplate(head, tail if found else None, stat.st_mtime, stat.st_mtime_ns)
+    with _templates_lock:
+        _templates[key] = compiled
+    return compiled
+
+def fill(template, body):
+    """Returns the template's document with body in place of the placeholder."""
+    if template.tail is None:
+        return template.head
+    return template.head + body + template.tail
@@ -0,0 +1,155 @@
+# Purpose: Persistent per-game index of release versions, stored as games/<app>/.versions.json.
+#          It holds the release directory names sorted latest first, each with its parsed
+#          release numbers and entry point, so the admin server, generate_index.py and
+#          release_manager.py don't re-list releases/ and re-parse every version string on
+#          every call. Only release_manager.py (after each release) and this script's CLI write
+#          it, atomically. Readers never write: when releases/ has changed since it was written,
+#          they rebuild it in memory and keep that copy until releases/ changes again.
+#          Plain X.Y.Z versions are ordered without importing `packaging` at all.
+# Usage: Imported by admin/admin_server.py, admin/release_manager.py and scripts/generate_index.py.
+#        python scripts/version_index.py [app_name ...] rebuilds the index of the given (or all) games.
+
+import json
+import os
+import re
+import sys
+
+VERSION_INDEX_FILENAME = '.versions.json' # Under games/<app>/; derived data, ignored by git
+VERSION_INDEX_FORMAT = 1
+PLAIN_VERSION = re.compile(r'^(\d+)\.(\d+)\.(\d+)$')
+stats = {'hits': 0, 'rebuilds': 0} # read_version_index() outcomes, reported by the admin server's /metrics
+rebuilt_indexes = {} # app_dir -> index rebuilt by read_version_index() because the stored one was stale
+
+def print_warning(message):
+    """Default `log` for warnings: stderr. Callers that capture output (release jobs) pass their own."""
+    print(message, file=sys.stderr)
+
+def plain_release(name):
+    """Returns the (major, minor, patch) ints of a plain X.Y.Z version string, or None."""
+    match = PLAIN_VERSION.match(name)
+    return tuple(int(part) for part in match.groups()) if match else None
+
+def sort_versions(names, warn=None, log=print_warning):
+    """
+    Returns the valid version strings in names, latest first. Plain X.Y.Z versions are compared
+    as integer tuples; `packaging` is only imported when some other version string is present.
+    Names that are not versions are dropped (reported through warn(name), if given).
+    """
+    releases = {name: plain_release(name) for name in names}
+    if all(release is not None for release in releases.values()):
+        return sorted(releases, key=releases.get, reverse=True) # Fast path: no packaging import
+
+    try:
+        from packaging.version import parse as parse_version, InvalidVersion
+    except ImportError:
+        log("Warning: The 'packaging' library is not installed (pip install packaging); "
+            "only plain X.Y.Z versions will be listed.")
+        parse_version = None
+    parsed = []
+    for name in names:
+        if parse_version is None:
+            if releases[name] is not None:
+                parsed.append((releases[name], name))
+            continue
+        try:
+            parsed.append((parse_version(name), name))
+        except InvalidVersion:
+            if warn is not None:
+                warn(name)
+    parsed.sort(key=lambda item: item[0], reverse=True)
+    return [name for _, name in parsed]
+
+def find_entry_point(directory, app_name):
+    """Finds the entry HTML file (app_name.html or index.html) in a directory."""
+    preferred_entry = f"{app_name}.html"
+    if os.path.exists(os.path.join(directory, preferred_entry)):
+        return preferred_entry
+    elif os.path.exists(os.path.join(directory, "index.html")):
+        return "index.html"
+    else:
+        return None # No entry point found
+
+def _releases_mtime_ns(releases_dir):
+    try:
+        return os.stat(releases_dir).st_mtime_ns
+    except OSError:
+        return None
+
+def build_version_index(app_dir, log=print_warning):
+    """Scans games/<app>/releases and returns a fresh index dict (without writing it). Warnings go to log."""
+    app_name = os.path.basename(os.path.normpath(app_dir))
+    releases_dir = os.path.join(app_dir, 'releases')
+    releases_mtime_ns = _releases_mtime_ns(releases_dir) # Taken first so a concurrent release makes the index stale
+    names = []
+    if releases_mtime_ns is not None:
+        with os.scandir(releases_dir) as entries:
+            names = [entry.name for entry in entries if entry.is_dir()]
+
+    def warn(name):
+        log(f"Warning: Could not parse version from directory name '{name}' in {app_name}. Skipping.")
+
+    versions = []
+    for name in sort_versions(names, warn, log):
+        release = plain_release(name)
+        versions.append({
+            "version": name,
+            "release": list(release) if release is not None else None, # None: needs packaging to order
+            "entry_point": find_entry_point(os.path.join(releases_dir, name), app_name),
+        })
+    return {"format": VERSION_INDEX_FORMAT, "releases_mtime_ns": releases_mtime_ns, "versions": versions}
+
+def write_version_index(app_dir, index=None, log=print_warning):
+    """Rebuilds (unless given) and atomically writes an app's version index. Returns the index."""
+    import tempfile # Imported here: it is slow to import, and the CLIs that import this module mostly only read
+    index = index if index is not None else build_version_index(app_dir, log)
+    path = os.path.join(app_dir, VERSION_INDEX_FILENAME)
+    tmp_path = None
+    try:
+        # A unique temporary name, so concurrent writers (threads or processes) never share one
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{VERSION_INDEX_FILENAME}.", suffix='.tmp', dir=app_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+        os.chmod(tmp_path, 0o644) # mkstemp creates it 0600
+        os.replace(tmp_path, path) # Readers never see a partial file
+    except OSError as e:
+        log(f"Warning: Could not write version index {path}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    rebuilt_indexes.pop(app_dir, None)
+    return index
+
+def read_version_index(app_dir, log=print_warning):
+    """
+    Returns an app's version entries ({version, release, entry_point}), latest first.
+    The stored index is used while the releases/ directory is unchanged since it was
+    written; otherwise it is rebuilt in memory, never written (readers include dry runs,
+    and a write would change games/<app>'s mtime under the catalog). Warnings go to log.
+    """
+    releases_mtime_ns = _releases_mtime_ns(os.path.join(app_dir, 'releases'))
+    rebuilt = rebuilt_indexes.get(app_dir)
+    if rebuilt is not None and rebuilt['releases_mtime_ns'] == releases_mtime_ns:
+        stats['hits'] += 1
+        return rebuilt['versions']
+    try:
+        with open(os.path.join(app_dir, VERSION_INDEX_FILENAME), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('format') == VERSION_INDEX_FORMAT and index.get('releases_mtime_ns') == releases_mtime_ns:
+            stats['hits'] += 1
+            return index['versions']
+    except (OSError, ValueError):
+        pass
+    stats['rebuilds'] += 1
+    index = build_version_index(app_dir, log)
+    rebuilt_indexes[app_dir] = index
+    return index['versions']
+
+def main():
+    games_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'games')
+    app_names = sys.argv[1:] or sorted(
+        name for name in os.listdir(games_dir) if os.path.isdir(os.path.join(games_dir, name)))
+    for app_name in app_names:
+        index = write_version_index(os.path.join(games_dir, app_name))
+        print(f"{app_name}: {', '.join(entry['version'] for entry in index['versions']) or 'no releases'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# Purpose: Tests for admin/admin_server.py: the headers of release files in each
+#          FUN_STATIC_OFFLOAD mode (encodings, immutable caching, manifest ETags), the public
+#          listener of --serve mode (which hides the admin routes), parsing of the batched `git status --porcelain -z` output,
+#          the /api/apps catalog API (pages, fields, ETags, deltas), and the streamed index page.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from werkzeug.test import Client
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import admin_server # noqa: E402 (needs the sys.path entries above)
+from catalog_cache import CatalogCache # noqa: E402
+
+RELEASE_URL = '/games/demo/releases/1.0.0/demo.js'
+
+class ReleaseFileHeadersTest(unittest.TestCase):
+    def setUp(self):
+        self.games_dir = tempfile.mkdtemp(prefix='fun-test-games-')
+        self.addCleanup(shutil.rmtree, self.games_dir)
+        release_dir = os.path.join(self.games_dir, 'demo', 'releases', '1.0.0')
+        os.makedirs(release_dir)
+        for name, data in (('demo.js', b'console.log("demo");\n' * 64), ('demo.js.gz', b'gzip bytes'), ('demo.js.br', b'br bytes')):
+            with open(os.path.join(release_dir, name), 'wb') as f:
+                f.write(data)
+        self.release_dir = release_dir
+        for patcher in (mock.patch.object(admin_server, 'GAMES_DIR', self.games_dir),
+                        mock.patch.dict(admin_server._release_manifests, clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = admin_server.app.test_client()
+
+    def get(self, offload, accept_encoding='br, gzip'):
+        with mock.patch.object(admin_server, 'STATIC_OFFLOAD', offload):
+            return self.client.get(RELEASE_URL, headers={'Accept-Encoding': accept_encoding})
+
+    def test_python_mode_serves_precompressed_sibling(self):
+        response = self.get('none')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(response.data, b'br bytes')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn('javascript', response.headers['Content-Type'])
+
+    def test_python_mode_negotiates_each_encoding(self):
+        response = self.get('none', 'gzip;q=1, br;q=0')
+        self.assertEqual((response.headers['Content-Encoding'], response.data), ('gzip', b'gzip bytes'))
+        response = self.get('none', 'identity')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, b'console.log("demo");\n' * 64)
+        self.assertIn('Accept-Encoding', response.headers['Vary']) # The plain answer varies too
+
+    def test_manifest_hash_is_the_strong_etag(self):
+        files = admin_server.release_manager.write_release_manifest(self.release_dir, log=lambda message: None)['files']
+        for accept_encoding, served_name in (('identity', 'demo.js'), ('br', 'demo.js.br')):
+            response = self.get('none', accept_encoding)
+            self.assertEqual(response.headers['ETag'], f'"{files[served_name]["etag"]}"')
+            self.assertEqual(response.cache_control.max_age, admin_server.RELEASE_MAX_AGE)
+            self.assertTrue(response.cache_control.public and response.cache_control.immutable)
+        with mock.patch.object(admin_server, 'STATIC_OFFLOAD', 'none'):
+            response = self.client.get(RELEASE_URL, headers={'Accept-Encoding': 'br',
+                                                             'If-None-Match': f'"{files["demo.js.br"]["etag"]}"'})
+        self.assertEqual((response.status_code, response.data), (304, b''))
+
+    def test_working_files_always_revalidate(self):
+        os.makedirs(os.path.join(self.games_dir, 'demo', 'working'))
+        with open(os.path.join(self.games_dir, 'demo', 'working', 'demo.js'), 'w', encoding='utf-8') as f:
+            f.write('console.log("edited");\n')
+        with mock.patch.object(admin_server, 'STATIC_OFFLOAD', 'none'):
+            response = self.client.get('/games/demo/working/demo.js')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.cache_control.no_cache)
+        self.assertEqual(response.cache_control.max_age, 0)
+        self.assertFalse(response.cache_control.immutable)
+
+    def test_x_accel_redirects_to_plain_file_without_encoding_headers(self):
+        response = self.get('x-accel')
+        self.assertEqual(response.status_code, 200)
+        # nginx picks the .br/.gz sibling itself (gzip_static/brotli_static) and would drop these headers anyway
+        self.assertEqual(response.headers['X-Accel-Redirect'], admin_server.X_ACCEL_PREFIX + 'demo/releases/1.0.0/demo.js')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Vary', response.headers)
+        self.assertEqual(response.data, b'')
+        self.assertIn('javascript', response.headers['Content-Type'])
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn(f"max-age={admin_server.RELEASE_MAX_AGE}", response.headers['Cache-Control'])
+
+class PublicListenerTest(unittest.TestCase):
+    def setUp(self):
+        self.games_dir = tempfile.mkdtemp(prefix='fun-test-public-')
+        self.addCleanup(shutil.rmtree, self.games_dir)
+        os.makedirs(os.path.join(self.games_dir, 'demo', 'releases', '1.0.0'))
+        with open(os.path.join(self.games_dir, 'demo', 'releases', '1.0.0', 'demo.js'), 'w', encoding='utf-8') as f:
+            f.write('console.log("demo");\n')
+        for patcher in (mock.patch.object(admin_server, 'GAMES_DIR', self.games_dir),
+                        mock.patch.object(admin_server, 'STATIC_OFFLOAD', 'none')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = Client(admin_server.PublicOnly(admin_server.app.wsgi_app))
+
+    def test_games_are_served(self):
+        response = self.client.get(RELEASE_URL)
+        self.assertEqual((response.status_code, response.get_data()), (200, b'console.log("demo");\n'))
+
+    def test_admin_routes_are_not_found(self):
+        with mock.patch.object(admin_server.release_jobs, 'submit') as submit:
+            response = self.client.post('/api/release', json={'app_name': 'demo', 'version_tag': '2.0.0'})
+        self.assertEqual(response.status_code, 404)
+        submit.assert_not_called()
+        for path in ('/admin', '/admin.js', '/api/apps', '/api/jobs', '/metrics'):
+            self.assertEqual(self.client.get(path).status_code, 404, path)
+
+class WorkingChangesTest(unittest.TestCase):
+    """get_working_changes() against a real repository, so the -z records are exactly what git writes."""
+
+    def setUp(self):
+        self.repo_root = tempfile.mkdtemp(prefix='fun-test-repo-')
+        self.addCleanup(shutil.rmtree, self.repo_root)
+        self.games_dir = os.path.join(self.repo_root, 'games')
+        self.git('init', '-q')
+        for path in ('sp ace/working/odd\nname.js', 'beta/working/old name.js', 'gamma/working/g.js', 'delta/working/d.js'):
+            self.write(path, f"// {path}\n")
+        self.git('add', '-A')
+        self.git('-c', 'user.name=Test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'Games')
+        for patcher in (mock.patch.object(admin_server, 'REPO_ROOT', self.repo_root),
+                        mock.patch.object(admin_server, 'GAMES_DIR', self.games_dir)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def git(self, *args):
+        subprocess.run(['git'] + list(args), cwd=self.repo_root, check=True, capture_output=True)
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.games_dir, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_changes_are_attributed_to_their_games(self):
+        self.write('sp ace/working/odd\nname.js', '// edited\n') # Space in the game, newline in the file name
+        os.makedirs(os.path.join(self.games_dir, 'zeta', 'working'))
+        # A staged rename is two records: the new path, then the original one on its own
+        self.git('mv', 'games/beta/working/old name.js', 'games/zeta/working/new name.js')
+        self.write('gamma/releases/1.0.0/g.js', '// outside working/\n')
+        self.write('eta/working/e.js', '// untracked game, reported as "games/eta/"\n')
+        self.assertEqual(admin_server.get_working_changes(), {'sp ace', 'beta', 'zeta', 'eta'})
+
+    def test_only_the_requested_games_are_checked(self):
+        self.write('sp ace/working/odd\nname.js', '// edited\n')
+        self.write('gamma/working/g.js', '// edited\n')
+        self.assertEqual(admin_server.get_working_changes(['sp ace', 'delta']), {'sp ace'})
+
+    def test_clean_tree_has_no_changes(self):
+        self.assertEqual(admin_server.get_working_changes(), set())
+
+class CatalogApiTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-api-')
+        self.addCleanup(shutil.rmtree, self.root)
+        self.games_dir = os.path.join(self.root, 'games')
+        for app_name in ('alpha', 'beta', 'gamma'):
+            self.write(f"{app_name}/working/{app_name}.html")
+        for version in ('1.0.0', '1.2.0'):
+            self.write(f"alpha/releases/{version}/alpha.html")
+        catalog = CatalogCache(lambda: admin_server.get_game_details(), self.games_dir, self.root, check_interval=0)
+        for patcher in (mock.patch.object(admin_server, 'GAMES_DIR', self.games_dir),
+                        mock.patch.object(admin_server, 'catalog', catalog),
+                        mock.patch.object(admin_server, 'working_changes', lambda: {'gamma'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = admin_server.app.test_client()
+
+    def write(self, rel_path):
+        path = os.path.join(self.games_dir, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('<!DOCTYPE html>')
+
+    def names(self, response):
+        return [game['name'] for game in response.get_json()]
+
+    def test_pages_follow_the_cursor(self):
+        first = self.client.get('/api/apps?limit=2')
+        self.assertEqual(self.names(first), ['alpha', 'beta'])
+        self.assertEqual(first.headers['X-Next-Cursor'], 'beta')
+        self.assertEqual(first.headers['Link'], '</api/apps?limit=2&cursor=beta>; rel="next"')
+        last = self.client.get('/api/apps?limit=2&cursor=beta')
+        self.assertEqual(self.names(last), ['gamma'])
+        self.assertNotIn('X-Next-Cursor', last.headers)
+
+    def test_fields_and_prefix(self):
+        games = self.client.get('/api/apps?fields=latest_version,has_updates&prefix=a').get_json()
+        self.assertEqual(games, [{'name': 'alpha', 'latest_version': '1.2.0', 'has_updates': False}])
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in ('fields=size', 'limit=0', 'limit=abc', f"limit={admin_server.MAX_PAGE_SIZE + 1}"):
+            self.assertEqual(self.client.get(f"/api/apps?{query}").status_code, 400, query)
+        for query in ('since=abc', 'since=-1', 'since=1.5'):
+            self.assertEqual(self.client.get(f"/api/apps/changes?{query}").status_code, 400, query)
+
+    def test_unchanged_catalog_answers_304(self):
+        etag = self.client.get('/api/apps').headers['ETag']
+        self.assertEqual(self.client.get('/api/apps', headers={'If-None-Match': etag}).status_code, 304)
+        self.write('beta/releases/1.0.0/beta.html')
+        self.assertEqual(self.client.get('/api/apps', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_changes_since_a_revision(self):
+        first = self.client.get('/api/apps')
+        revision, epoch = first.headers['X-Catalog-Revision'], first.headers['X-Catalog-Epoch']
+        self.write('beta/releases/1.0.0/beta.html')
+        shutil.rmtree(os.path.join(self.games_dir, 'gamma'))
+        delta = self.client.get(f"/api/apps/changes?since={revision}&epoch={epoch}&fields=latest_version").get_json()
+        self.assertEqual((delta['full'], delta['changed'], delta['removed']),
+                         (False, [{'name': 'beta', 'latest_version': '1.0.0'}], ['gamma']))
+        self.assertEqual(delta['revision'], int(revision) + 1)
+        stale_epoch = self.client.get(f"/api/apps/changes?since={revision}&epoch=older").get_json()
+        self.assertTrue(stale_epoch['full'])
+        self.assertEqual([game['name'] for game in stale_epoch['changed']], ['alpha', 'beta'])
+
+class IndexPageTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-index-page-')
+        self.addCleanup(shutil.rmtree, self.root)
+        self.games_dir = os.path.join(self.root, 'games')
+        for app_name in ('alpha-game', 'beta-game'):
+            os.makedirs(os.path.join(self.games_dir, app_name, 'working'))
+            with open(os.path.join(self.games_dir, app_name, 'working', f"{app_name}.html"), 'w', encoding='utf-8') as f:
+                f.write('<!DOCTYPE html>')
+        self.write_template('<ul>')
+        catalog = CatalogCache(lambda: admin_server.get_game_details(), self.games_dir, self.root, check_interval=0)
+        for patcher in (mock.patch.object(admin_server, 'REPO_ROOT', self.root),
+                        mock.patch.object(admin_server, 'GAMES_DIR', self.games_dir),
+                        mock.patch.object(admin_server, 'catalog', catalog),
+                        mock.patch.object(admin_server, 'working_changes', lambda: set()),
+                        mock.patch.object(admin_server, '_rendered_game_list', (None, None))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = admin_server.app.test_client()
+
+    def write_template(self, opening, mtime=None):
+        path = os.path.join(self.root, 'index.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"<html>{opening}{admin_server.INDEX_PLACEHOLDER}</ul></html>")
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_page_is_streamed_and_the_list_reused(self):
+        with mock.patch.object(admin_server, 'render_game_list_items', wraps=admin_server.render_game_list_items) as render:
+            response = self.client.get('/')
+            self.assertTrue(response.is_streamed)
+            chunks = list(response.response)
+            self.assertEqual(chunks[0], b'<html><ul>') # The head goes out before the list is rendered
+            self.assertEqual(chunks[-1], b'</ul></html>')
+            page = b''.join(chunks).decode('utf-8')
+            self.assertIn('<a href="/games/alpha-game/working/alpha-game.html">Alpha Game (Working)</a>', page)
+            self.assertEqual(self.client.get('/').get_data(as_text=True), page)
+        render.assert_called_once() # Same catalog revision: the second page reused the list
+
+    def test_template_changes_change_the_etag(self):
+        self.write_template('<ul>', mtime=1000000000)
+        etag = self.client.get('/').headers['ETag']
+        self.assertEqual(self.client.get('/', headers={'If-None-Match': etag}).status_code, 304)
+        self.write_template('<ul class="games">', mtime=1000000060)
+        response = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_data(as_text=True).startswith('<html><ul class="games">'))
+
+if __name__ == '__main__':
+    unittest.main()
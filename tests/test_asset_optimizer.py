@@ -0,0 +1,90 @@
+# Purpose: Tests for admin/asset_optimizer.py: the HTML/CSS minifiers, and optimize_tree()'s
+#          cache, fallbacks and worker processes (which must not re-run the calling program).
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import asset_optimizer # noqa: E402 (needs the sys.path entries above)
+
+CSS = "a  {  color: red ;  }\n/* note */ /*! license */\nb > i { content: \"a  b\" ; }\n"
+HTML = ("<!-- note -->\n<p>  hi  <b>x</b></p>\n<pre>  a\n  b</pre><!--[if IE]>x<![endif]-->"
+        "<style> a { color: red; } </style>\n")
+
+class MinifierTest(unittest.TestCase):
+    def test_css(self):
+        self.assertEqual(asset_optimizer.minify_css(CSS), 'a{color:red}/*! license */ b>i{content:"a  b"}')
+
+    def test_html(self):
+        self.assertEqual(asset_optimizer.minify_html(HTML),
+                         '<p> hi <b>x</b></p>\n<pre>  a\n  b</pre><!--[if IE]>x<![endif]--><style>a{color:red}</style>\n')
+
+class OptimizeTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-optimize-')
+        self.addCleanup(shutil.rmtree, self.root)
+        self.src_dir, self.cache_dir = os.path.join(self.root, 'working'), os.path.join(self.root, 'cache')
+        self.files = {'index.html': HTML * 20, 'css/a.css': CSS * 20, 'css/b.css': CSS * 30, 'tiny.css': 'a{}',
+                      'data.bin': 'not optimized'}
+        for rel_path, text in self.files.items():
+            path = os.path.join(self.src_dir, *rel_path.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+    def optimize(self, name, jobs):
+        dst_dir, log = os.path.join(self.root, name), []
+        stats = asset_optimizer.optimize_tree(self.src_dir, dst_dir, self.cache_dir, jobs=jobs, log=log.append)
+        return dst_dir, stats, log
+
+    def read(self, dst_dir, rel_path):
+        with open(os.path.join(dst_dir, *rel_path.split('/')), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_workers_then_cache(self):
+        dst_dir, stats, _ = self.optimize('first', jobs=2)
+        self.assertEqual((stats['optimized'], stats['cached'], stats['kept'], stats['failed']), (3, 0, 1, 0))
+        self.assertEqual(self.read(dst_dir, 'css/a.css'), asset_optimizer.minify_css(CSS * 20))
+        self.assertEqual(self.read(dst_dir, 'tiny.css'), 'a{}') # Not smaller: the original is kept
+        self.assertEqual(self.read(dst_dir, 'data.bin'), 'not optimized')
+        _, stats, _ = self.optimize('second', jobs=2)
+        self.assertEqual((stats['optimized'], stats['cached']), (3, 3))
+
+    def test_failing_file_is_kept_and_reported(self):
+        with open(os.path.join(self.src_dir, 'broken.css'), 'wb') as f:
+            f.write(b'\xff\xfe not utf-8' * 40)
+        for jobs in (1, 2):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            dst_dir, stats, log = self.optimize(f"jobs{jobs}", jobs=jobs)
+            self.assertEqual((stats['failed'], stats['optimized']), (1, 3), jobs)
+            self.assertTrue(any(line.startswith('Warning: Could not optimize broken.css') for line in log), log)
+            with open(os.path.join(dst_dir, 'broken.css'), 'rb') as f:
+                self.assertEqual(f.read(), b'\xff\xfe not utf-8' * 40)
+
+    def test_workers_do_not_rerun_the_main_script(self):
+        script = os.path.join(self.root, 'server.py')
+        with open(script, 'w', encoding='utf-8') as f:
+            f.write(textwrap.dedent(f"""\
+                import sys
+                print('main module ran as', __name__, flush=True)
+                sys.path.insert(0, {os.path.join(REPO_ROOT, 'admin')!r})
+                import asset_optimizer
+                if __name__ == '__main__':
+                    stats = asset_optimizer.optimize_tree({self.src_dir!r}, {os.path.join(self.root, 'out')!r},
+                                                          {self.cache_dir!r}, jobs=2, log=lambda message: None)
+                    print('optimized', stats['optimized'])
+                """))
+        result = subprocess.run([sys.executable, script], capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.stdout.splitlines(), ['main module ran as __main__', 'optimized 3'], result.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
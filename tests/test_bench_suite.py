@@ -0,0 +1,66 @@
+# Purpose: Tests for benchmarks/bench_suite.py: a smoke run on a tiny synthetic tree, and the
+#          baseline comparison and startup budgets that decide its exit code.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+import bench_suite # noqa: E402 (needs the sys.path entries above)
+
+SUITE = os.path.join(REPO_ROOT, 'benchmarks', 'bench_suite.py')
+TINY_TREE = ['--games', '3', '--versions', '2', '--assets', '2', '--asset-size', '512', '--repeat', '1']
+
+def results(**medians):
+    return {'config': {'games': 3}, 'results': {name: {'median_ms': median} for name, median in medians.items()}}
+
+class BenchSuiteTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-bench-')
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def run_suite(self, *args):
+        return subprocess.run([sys.executable, SUITE, *TINY_TREE, *args], capture_output=True, text=True, timeout=120)
+
+    def test_smoke_run_against_its_own_baseline(self):
+        output_path = os.path.join(self.root, 'results.json')
+        process = self.run_suite('--output', output_path)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        with open(output_path, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+        self.assertEqual(recorded['format'], bench_suite.RESULTS_FORMAT)
+        for name in ('scan_cold', 'index_warm', 'api_apps_304', 'release_dedup', 'release_archive', *bench_suite.STARTUP_BUDGETS_MS):
+            self.assertEqual(recorded['results'][name]['runs'], 1, name)
+        # Timings this small are noise; the run only has to read the baseline and compare
+        process = self.run_suite('--baseline', output_path, '--threshold', '1000')
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertIn('No regressions against the baseline.', process.stdout)
+
+    def test_compare_flags_regressions_past_the_threshold(self):
+        current = results(scan_cold=13.0, index_warm=11.0, api_apps_304=5.0)
+        baseline = results(scan_cold=10.0, index_warm=10.0)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(bench_suite.compare(current, baseline, 0.25), ['scan_cold'])
+        self.assertIn('new', out.getvalue()) # api_apps_304 has no baseline yet
+
+    def test_startup_budgets_are_measured_over_the_bare_interpreter(self):
+        summaries = {'startup_python': {'median_ms': 20.0}}
+        for name, budget in bench_suite.STARTUP_BUDGETS_MS.items():
+            summaries[name] = {'median_ms': 20.0 + budget}
+        summaries['startup_generate_index']['median_ms'] += 1
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(bench_suite.check_budgets(summaries), ['startup_generate_index'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# Purpose: Tests for scripts/build_static.py: the exported tree (hash-named release dirs,
+#          precompressed siblings, index and manifest), and incremental rebuilds that reuse
+#          unchanged releases and prune the ones that went away.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import build_static # noqa: E402 (needs the sys.path entries above)
+import generate_index # noqa: E402
+
+class BuildStaticTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-static-')
+        self.addCleanup(shutil.rmtree, self.root)
+        self.out_dir = os.path.join(self.root, 'dist')
+        with open(os.path.join(self.root, 'index.template.html'), 'w', encoding='utf-8') as f:
+            f.write("<ul>\n" + generate_index.PLACEHOLDER + "\n</ul>\n")
+        self.add_release('alpha', '1.0.0')
+        self.add_release('alpha', '1.1.0')
+        self.add_release('beta', '1.0.0')
+
+    def add_release(self, app_name, version, script='console.log("frame");\n'):
+        release_dir = os.path.join(self.root, 'games', app_name, 'releases', version)
+        os.makedirs(os.path.join(release_dir, 'js'))
+        with open(os.path.join(release_dir, f"{app_name}.html"), 'w', encoding='utf-8') as f:
+            f.write('<!DOCTYPE html>')
+        with open(os.path.join(release_dir, 'js', 'game.js'), 'w', encoding='utf-8') as f:
+            f.write(f'// {app_name} {version}\n' + script * 50)
+
+    def build(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            build_static.build(self.root, self.out_dir, jobs=2)
+        return out.getvalue().splitlines()[-1]
+
+    def manifest(self):
+        with open(os.path.join(self.out_dir, build_static.BUILD_MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_export_layout(self):
+        self.assertTrue(self.build().startswith('Exported 3 of 3 release(s) (0 unchanged), pruned 0 stale directories'))
+        games = self.manifest()['games']
+        self.assertEqual(sorted(games), ['alpha', 'beta'])
+        self.assertEqual(games['alpha']['latest'], '1.1.0')
+        latest = games['alpha']['versions']['1.1.0']
+        self.assertRegex(latest['path'], r'^games/alpha/1\.1\.0\.[0-9a-f]{10}/$')
+        export_dir = os.path.join(self.out_dir, *latest['path'].split('/'))
+        self.assertEqual(sorted(latest['files']), ['alpha.html', 'js/game.js'])
+        self.assertTrue(os.path.isfile(os.path.join(export_dir, 'js', 'game.js.gz')))
+        with open(os.path.join(self.out_dir, 'index.html'), 'r', encoding='utf-8') as f:
+            self.assertIn(latest['path'] + 'alpha.html', f.read())
+        self.assertTrue(os.path.isfile(os.path.join(self.out_dir, 'index.html.gz')))
+
+    def test_rebuild_reuses_unchanged_releases(self):
+        self.build()
+        first = self.manifest()
+        index_mtime = os.stat(os.path.join(self.out_dir, 'index.html')).st_mtime_ns
+        self.assertTrue(self.build().startswith('Exported 0 of 3 release(s) (3 unchanged), pruned 0'))
+        self.assertEqual(self.manifest(), first)
+        self.assertEqual(os.stat(os.path.join(self.out_dir, 'index.html')).st_mtime_ns, index_mtime)
+
+    def test_changed_and_removed_releases(self):
+        self.build()
+        old_path = self.manifest()['games']['alpha']['versions']['1.0.0']['path']
+        # Releases are write-once; one is only ever replaced as a whole
+        shutil.rmtree(os.path.join(self.root, 'games', 'alpha', 'releases', '1.0.0'))
+        self.add_release('alpha', '1.0.0', script='console.log("fixed");\n')
+        shutil.rmtree(os.path.join(self.root, 'games', 'beta'))
+        self.assertTrue(self.build().startswith('Exported 1 of 2 release(s) (1 unchanged), pruned 2 stale directories'))
+        games = self.manifest()['games']
+        self.assertEqual(sorted(games), ['alpha'])
+        new_path = games['alpha']['versions']['1.0.0']['path']
+        self.assertNotEqual(new_path, old_path) # New content, new URL
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, *old_path.split('/'))))
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, 'games', 'beta')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# Purpose: Tests for admin/catalog_cache.py: when the cached catalog is rebuilt (polling
+#          mtimes, invalidate(), builds shared between processes).
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+from catalog_cache import CatalogCache # noqa: E402 (needs the sys.path entries above)
+
+class CatalogCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-catalog-')
+        self.addCleanup(shutil.rmtree, self.root)
+        self.games_dir = os.path.join(self.root, 'games')
+        self.write('demo/working/demo.html', 'demo')
+        self.loads = 0
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.games_dir, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def loader(self):
+        self.loads += 1
+        return [{'name': name, 'load': self.loads} for name in sorted(os.listdir(self.games_dir))]
+
+    def cache(self, **kwargs):
+        # check_interval=0: every get() compares the mtime signature
+        return CatalogCache(self.loader, self.games_dir, self.root, check_interval=0, **kwargs)
+
+    def test_unchanged_tree_is_served_from_cache(self):
+        cache = self.cache()
+        first = cache.get()
+        self.assertIs(cache.get(), first)
+        self.assertEqual(self.loads, 1)
+
+    def test_new_file_deep_in_working_triggers_rebuild(self):
+        cache = self.cache()
+        cache.get()
+        self.write('demo/working/sounds/sfx/pop.ogg', 'pop')
+        cache.get()
+        self.assertEqual(self.loads, 2)
+
+    def test_new_release_triggers_rebuild(self):
+        cache = self.cache()
+        cache.get()
+        self.write('demo/releases/1.0.0/demo.html', 'demo')
+        cache.get()
+        self.assertEqual(self.loads, 2)
+
+    def test_invalidate_forces_rebuild(self):
+        cache = self.cache()
+        cache.get()
+        self.write('demo/working/demo.html', 'edited in place') # No directory mtime changes
+        cache.invalidate()
+        cache.get()
+        self.assertEqual(self.loads, 2)
+
+    def test_shared_build_is_reused_unless_invalidated_since(self):
+        shared_path = os.path.join(self.root, 'catalog.json')
+        first, second = self.cache(shared_path=shared_path), self.cache(shared_path=shared_path)
+        built = first.get()
+        self.assertEqual(second.get().etag, built.etag)
+        self.assertEqual((self.loads, second.stats['shared']), (1, 1))
+        # An edit reported through invalidate() leaves the signature as it was: don't take the old build
+        second.invalidate()
+        second.get()
+        self.assertEqual(self.loads, 2)
+
+if __name__ == '__main__':
+    unittest.main()
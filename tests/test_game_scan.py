@@ -0,0 +1,81 @@
+# Purpose: Tests for scripts/game_scan.py: listing games/, the bounded parallel scan (name
+#          order, in-flight limit, errors), and the FUN_SCAN_WORKERS fallback.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import game_scan # noqa: E402 (needs the sys.path entries above)
+
+class GameScanTest(unittest.TestCase):
+    def setUp(self):
+        self.games_dir = tempfile.mkdtemp(prefix='fun-test-scan-')
+        self.addCleanup(shutil.rmtree, self.games_dir)
+        self.names = [f"game-{i:02d}" for i in range(20)]
+        for i, name in enumerate(self.names):
+            os.makedirs(os.path.join(self.games_dir, name, 'working' if i % 2 else 'releases'))
+        with open(os.path.join(self.games_dir, 'README.md'), 'w', encoding='utf-8') as f:
+            f.write('not a game')
+
+    def test_list_games(self):
+        games = game_scan.list_games(self.games_dir)
+        self.assertEqual([game.name for game in games], self.names)
+        self.assertEqual((games[0].has_working, games[0].has_releases), (False, True))
+        self.assertEqual((games[1].has_working, games[1].has_releases), (True, False))
+        self.assertEqual(games[1].path, os.path.join(self.games_dir, 'game-01'))
+
+    def test_results_come_back_in_name_order_with_bounded_work(self):
+        lock = threading.Lock()
+        state = {'running': 0, 'most_running': 0, 'started': 0}
+
+        def scan(game):
+            with lock:
+                state['started'] += 1
+                state['running'] += 1
+                state['most_running'] = max(state['most_running'], state['running'])
+            time.sleep(0.001 * (20 - int(game.name[-2:]))) # Earlier names finish last
+            with lock:
+                state['running'] -= 1
+            return game.name
+
+        results = []
+        for name in game_scan.scan_games(self.games_dir, scan, max_workers=3):
+            with lock:
+                # At most 2 x workers results queued, plus the one being handed over
+                self.assertLessEqual(state['started'] - len(results), 2 * 3 + 1)
+            results.append(name)
+        self.assertEqual(results, self.names)
+        self.assertLessEqual(state['most_running'], 3)
+
+    def test_errors_reach_the_consumer(self):
+        def scan(game):
+            if game.name == 'game-05':
+                raise OSError('unreadable')
+            return game.name
+
+        with self.assertRaisesRegex(OSError, 'unreadable'):
+            list(game_scan.scan_games(self.games_dir, scan, max_workers=4))
+
+    def test_workers_from_env(self):
+        for value, expected in (('', 8), ('3', 3), ('0', 1)):
+            with mock.patch.dict(os.environ, {'FUN_SCAN_WORKERS': value}):
+                self.assertEqual(game_scan._workers_from_env(), expected, value)
+        with mock.patch.dict(os.environ, {'FUN_SCAN_WORKERS': 'many'}), \
+             contextlib.redirect_stderr(io.StringIO()) as err:
+            self.assertEqual(game_scan._workers_from_env(), 8)
+        self.assertIn("Ignoring FUN_SCAN_WORKERS='many'", err.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Purpose: Tests for scripts/generate_index.py: incremental regeneration of the root index.html
+#          (only changed games re-rendered, games added or removed by hand still noticed), and
+#          finding a game's latest version through its version index.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import generate_index # noqa: E402 (needs the sys.path entries above)
+import version_index # noqa: E402
+
+TEMPLATE = "<ul>\n" + generate_index.PLACEHOLDER + "\n</ul>\n"
+
+class UpdateRootIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-index-')
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.root, 'index.template.html'), 'w', encoding='utf-8') as f:
+            f.write(TEMPLATE)
+        for app_name in ('alpha-game', 'beta-game'):
+            self.add_release(app_name, '1.0.0')
+        self.update()
+
+    def add_release(self, app_name, version):
+        release_dir = os.path.join(self.root, 'games', app_name, 'releases', version)
+        os.makedirs(release_dir)
+        with open(os.path.join(release_dir, f"{app_name}.html"), 'w', encoding='utf-8') as f:
+            f.write('<!DOCTYPE html>')
+
+    def update(self, changed_apps=None, dry_run=False):
+        out = io.StringIO()
+        generate_index.update_root_index(self.root, changed_apps, dry_run=dry_run, out=out, err=io.StringIO())
+        return out.getvalue()
+
+    def index(self):
+        with open(os.path.join(self.root, 'index.html'), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_full_run_lists_every_game(self):
+        index = self.index()
+        self.assertIn('games/alpha-game/releases/1.0.0/alpha-game.html', index)
+        self.assertIn('games/beta-game/releases/1.0.0/beta-game.html', index)
+
+    def test_only_changed_games_are_rerendered(self):
+        self.add_release('alpha-game', '1.1.0')
+        output = self.update(['alpha-game'])
+        self.assertIn('Rendered 1 game(s); reused 1 from cache.', output)
+        self.assertIn('games/alpha-game/releases/1.1.0/alpha-game.html', self.index())
+        self.assertIn('index.html is already up to date.', self.update(['alpha-game']))
+
+    def test_games_added_or_removed_by_hand_are_noticed(self):
+        self.add_release('gamma-game', '0.1.0')
+        shutil.rmtree(os.path.join(self.root, 'games', 'beta-game'))
+        output = self.update(['alpha-game'])
+        self.assertIn('checking every game', output)
+        index = self.index()
+        self.assertIn('games/gamma-game/releases/0.1.0/gamma-game.html', index)
+        self.assertNotIn('beta-game', index)
+
+    def test_dry_run_writes_nothing(self):
+        self.add_release('alpha-game', '1.1.0')
+        before = sorted(os.listdir(self.root)), self.index()
+        output = self.update(dry_run=True)
+        self.assertIn('Dry run:', output)
+        self.assertEqual((sorted(os.listdir(self.root)), self.index()), before)
+
+class FindLatestVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.app_dir = tempfile.mkdtemp(prefix='fun-test-latest-')
+        self.addCleanup(shutil.rmtree, self.app_dir)
+        self.releases_dir = os.path.join(self.app_dir, 'releases')
+        for version in ('1.0.0', '1.10.0', '1.9.0'):
+            os.makedirs(os.path.join(self.releases_dir, version))
+        self.addCleanup(version_index.rebuilt_indexes.pop, self.app_dir, None)
+
+    def test_list_of_versions(self):
+        self.assertEqual(generate_index.find_latest_version(['1.0.0', '1.10.0', '1.9.0']), '1.10.0')
+        self.assertIsNone(generate_index.find_latest_version([]))
+
+    def test_releases_dir_is_read_from_the_version_index(self):
+        version_index.write_version_index(self.app_dir)
+        with mock.patch.object(version_index, 'build_version_index', side_effect=AssertionError('rescanned')), \
+             mock.patch.object(generate_index, 'sort_versions', side_effect=AssertionError('sorted')):
+            self.assertEqual(generate_index.find_latest_version(self.releases_dir), '1.10.0')
+
+    def test_stale_index_falls_back_to_the_directory(self):
+        version_index.write_version_index(self.app_dir)
+        os.makedirs(os.path.join(self.releases_dir, '2.0.0'))
+        self.assertEqual(generate_index.find_latest_version(self.releases_dir), '2.0.0')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# Purpose: Tests for admin/metrics.py: RequestProfiler's ?_profile=1 reports, and that it
+#          passes never-ending event streams through instead of draining them.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import itertools
+import os
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import metrics # noqa: E402 (needs the sys.path entries above)
+
+def plain_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'hello']
+
+def event_stream_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/event-stream; charset=utf-8')])
+    return (f"data: {n}\n\n".encode('utf-8') for n in itertools.count()) # Never ends, like the SSE endpoints
+
+class RequestProfilerTest(unittest.TestCase):
+    def call(self, app, query):
+        started = []
+        body = metrics.RequestProfiler(app)({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/x', 'QUERY_STRING': query},
+                                            lambda status, headers, exc_info=None: started.append((status, dict(headers))))
+        return started, body
+
+    def test_profile_replaces_the_response(self):
+        started, body = self.call(plain_app, '_profile=1')
+        self.assertEqual(started[0][1]['Content-Type'], 'text/plain; charset=utf-8')
+        report = b''.join(body).decode('utf-8')
+        self.assertTrue(report.startswith('GET /x -> 200 OK, 5 bytes in '))
+        self.assertIn('function calls', report)
+
+    def test_event_stream_is_passed_through_unprofiled(self):
+        started, body = self.call(event_stream_app, '_profile=1')
+        self.assertEqual(started, [('200 OK', {'Content-Type': 'text/event-stream; charset=utf-8'})])
+        self.assertEqual(list(itertools.islice(body, 2)), [b'data: 0\n\n', b'data: 1\n\n'])
+
+if __name__ == '__main__':
+    unittest.main()
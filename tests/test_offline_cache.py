@@ -0,0 +1,98 @@
+# Purpose: Tests for admin/offline_cache.py: which assets get preload hints, injecting them
+#          (and the service worker registration) idempotently, and the generated precache
+#          manifest and service worker, including the dry-run size estimate.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import offline_cache # noqa: E402 (needs the sys.path entries above)
+
+ENTRY_POINT = """<html><head><meta charset="utf-8"><script src="js/game.js"></script></head>
+<body><script>const puff = new Tone.Player("./sounds/puff.mp3"); load('data/level.json'); const notes = 'notes.txt';</script>
+</body></html>
+"""
+
+class OfflineCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.release_dir = tempfile.mkdtemp(prefix='fun-test-offline-')
+        self.addCleanup(shutil.rmtree, self.release_dir)
+        self.write_files({
+            'demo.html': ENTRY_POINT,
+            'js/game.js': 'console.log(1);',
+            'sounds/puff.mp3': 'mp3',
+            'data/level.json': '{}',
+            'notes.txt': 'not a preloadable type',
+            'js/game.js.gz': 'compressed sibling',
+            '.hidden': 'dotfile',
+        })
+
+    def write_files(self, files):
+        for rel_path, text in files.items():
+            path = os.path.join(self.release_dir, *rel_path.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.release_dir, rel_path), 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def files_map(self):
+        files = {}
+        for rel_path in offline_cache.release_asset_paths(self.release_dir):
+            with open(os.path.join(self.release_dir, *rel_path.split('/')), 'rb') as f:
+                data = f.read()
+            files[rel_path] = {'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+        return files
+
+    def test_release_asset_paths_skip_siblings_dotfiles_and_generated_files(self):
+        self.write_files({offline_cache.SERVICE_WORKER_FILENAME: '// old'})
+        self.assertEqual(offline_cache.release_asset_paths(self.release_dir),
+                         ['data/level.json', 'demo.html', 'js/game.js', 'notes.txt', 'sounds/puff.mp3'])
+
+    def test_only_script_referenced_assets_are_preloaded(self):
+        preloads = offline_cache.find_preloads(ENTRY_POINT, offline_cache.release_asset_paths(self.release_dir), 'demo.html')
+        self.assertEqual(preloads, ['data/level.json', 'sounds/puff.mp3']) # js/game.js is in a src attribute already
+
+    def test_injection_is_idempotent(self):
+        offline_cache.inject_offline_support(self.release_dir, 'demo.html')
+        once = self.read('demo.html')
+        self.assertTrue(once.startswith('<html><head><meta charset="utf-8">' + offline_cache.PRELOAD_START +
+                                        '<link rel="preload" href="./data/level.json" as="fetch" crossorigin>'))
+        self.assertTrue(once.endswith(offline_cache.REGISTER_SNIPPET + '</body></html>\n'))
+        offline_cache.inject_offline_support(self.release_dir, 'demo.html')
+        self.assertEqual(self.read('demo.html'), once)
+
+    def test_cache_name_follows_the_file_hashes(self):
+        files = self.files_map()
+        rendered = offline_cache.render_service_worker(self.release_dir, 'demo', '1.0.0', files)
+        precache = json.loads(rendered[offline_cache.PRECACHE_MANIFEST_FILENAME])
+        self.assertEqual([entry['url'] for entry in precache['files']],
+                         ['./data/level.json', './demo.html', './js/game.js', './notes.txt', './sounds/puff.mp3'])
+        self.assertTrue(precache['cache'].startswith('fun-demo-1.0.0-'))
+        self.assertIn(json.dumps(precache['cache']), rendered[offline_cache.SERVICE_WORKER_FILENAME])
+        self.assertEqual(offline_cache.render_service_worker(self.release_dir, 'demo', '1.0.0', files), rendered)
+        self.write_files({'js/game.js': 'console.log(2);'})
+        changed = json.loads(offline_cache.render_service_worker(self.release_dir, 'demo', '1.0.0', self.files_map())
+                             [offline_cache.PRECACHE_MANIFEST_FILENAME])
+        self.assertNotEqual(changed['cache'], precache['cache'])
+
+    def test_estimate_matches_the_written_sizes(self):
+        estimate = offline_cache.estimate_generated_sizes(self.release_dir, 'demo', '1.0.0')
+        written = offline_cache.write_service_worker(self.release_dir, 'demo', '1.0.0', self.files_map())
+        self.assertEqual(sorted(written), sorted(estimate))
+        for rel_path in written:
+            self.assertEqual(os.path.getsize(os.path.join(self.release_dir, rel_path)), estimate[rel_path], rel_path)
+
+if __name__ == '__main__':
+    unittest.main()
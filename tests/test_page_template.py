@@ -0,0 +1,55 @@
+# Purpose: Tests for scripts/page_template.py: templates split around their placeholder,
+#          cached until the file's mtime changes.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import page_template # noqa: E402 (needs the sys.path entries above)
+
+PLACEHOLDER = '<!-- LIST -->'
+
+class PageTemplateTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-template-')
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, 'index.template.html')
+
+    def write(self, text, mtime):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_fill(self):
+        self.write(f"<ul>{PLACEHOLDER}</ul>", 1000000000)
+        template = page_template.load_template(self.path, PLACEHOLDER)
+        self.assertEqual((template.head, template.tail), ('<ul>', '</ul>'))
+        self.assertEqual(page_template.fill(template, '<li>a</li>'), '<ul><li>a</li></ul>')
+
+    def test_without_placeholder_the_document_is_unchanged(self):
+        self.write('<p>static</p>', 1000000000)
+        template = page_template.load_template(self.path, PLACEHOLDER)
+        self.assertIsNone(template.tail)
+        self.assertEqual(page_template.fill(template, '<li>a</li>'), '<p>static</p>')
+
+    def test_reread_only_when_the_mtime_changes(self):
+        self.write(f"<ul>{PLACEHOLDER}</ul>", 1000000000)
+        first = page_template.load_template(self.path, PLACEHOLDER)
+        self.write(f"<ol>{PLACEHOLDER}</ol>", 1000000000) # Same mtime: still the cached copy
+        self.assertIs(page_template.load_template(self.path, PLACEHOLDER), first)
+        self.write(f"<ol>{PLACEHOLDER}</ol>", 1000000060)
+        self.assertEqual(page_template.load_template(self.path, PLACEHOLDER).head, '<ol>')
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            page_template.load_template(self.path, PLACEHOLDER)
+
+if __name__ == '__main__':
+    unittest.main()
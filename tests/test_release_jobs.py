@@ -0,0 +1,90 @@
+# Purpose: Tests for admin/release_jobs.py: when on_finish runs relative to the job's final
+#          status, and how releases of the same app are queued.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import os
+import sys
+import threading
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+from release_jobs import ReleaseJobManager, sse_events # noqa: E402 (needs the sys.path entries above)
+
+class OnFinishOrderTest(unittest.TestCase):
+    def test_on_finish_runs_before_the_end_event(self):
+        seen = []
+        def on_finish(job, exit_code):
+            seen.append((job.done, exit_code))
+        manager = ReleaseJobManager(lambda job: 0, on_finish=on_finish)
+        job = manager.submit('demo', '1.0.0')
+        events = list(sse_events(job, keepalive=5))
+        # Clients reload the catalog on "end"; it must already be invalidated by then
+        self.assertTrue(events[-1].startswith('event: end'))
+        self.assertEqual(seen, [(False, 0)])
+        self.assertEqual(job.status, 'succeeded')
+
+    def test_failing_runner_reports_exit_code_1(self):
+        seen = []
+        def runner(job):
+            raise RuntimeError('boom')
+        manager = ReleaseJobManager(runner, on_finish=lambda job, exit_code: seen.append(exit_code))
+        job = manager.submit('demo', '1.0.0')
+        list(sse_events(job, keepalive=5))
+        self.assertEqual(seen, [1])
+        self.assertEqual((job.status, job.exit_code), ('failed', 1))
+        self.assertIn('boom', job.output('stderr'))
+
+class PerAppQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.gates = {} # version_tag -> Event the runner waits on
+        self.started = []
+        self.started_changed = threading.Condition()
+        self.manager = ReleaseJobManager(self.runner, max_workers=2)
+
+    def runner(self, job):
+        with self.started_changed:
+            self.started.append(f"{job.app_name} {job.version_tag}")
+            self.started_changed.notify_all()
+        self.gates.setdefault(job.version_tag, threading.Event()).wait(5)
+        return 0
+
+    def wait_started(self, count):
+        with self.started_changed:
+            self.assertTrue(self.started_changed.wait_for(lambda: len(self.started) >= count, 5), self.started)
+
+    def test_waiting_release_leaves_the_worker_to_other_apps(self):
+        for version_tag in ('1', '2', '3'):
+            self.gates[version_tag] = threading.Event()
+        first = self.manager.submit('demo', '1')
+        second = self.manager.submit('demo', '2')
+        other = self.manager.submit('other', '3')
+        self.wait_started(2) # 'other' gets the second worker while demo 2 waits
+        self.assertEqual(sorted(self.started), ['demo 1', 'other 3'])
+        self.assertEqual(second.status, 'queued')
+        self.assertIn('Waiting for another release of demo to finish...', second.output('stdout'))
+        self.gates['1'].set()
+        self.wait_started(3)
+        self.assertEqual(self.started[-1], 'demo 2')
+        for version_tag in ('2', '3'):
+            self.gates[version_tag].set()
+        for job in (first, second, other):
+            list(sse_events(job, keepalive=5))
+            self.assertEqual(job.status, 'succeeded')
+
+    def test_app_is_idle_again_after_its_queue_drains(self):
+        self.gates['1'] = threading.Event()
+        self.gates['1'].set()
+        job = self.manager.submit('demo', '1')
+        list(sse_events(job, keepalive=5))
+        self.gates['2'] = threading.Event()
+        self.gates['2'].set()
+        later = self.manager.submit('demo', '2')
+        list(sse_events(later, keepalive=5))
+        self.assertEqual(later.status, 'succeeded')
+        self.assertNotIn('Waiting', later.output('stdout'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,396 @@
+# Purpose: Tests for admin/release_manager.py: deduplicated release snapshots (and that later
+#          release steps never write through their hard links), precompressed siblings of
+#          compressible assets, reproducible release archives, the per-app
+#          lock that makes a second release of the same game wait (but not one of another game),
+#          the app name / version tag checks shared by single, planned and batch releases, and the
+#          manifest-based verify and diff commands, and the in-process release: git refs read and
+#          tags written without starting git, and progress reported to the caller's out/err,
+#          plus --plan dry runs (which write nothing) and the lazy imports that keep startup fast.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import contextlib
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import release_manager # noqa: E402 (needs the sys.path entries above)
+from file_lock import FileLock, app_lock_path # noqa: E402
+
+def sha256_of(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def write_files(root, files):
+    for rel_path, data in files.items():
+        path = os.path.join(root, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.app_dir = os.path.join(tempfile.mkdtemp(prefix='fun-test-snapshot-'), 'games', 'demo')
+        self.addCleanup(shutil.rmtree, os.path.dirname(os.path.dirname(self.app_dir)))
+        self.working_dir, self.releases_dir = os.path.join(self.app_dir, 'working'), os.path.join(self.app_dir, 'releases')
+
+    def release_dir(self, version):
+        return os.path.join(self.releases_dir, version)
+
+    def test_unchanged_files_are_hard_linked_from_any_path(self):
+        sound = bytes(range(256)) * 4
+        write_files(self.release_dir('1.0.0'), {'sounds/puff.ogg': sound, 'js/game.js': b'console.log(1);'})
+        write_files(self.working_dir, {'audio/puff.ogg': sound, 'js/game.js': b'console.log(2);', 'new.txt': b'new'})
+        stats = release_manager.snapshot_tree(self.working_dir, self.release_dir('1.1.0'), self.release_dir('1.0.0'),
+                                              log=lambda message: None)
+        self.assertEqual(stats['linked'], 1) # Moved but unchanged
+        self.assertEqual(stats['linked'] + stats['reflinked'] + stats['copied'], 3)
+        self.assertEqual(stats['bytes_total'], len(sound) + 15 + 3)
+        self.assertTrue(os.path.samefile(os.path.join(self.release_dir('1.1.0'), 'audio', 'puff.ogg'),
+                                         os.path.join(self.release_dir('1.0.0'), 'sounds', 'puff.ogg')))
+        self.assertFalse(os.path.samefile(os.path.join(self.release_dir('1.1.0'), 'js', 'game.js'),
+                                          os.path.join(self.release_dir('1.0.0'), 'js', 'game.js')))
+        with open(os.path.join(self.release_dir('1.1.0'), 'js', 'game.js'), 'rb') as f:
+            self.assertEqual(f.read(), b'console.log(2);')
+
+    def test_later_release_steps_never_write_through_links(self):
+        write_files(self.working_dir, {'demo.html': b'<html><body><script src="js/game.js"></script></body></html>\n',
+                                       'js/game.js': b'console.log("frame");\n' * 100})
+        quiet = lambda message: None
+        # The first release predates offline support, so the second one's entry point starts as a hard link to it
+        release_manager.copy_release(self.working_dir, self.releases_dir, self.release_dir('1.0.0'), log=quiet,
+                                     archive=False, offline=False)
+        release_manager.copy_release(self.working_dir, self.releases_dir, self.release_dir('1.1.0'), log=quiet,
+                                     archive=False)
+        self.assertTrue(os.path.samefile(os.path.join(self.release_dir('1.0.0'), 'js', 'game.js'),
+                                         os.path.join(self.release_dir('1.1.0'), 'js', 'game.js')))
+        self.assertEqual(release_manager.verify_release(self.release_dir('1.0.0'), full=True), [])
+        self.assertEqual(release_manager.verify_release(self.release_dir('1.1.0'), full=True), [])
+        with open(os.path.join(self.release_dir('1.0.0'), 'demo.html'), 'r', encoding='utf-8') as f:
+            self.assertNotIn('serviceWorker', f.read())
+        with open(os.path.join(self.release_dir('1.1.0'), 'demo.html'), 'r', encoding='utf-8') as f:
+            self.assertIn('serviceWorker', f.read())
+
+class PrecompressTest(unittest.TestCase):
+    def setUp(self):
+        self.release_dir = tempfile.mkdtemp(prefix='fun-test-precompress-')
+        self.addCleanup(shutil.rmtree, self.release_dir)
+        self.script = b'console.log("frame");\n' * 100
+        write_files(self.release_dir, {
+            'js/game.js': self.script,
+            'tiny.css': b'a{color:red}', # Below MIN_COMPRESS_SIZE
+            'noise.txt': b''.join(hashlib.sha512(bytes([i])).digest() for i in range(16)), # Compressible type, but gzip can't shrink it
+            'sprite.png': b'\0' * 4096, # Already-compressed format: never tried
+        })
+        patcher = mock.patch.object(release_manager, 'brotli', None) # Same results whether or not brotli is installed
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_worthwhile_siblings_are_written(self):
+        log = []
+        release_manager.precompress_release(self.release_dir, log=log.append)
+        siblings = sorted(name for _, _, names in os.walk(self.release_dir) for name in names if name.endswith(('.gz', '.br')))
+        self.assertEqual(siblings, ['game.js.gz'])
+        with open(os.path.join(self.release_dir, 'js', 'game.js.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.script)
+        self.assertTrue(log[0].startswith('Precompressed 1 asset(s) as .gz, saving '), log)
+        self.assertIn("install 'brotli'", log[-1])
+
+    def test_siblings_are_reproducible(self):
+        path = os.path.join(self.release_dir, 'js', 'game.js')
+        release_manager.compress_file(path)
+        first = sha256_of(path + '.gz')
+        os.utime(path, (0, 0)) # gzip's header timestamp is fixed at 0, not the file's mtime
+        self.assertEqual(release_manager.compress_file(path), {'.gz': len(self.script) - os.path.getsize(path + '.gz')})
+        self.assertEqual(sha256_of(path + '.gz'), first)
+
+class ReleaseArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='fun-test-archive-')
+        self.addCleanup(shutil.rmtree, self.root)
+        self.release_dir = os.path.join(self.root, 'releases', '1.0.0')
+        self.files = {
+            'demo.html': b'<!DOCTYPE html><title>Demo</title>\n' * 40,
+            'js/game.js': b'console.log("frame");\n' * 500, # Deflated
+            'js/game.js.gz': b'precompressed sibling, left out of the archive',
+            'audio/sound one.ogg': bytes(range(256)) * 8, # Stored: doesn't compress
+            'empty.txt': b'',
+        }
+        write_files(self.release_dir, self.files)
+        release_manager.write_release_manifest(self.release_dir, log=lambda message: None)
+
+    def build(self, name):
+        return release_manager.write_release_archive(self.release_dir, os.path.join(self.root, name), log=lambda message: None)
+
+    def test_archive_opens_with_zipfile(self):
+        with zipfile.ZipFile(self.build('demo.zip')) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), sorted([release_manager.RELEASE_MANIFEST_FILENAME, 'audio/sound one.ogg',
+                                                         'demo.html', 'empty.txt', 'js/game.js']))
+            for rel_path in archive.namelist():
+                if rel_path in self.files:
+                    self.assertEqual(archive.read(rel_path), self.files[rel_path])
+
+    def test_rebuilt_archive_is_byte_identical(self):
+        first = self.build('first.zip')
+        # Timestamps and the thread count must not leak into the archive
+        os.utime(os.path.join(self.release_dir, 'demo.html'), (0, 0))
+        second = release_manager.write_release_archive(self.release_dir, os.path.join(self.root, 'second.zip'),
+                                                       jobs=1, log=lambda message: None)
+        self.assertEqual(sha256_of(first), sha256_of(second))
+
+class VerifyAndDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.games_dir = tempfile.mkdtemp(prefix='fun-test-verify-')
+        self.addCleanup(shutil.rmtree, self.games_dir)
+        self.write('1.0.0', 'demo.html', 'version one')
+        self.write('1.0.0', 'js/game.js', 'console.log(1);')
+        self.write('1.1.0', 'demo.html', 'version two')
+        self.write('1.1.0', 'js/extra.js', 'console.log(2);')
+        for version in ('1.0.0', '1.1.0'):
+            release_manager.write_release_manifest(self.release_dir(version), log=lambda message: None)
+        self.write('0.9.0', 'demo.html', 'made before manifests')
+
+    def release_dir(self, version):
+        return os.path.join(self.games_dir, 'demo', 'releases', version)
+
+    def write(self, version, rel_path, text):
+        path = os.path.join(self.release_dir(version), *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def run_quietly(self, function, *args, **kwargs):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            result = function(*args, **kwargs)
+        return result, out.getvalue().splitlines()
+
+    def test_release_without_manifest_is_missing_not_failed(self):
+        result, lines = self.run_quietly(release_manager.verify_releases, self.games_dir)
+        self.assertEqual(result, 1)
+        self.assertEqual(lines[:3], ['MISSING demo 0.9.0 (no manifest yet)', 'OK   demo 1.0.0', 'OK   demo 1.1.0'])
+        self.assertIn('2 intact, 0 with problems, 1 missing a manifest.', lines[3])
+        self.assertIn("verify --add-missing", lines[4])
+
+    def test_add_missing_writes_the_manifest_once(self):
+        result, lines = self.run_quietly(release_manager.verify_releases, self.games_dir, versions=['0.9.0'], add_missing=True)
+        self.assertEqual((result, lines[0]), (0, 'ADDED demo 0.9.0'))
+        result, lines = self.run_quietly(release_manager.verify_releases, self.games_dir, versions=['0.9.0'])
+        self.assertEqual((result, lines[0]), (0, 'OK   demo 0.9.0'))
+
+    def test_changed_files_fail(self):
+        self.write('1.0.0', 'demo.html', 'version 1!!') # Same size: only a full check notices
+        self.write('1.0.0', 'js/game.js', 'console.log("longer");')
+        self.write('1.0.0', 'stray.txt', '')
+        self.assertEqual(release_manager.verify_release(self.release_dir('1.0.0')),
+                         ['not in manifest: stray.txt', 'size changed: js/game.js (15 -> 22 bytes)'])
+        self.assertIn('content changed: demo.html', release_manager.verify_release(self.release_dir('1.0.0'), full=True))
+
+    def test_diff_lists_added_removed_and_changed_files(self):
+        result, lines = self.run_quietly(release_manager.diff_releases, self.games_dir, 'demo', '1.0.0', '1.1.0')
+        self.assertEqual(result, 1)
+        self.assertEqual(lines[:3], ['+ js/extra.js (15 bytes)', '- js/game.js (15 bytes)', 'M demo.html (11 -> 11 bytes)'])
+        result, _ = self.run_quietly(release_manager.diff_releases, self.games_dir, 'demo', '1.0.0', '0.9.0')
+        self.assertEqual(result, 2)
+
+class ReleaseLockTest(unittest.TestCase):
+    """
+    Holds a game's release lock and starts releases against a repository without working dirs:
+    once past the lock, a release fails its first pre-check straight away.
+    """
+
+    def setUp(self):
+        self.git_root = tempfile.mkdtemp(prefix='fun-test-locks-')
+        self.addCleanup(shutil.rmtree, self.git_root)
+
+    def start_release(self, app_name):
+        out, err, result = io.StringIO(), io.StringIO(), []
+        thread = threading.Thread(target=lambda: result.append(
+            release_manager.release(app_name, '1.0.0', git_root=self.git_root, out=out, err=err)), daemon=True)
+        thread.start()
+        return thread, out, err, result
+
+    def test_same_app_release_waits_for_the_lock(self):
+        with FileLock(app_lock_path(self.git_root, 'demo')):
+            thread, out, err, result = self.start_release('demo')
+            deadline = time.monotonic() + 5
+            while 'Waiting for another release of demo' not in out.getvalue() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertIn('Waiting for another release of demo to finish...', out.getvalue())
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(err.getvalue(), '')
+        thread.join(5)
+        self.assertEqual(result, [1])
+        self.assertIn('Working directory not found', err.getvalue())
+
+    def test_other_app_release_does_not_wait(self):
+        with FileLock(app_lock_path(self.git_root, 'demo')):
+            thread, out, err, result = self.start_release('other')
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(result, [1])
+        self.assertNotIn('Waiting', out.getvalue())
+        self.assertIn('Working directory not found', err.getvalue())
+
+class InProcessReleaseTest(unittest.TestCase):
+    HEAD_SHA = '1' * 40
+
+    def setUp(self):
+        self.git_root = tempfile.mkdtemp(prefix='fun-test-release-')
+        self.addCleanup(shutil.rmtree, self.git_root)
+        write_files(os.path.join(self.git_root, '.git'), {
+            'HEAD': b'ref: refs/heads/main\n',
+            'refs/heads/main': self.HEAD_SHA.encode('ascii') + b'\n',
+            'packed-refs': b'# pack-refs with: peeled fully-peeled sorted\n' + b'2' * 40 + b' refs/tags/demo-v0.9.0\n',
+        })
+        write_files(os.path.join(self.git_root, 'games', 'demo', 'working'), {'demo.html': b'<html><body></body></html>\n'})
+        # Only the push may start git; anything else would mean a step fell back to the CLI
+        no_processes = mock.patch('subprocess.run', side_effect=AssertionError("git was started"))
+        no_processes.start()
+        self.addCleanup(no_processes.stop)
+
+    def release(self, version_tag='1.0.0'):
+        out, err = io.StringIO(), io.StringIO()
+        with mock.patch.object(release_manager, 'regenerate_root_index') as regenerate, \
+             contextlib.redirect_stdout(io.StringIO()) as stdout, contextlib.redirect_stderr(io.StringIO()) as stderr:
+            result = release_manager.release('demo', version_tag, git_root=self.git_root, out=out, err=err, archive=False)
+        self.assertEqual((stdout.getvalue(), stderr.getvalue()), ('', '')) # Everything went to out/err
+        return result, out.getvalue(), err.getvalue(), regenerate
+
+    def test_refs_are_read_and_written_in_process(self):
+        repo = release_manager.GitRepo(self.git_root)
+        self.assertTrue(repo.native)
+        self.assertEqual(repo.resolve_head(), self.HEAD_SHA)
+        self.assertEqual(repo.list_tags(), {'demo-v0.9.0'})
+        repo.create_tag('demo-v1.0.0', self.HEAD_SHA)
+        self.assertEqual(repo.list_tags(), {'demo-v0.9.0', 'demo-v1.0.0'})
+        for tag in ('demo-v0.9.0', 'demo-v1.0.0'): # Packed and loose
+            with self.assertRaises(release_manager.GitError):
+                repo.create_tag(tag, self.HEAD_SHA)
+        repo.delete_tag('demo-v1.0.0')
+        self.assertFalse(repo.tag_exists('demo-v1.0.0'))
+
+    def test_release_reports_to_out_and_err(self):
+        with mock.patch.object(release_manager.GitRepo, 'push') as push:
+            result, out, err, regenerate = self.release()
+        self.assertEqual((result, err), (0, ''))
+        self.assertIn("Tag 'demo-v1.0.0' created locally.", out)
+        push.assert_called_once_with('fun', ['demo-v1.0.0'])
+        self.assertEqual(release_manager.GitRepo(self.git_root).read_ref('refs/tags/demo-v1.0.0'), self.HEAD_SHA)
+        regenerate.assert_called_once()
+        self.assertEqual(regenerate.call_args.args[:2], (self.git_root, ['demo']))
+
+    def test_failed_push_is_reported_on_err(self):
+        with mock.patch.object(release_manager.GitRepo, 'push', side_effect=release_manager.GitError('no remote fun')):
+            result, out, err, regenerate = self.release()
+        self.assertEqual(result, 1)
+        self.assertIn('Error pushing tag to fun: no remote fun', err)
+        self.assertTrue(os.path.isdir(os.path.join(self.git_root, 'games', 'demo', 'releases', '1.0.0')))
+        regenerate.assert_not_called()
+
+class PlanAndStartupTest(unittest.TestCase):
+    def setUp(self):
+        self.git_root = tempfile.mkdtemp(prefix='fun-test-plan-')
+        self.addCleanup(shutil.rmtree, self.git_root)
+        self.app_dir = os.path.join(self.git_root, 'games', 'demo')
+        write_files(os.path.join(self.git_root, '.git'), {'HEAD': b'ref: refs/heads/main\n',
+                                                          'refs/heads/main': b'abcdef0123456789' * 2 + b'01234567\n'})
+        self.working = {
+            'demo.html': b'<html><body><script>new Tone.Player("./puff.mp3");</script></body></html>\n',
+            'js/game.js': b'console.log("frame");\n' * 100, # Compressible and large enough
+            'js/tiny.js': b'1;', # Too small to precompress
+            'puff.mp3': b'\0' * 1000, # Not a compressible type
+        }
+        write_files(os.path.join(self.app_dir, 'working'), self.working)
+        write_files(os.path.join(self.app_dir, 'releases', '1.0.0'), {'demo.html': b'<html></html>'})
+
+    def tree(self):
+        return sorted((os.path.relpath(os.path.join(root, name), self.git_root), os.stat(os.path.join(root, name)).st_mtime_ns)
+                      for root, dirs, files in os.walk(self.git_root) for name in dirs + files)
+
+    def plan(self, version_tag, **kwargs):
+        out, err = io.StringIO(), io.StringIO()
+        result = release_manager.plan_release('demo', version_tag, git_root=self.git_root, out=out, err=err, **kwargs)
+        return result, out.getvalue().splitlines(), err.getvalue()
+
+    def test_plan_counts_files_and_writes_nothing(self):
+        before = self.tree()
+        result, lines, err = self.plan('1.1.0')
+        self.assertEqual((result, err), (0, ''))
+        self.assertEqual(lines[0], 'Plan for demo 1.1.0 (dry run, nothing is changed):')
+        snapshot_bytes = sum(len(data) for data in self.working.values())
+        self.assertEqual(lines[1], f"  1. Snapshot working/ (4 file(s), {snapshot_bytes} bytes) into a temporary directory, "
+                                   "deduplicating against 1.0.0")
+        self.assertEqual(lines[2], '  2. Add preload hints and a service worker to demo.html')
+        # game.js, plus the entry point, the precache manifest and the service worker once they are generated
+        self.assertTrue(lines[3].startswith('  3. Precompress 4 asset(s) as .gz'), lines[3])
+        self.assertIn('Create tag demo-v1.1.0 at abcdef012345', lines[-2])
+        self.assertEqual(self.tree(), before)
+
+    def test_plan_reports_problems(self):
+        result, _, err = self.plan('1.0.0', compress=False, offline=False)
+        self.assertEqual(result, 1)
+        self.assertIn('Error: Release directory already exists', err)
+
+    def test_cli_modules_defer_heavy_imports(self):
+        heavy = ('subprocess', 'concurrent.futures', 'tempfile', 'gzip', 'asset_optimizer', 'offline_cache', 'packaging')
+        code = (f"import sys; sys.path[:0] = {[os.path.join(REPO_ROOT, 'admin'), os.path.join(REPO_ROOT, 'scripts')]!r}; "
+                f"import release_manager, generate_index; print(sorted(m for m in {heavy!r} if m in sys.modules))")
+        process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60)
+        self.assertEqual(process.stdout.strip(), '[]', process.stderr)
+
+class NameValidationTest(unittest.TestCase):
+    INVALID = ('demo.lock', '../demo', 'de..mo', '-demo', 'de mo', '')
+
+    def setUp(self):
+        self.git_root = tempfile.mkdtemp(prefix='fun-test-names-')
+        self.addCleanup(shutil.rmtree, self.git_root)
+        os.makedirs(os.path.join(self.git_root, '.git', 'refs', 'tags'))
+        for app_name in ('demo', 'demo.lock'):
+            os.makedirs(os.path.join(self.git_root, 'games', app_name, 'working'))
+
+    def test_validate_name(self):
+        for value in ('demo', '1.0.0', 'balloon-puff', '2.0.0-rc.1', 'v1_2'):
+            self.assertTrue(release_manager._validate_name(value), value)
+        for value in self.INVALID + (None,):
+            self.assertFalse(release_manager._validate_name(value), value)
+
+    def test_release_and_plan_reject_lock_names(self):
+        for function in (release_manager.release, release_manager.plan_release):
+            for app_name, version_tag in (('demo.lock', '1.0.0'), ('demo', '1.0.lock')):
+                err = io.StringIO()
+                self.assertEqual(function(app_name, version_tag, git_root=self.git_root, out=io.StringIO(), err=err), 1)
+                self.assertIn('Error: Invalid', err.getvalue())
+
+    def test_batch_rejects_lock_names_before_any_work(self):
+        manifest_path = os.path.join(self.git_root, 'batch.txt')
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            f.write('demo 1.0.0\ndemo.lock 1.0.0\ndemo 2.0.lock\n')
+        cwd = os.getcwd()
+        os.chdir(self.git_root) # run_batch finds the repository from the working directory
+        self.addCleanup(os.chdir, cwd)
+        err = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(err):
+            self.assertEqual(release_manager.run_batch(manifest_path), 1)
+        self.assertIn('Invalid manifest entry: demo.lock 1.0.0', err.getvalue())
+        self.assertIn('Invalid manifest entry: demo 2.0.lock', err.getvalue())
+        self.assertFalse(os.path.exists(os.path.join(self.git_root, 'games', 'demo', 'releases')))
+        self.assertFalse(os.path.exists(os.path.join(self.git_root, '.locks', 'app-demo.lock.lock')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# Purpose: Tests for scripts/version_index.py: version ordering, entry points, and when the
+#          stored per-game index is used, rebuilt in memory or written.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import version_index # noqa: E402 (needs the sys.path entries above)
+
+class VersionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.app_dir = os.path.join(tempfile.mkdtemp(prefix='fun-test-versions-'), 'demo')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.app_dir))
+        self.addCleanup(version_index.rebuilt_indexes.pop, self.app_dir, None)
+        self.index_path = os.path.join(self.app_dir, version_index.VERSION_INDEX_FILENAME)
+        for version, entry_point in (('1.0.0', 'demo.html'), ('1.10.0', 'index.html'), ('1.9.0', None)):
+            release_dir = os.path.join(self.app_dir, 'releases', version)
+            os.makedirs(release_dir)
+            if entry_point:
+                with open(os.path.join(release_dir, entry_point), 'w', encoding='utf-8') as f:
+                    f.write('<!DOCTYPE html>')
+
+    def read(self):
+        warnings = []
+        return version_index.read_version_index(self.app_dir, warnings.append), warnings
+
+    def test_plain_versions_sort_numerically_with_entry_points(self):
+        entries, warnings = self.read()
+        self.assertEqual([(entry['version'], entry['release'], entry['entry_point']) for entry in entries],
+                         [('1.10.0', [1, 10, 0], 'index.html'), ('1.9.0', [1, 9, 0], None), ('1.0.0', [1, 0, 0], 'demo.html')])
+        self.assertEqual(warnings, [])
+
+    def test_unparseable_directory_is_skipped_with_a_warning(self):
+        os.makedirs(os.path.join(self.app_dir, 'releases', 'not-a-version'))
+        entries, warnings = self.read()
+        self.assertNotIn('not-a-version', [entry['version'] for entry in entries])
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("'not-a-version'", warnings[0])
+
+    def test_read_never_writes(self):
+        self.read()
+        self.assertFalse(os.path.exists(self.index_path))
+        self.assertEqual(os.listdir(self.app_dir), ['releases'])
+
+    def test_written_index_is_used_until_releases_change(self):
+        version_index.write_version_index(self.app_dir)
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        stored['versions'][0]['entry_point'] = 'from-the-index.html'
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(stored, f)
+        self.assertEqual(self.read()[0][0]['entry_point'], 'from-the-index.html')
+        os.makedirs(os.path.join(self.app_dir, 'releases', '2.0.0'))
+        entries = self.read()[0]
+        self.assertEqual(entries[0]['version'], '2.0.0')
+        self.assertEqual(entries[1]['entry_point'], 'index.html') # Rebuilt, not the edited copy
+
+    def test_write_leaves_no_temporary_files(self):
+        version_index.write_version_index(self.app_dir)
+        self.assertEqual(sorted(os.listdir(self.app_dir)), [version_index.VERSION_INDEX_FILENAME, 'releases'])
+        self.assertEqual(os.stat(self.index_path).st_mode & 0o777, 0o644)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# Purpose: Tests for admin/working_watcher.py: debounced changes per game, the SSE stream's
+#          cursor, and the live reload snippet.
+# Usage: python -m unittest discover tests   (or: python -m pytest tests)
+
+import os
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'admin'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scripts'))
+
+import working_watcher # noqa: E402 (needs the sys.path entries above)
+from working_watcher import WorkingChange, WorkingTreeWatcher # noqa: E402
+
+class RacingWatcher:
+    """Publishes change 2 right after wait() reports change 1, before the stream reads the changes."""
+
+    def __init__(self):
+        self.changes = [WorkingChange(1, 'demo', ['a.js'], 0, 0.0)]
+
+    def wait(self, change_id, timeout):
+        latest = self.changes[-1].id
+        if len(self.changes) == 1:
+            self.changes.append(WorkingChange(2, 'demo', ['b.js'], 0, 0.0))
+        return latest
+
+    def changes_since(self, change_id, app_name=None):
+        return [change for change in self.changes
+                if change.id > change_id and (app_name is None or change.app_name == app_name)]
+
+class WorkingTreeWatcherTest(unittest.TestCase):
+    def publish(self, watcher, *changes):
+        for app_name, rel_path in changes:
+            watcher._record(app_name, rel_path)
+        watcher._flush()
+
+    def test_changes_are_debounced_per_game(self):
+        watcher = WorkingTreeWatcher('/nonexistent', debounce=0, max_delay=0)
+        seen = []
+        watcher.listeners.append(seen.append)
+        self.publish(watcher, ('demo', 'b.js'), ('demo', 'a.js'), ('other', 'x.css'), ('demo', '.a.js.swp'))
+        self.assertEqual([(change.id, change.app_name, change.paths) for change in seen],
+                         [(1, 'demo', ['a.js', 'b.js']), (2, 'other', ['x.css'])])
+        self.assertEqual(watcher.changes_since(0, 'other'), [seen[1]])
+        self.assertEqual(watcher.changes_since(1), [seen[1]])
+
+    def test_stream_sends_each_change_once(self):
+        events = working_watcher.sse_events(RacingWatcher(), 'demo', 0, keepalive=0)
+        frames = [next(events) for _ in range(3)]
+        self.assertTrue(frames[0].startswith('id: 1\n') and frames[1].startswith('id: 2\n'), frames)
+        self.assertEqual(frames[2], ': keep-alive\n\n')
+
+    def test_stream_skips_other_games(self):
+        watcher = WorkingTreeWatcher('/nonexistent', debounce=0, max_delay=0)
+        self.publish(watcher, ('other', 'x.js'))
+        self.publish(watcher, ('demo', 'a.js'))
+        events = working_watcher.sse_events(watcher, 'demo', 0, keepalive=0)
+        self.assertTrue(next(events).startswith('id: 2\nevent: change\n'))
+        self.assertEqual(next(events), ': keep-alive\n\n')
+
+    def test_live_reload_goes_before_the_last_body_close(self):
+        document = working_watcher.inject_live_reload('<body><p></body></p></body>', '/events?x=</script>')
+        self.assertTrue(document.endswith(working_watcher.LIVE_RELOAD_END + '</body>'))
+        self.assertIn('"/events?x=<\\/script>"', document) # The URL can't close the script early
+
+if __name__ == '__main__':
+    unittest.main()